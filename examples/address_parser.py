@@ -0,0 +1,230 @@
+"""
+Address Parser
+Scans a text block line by line once and emits every street + city/state/ZIP
+address it finds, split into components and checked against a compact
+ZIP-prefix table so 'CA 12345' style false positives are dropped.
+"""
+
+import bisect
+import re
+
+# USPS ZIP3 prefix ranges -> state, sorted by start (inclusive ranges).
+# Military (AA/AE/AP) prefixes are left out; ZIPs there are "unknown".
+ZIP3_RANGES = (
+    (5, 5, 'NY'), (6, 7, 'PR'), (8, 8, 'VI'), (9, 9, 'PR'),
+    (10, 27, 'MA'), (28, 29, 'RI'), (30, 38, 'NH'), (39, 49, 'ME'),
+    (50, 54, 'VT'), (55, 55, 'MA'), (56, 59, 'VT'), (60, 69, 'CT'),
+    (70, 89, 'NJ'), (100, 149, 'NY'), (150, 196, 'PA'), (197, 199, 'DE'),
+    (200, 200, 'DC'), (201, 201, 'VA'), (202, 205, 'DC'), (206, 219, 'MD'),
+    (220, 246, 'VA'), (247, 268, 'WV'), (270, 289, 'NC'), (290, 299, 'SC'),
+    (300, 319, 'GA'), (320, 339, 'FL'), (341, 349, 'FL'), (350, 369, 'AL'),
+    (370, 385, 'TN'), (386, 397, 'MS'), (398, 399, 'GA'), (400, 427, 'KY'),
+    (430, 459, 'OH'), (460, 479, 'IN'), (480, 499, 'MI'), (500, 528, 'IA'),
+    (530, 549, 'WI'), (550, 567, 'MN'), (569, 569, 'DC'), (570, 577, 'SD'),
+    (580, 588, 'ND'), (590, 599, 'MT'), (600, 629, 'IL'), (630, 658, 'MO'),
+    (660, 679, 'KS'), (680, 693, 'NE'), (700, 714, 'LA'), (716, 729, 'AR'),
+    (730, 732, 'OK'), (733, 733, 'TX'), (734, 749, 'OK'), (750, 799, 'TX'),
+    (800, 816, 'CO'), (820, 831, 'WY'), (832, 838, 'ID'), (840, 847, 'UT'),
+    (850, 865, 'AZ'), (870, 884, 'NM'), (885, 885, 'TX'), (889, 898, 'NV'),
+    (900, 961, 'CA'), (967, 968, 'HI'), (969, 969, 'GU'), (970, 979, 'OR'),
+    (980, 994, 'WA'), (995, 999, 'AK'),
+)
+_ZIP3_STARTS = [r[0] for r in ZIP3_RANGES]
+
+# Individual 5-digit ZIPs that sit inside another state's prefix range
+ZIP5_EXCEPTIONS = {
+    '06390': 'NY',  # Fishers Island
+    '96799': 'AS',
+    '96950': 'MP', '96951': 'MP', '96952': 'MP',
+}
+
+STATE_CODES = frozenset(
+    'AL AK AS AZ AR CA CO CT DE DC FL GA GU HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE '
+    'NV NH NJ NM NY NC ND MP OH OK OR PA PR RI SC SD TN TX UT VT VI VA WA WV WI WY'.split()
+)
+
+STREET_SUFFIXES = (
+    'Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Court|Ct|Way|'
+    'Terrace|Ter|Place|Pl|Parkway|Pkwy|Highway|Hwy|Circle|Cir|Square|Sq|Loop|Trail|Trl'
+)
+
+# House number, at most 5 name words, a suffix, then an optional unit (or a
+# PO Box). The bounded word count keeps matching linear on long lines.
+STREET_RE = re.compile(
+    r"\bP\.?\s?O\.?\s+Box\s+\d+"
+    r"|\b\d{1,6}[A-Za-z]?\s+(?:[A-Za-z0-9'.#&\-]+\s+){0,5}?(?:" + STREET_SUFFIXES + r")\b\.?"
+    r"(?:\s+(?:North|South|East|West|N|S|E|W|NE|NW|SE|SW)\b\.?)?"
+    r"(?:,?\s*(?:Suite|Ste|Unit|Room|Rm|Bldg|Building|Floor|Fl|#)\.?\s*[A-Za-z0-9\-]+)?",
+    re.IGNORECASE
+)
+
+# 'ST 12345' or 'ST 12345-6789'; uppercase or title case ('Ca 94577'), so callers
+# uppercase group 1 before checking it against STATE_CODES. Lowercase words
+# ('or 97201', 'ca 95814 residents') are prose, not state codes
+STATE_ZIP_RE = re.compile(r"\b([A-Z][A-Za-z])\.?\s+(\d{5})(?:-(\d{4}))?\b")
+
+# Lowercase words that end a city name when read backwards from the state
+# ('Offices in Sacramento, CA' -> 'Sacramento')
+CITY_STOP_WORDS = frozenset({
+    'in', 'at', 'of', 'to', 'the', 'and', 'or', 'for', 'from', 'on', 'by',
+    'near', 'our', 'is', 'are', 'located', 'visit', 'call', 'with', 'serving',
+})
+
+# Street lines are remembered for this many following lines when the
+# city/state/ZIP sits on its own line (e.g. <br>-separated blocks)
+STREET_CARRY_LINES = 2
+
+
+def zip_state(zip_code):
+    """Return the state for a 5-digit ZIP using the bundled prefix table, or None"""
+    if not zip_code or len(zip_code) < 5 or not zip_code[:5].isdigit():
+        return None
+    zip5 = zip_code[:5]
+    if zip5 in ZIP5_EXCEPTIONS:
+        return ZIP5_EXCEPTIONS[zip5]
+    prefix = int(zip5[:3])
+    idx = bisect.bisect_right(_ZIP3_STARTS, prefix) - 1
+    if idx >= 0:
+        start, end, state = ZIP3_RANGES[idx]
+        if start <= prefix <= end:
+            return state
+    return None
+
+
+def zip_matches_state(zip_code, state):
+    """True when the ZIP belongs to `state`, or when the ZIP isn't in the table"""
+    expected = zip_state(zip_code)
+    return expected is None or expected == state
+
+
+class ParsedAddress:
+    __slots__ = ('street', 'city', 'state', 'zip')
+
+    def __init__(self, street=None, city=None, state=None, zip=None):
+        self.street = street
+        self.city = city
+        self.state = state
+        self.zip = zip
+
+    @property
+    def is_complete(self):
+        return bool(self.street and self.state and self.zip)
+
+    @property
+    def value(self):
+        parts = []
+        if self.street:
+            parts.append(self.street)
+        place = ''
+        if self.city:
+            place = f"{self.city}, "
+        if self.state:
+            place += f"{self.state} {self.zip or ''}".strip()
+        if place:
+            parts.append(place.strip())
+        return ', '.join(parts)
+
+    def to_dict(self):
+        return {'street': self.street, 'city': self.city, 'state': self.state, 'zip': self.zip}
+
+    def __repr__(self):
+        return f"ParsedAddress({self.value!r})"
+
+
+def _clean(text):
+    return re.sub(r'\s+', ' ', text or '').strip(" ,;:-|")
+
+
+def _city_from(prefix):
+    """
+    City is the last comma-separated segment before the state, cut at the
+    last lowercase function word (at most 4 words)
+    """
+    prefix = _clean(prefix)
+    segment = _clean(prefix.rsplit(',', 1)[-1])
+    words = segment.split()
+    if not words or any(ch.isdigit() for ch in segment):
+        return None
+    city = []
+    for word in reversed(words[-4:]):
+        if word in CITY_STOP_WORDS:
+            break
+        city.insert(0, word)
+    return ' '.join(city) or None
+
+
+def parse_block(text, include_partial=True):
+    """
+    Return every address found in a block of text
+
+    Args:
+        text: Block text with one visual line per '\\n' (get_text(separator='\\n'))
+        include_partial: Also return street-only or city/state/ZIP-only lines
+            when the block has no complete address
+    """
+    if not text:
+        return []
+    found = []
+    partial = []
+    seen = set()
+    carry = None  # (street, lines_left) from an earlier street-only line
+
+    for raw_line in text.splitlines():
+        line = _clean(raw_line)
+        if not line:
+            continue
+        pos = 0
+        matched_zip = False
+        for m in STATE_ZIP_RE.finditer(line):
+            state, zip5, plus4 = m.group(1).upper(), m.group(2), m.group(3)
+            if state not in STATE_CODES or not zip_matches_state(zip5, state):
+                continue
+            matched_zip = True
+            zip_code = f"{zip5}-{plus4}" if plus4 else zip5
+            prefix = line[pos:m.start()]
+            street = None
+            city_prefix = prefix
+            street_match = None
+            for street_match in STREET_RE.finditer(prefix):
+                pass
+            if street_match is not None:
+                street = _clean(street_match.group(0))
+                city_prefix = prefix[street_match.end():]
+            elif carry is not None:
+                street = carry[0]
+            carry = None
+            addr = ParsedAddress(street, _city_from(city_prefix), state, zip_code)
+            key = addr.value.lower()
+            if key not in seen:
+                seen.add(key)
+                (found if addr.street else partial).append(addr)
+            pos = m.end()
+
+        if matched_zip:
+            continue
+        street_match = STREET_RE.search(line)
+        if street_match:
+            carry = (_clean(street_match.group(0)), STREET_CARRY_LINES)
+            addr = ParsedAddress(street=carry[0])
+            if addr.value.lower() not in seen:
+                seen.add(addr.value.lower())
+                partial.append(addr)
+        elif carry is not None:
+            carry = (carry[0], carry[1] - 1) if carry[1] > 1 else None
+
+    if found or not include_partial:
+        return found
+    return partial
+
+
+# Example usage
+if __name__ == "__main__":
+    sample = "\n".join([
+        "Public Health Clinics",
+        "1100 San Leandro Blvd.",
+        "San Leandro, CA 94577",
+        "Eastmont: 6955 Foothill Blvd, Suite 300, Oakland, CA 94605 | North County: 3600 Telegraph Ave Oakland CA 94609",
+        "Not an address: Room CA 12345",
+    ])
+    for addr in parse_block(sample):
+        print(addr.value, addr.to_dict())
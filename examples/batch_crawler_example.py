@@ -3,59 +3,104 @@ Batch Health Resource Crawler
 Shows how to crawl multiple health departments from state CSV files
 """
 
-import csv
 import time
 import json
 import re
 from datetime import datetime
 import os
 from categorized_example import CategorizedHealthCrawler
+from site_catalog import SiteCatalog, group_sites_by_url
+from crawl_scheduler import CrawlScheduler
+from entity_index import EntityIndex
+from resource_model import ResourceTable, resource_key, results_to_json
+from report_aggregator import ResultsAggregator
+from report_writer import build_report, write_report
+from host_throttle import HostThrottle
+from dns_preflight import DnsPreflight
+from worker_lifecycle import MemoryBudget, WorkerLifecycle
 
 class BatchHealthCrawler:
-    def __init__(self):
+    def __init__(self, catalog=None, scheduler=None, text_index=None, document_stage=None, throttle=None,
+                 dns=None, lifecycle=None):
         self.crawler = CategorizedHealthCrawler()
+        # Resolves each state's hosts up front; unresolvable hosts are
+        # recorded as failed without a fetch (cache in output/dns_cache.json)
+        self.dns = dns if dns is not None else DnsPreflight()
+        # Adaptive per-host/IP/platform request spacing (learned limits are
+        # kept in output/host_limits.json between runs)
+        self.throttle = throttle if throttle is not None else HostThrottle(
+            resolver=self.dns.ip if self.dns is not None else None)
+        self.crawler.throttle = self.throttle
+        # Compiled data/websites index (opened lazily on first load)
+        self.catalog = catalog
+        # Decides crawl order and enforces per-state / global budgets
+        self.scheduler = scheduler or CrawlScheduler()
         self.results = []
         # Track per-site crawl success for reporting
         self.crawl_log = []
+        # Phones/addresses across all crawled sites (built as sites complete)
+        self.entity_index = EntityIndex()
+        # Running report totals, updated as each site is recorded
+        self.aggregator = ResultsAggregator()
+        # Optional TextIndex; when set, page text is kept and indexed per community
+        self.text_index = text_index
+        # Optional DocumentStage; when set, linked PDFs are fetched and parsed in
+        # the background and their resources added to the page's results
+        self.document_stage = document_stage
+        # Page count / RSS tracking (distributed workers retire on its limits)
+        # and the budget for document bodies held in memory at once
+        self.lifecycle = lifecycle or WorkerLifecycle()
+        self.memory_budget = MemoryBudget()
+        if document_stage is not None and document_stage.memory_budget is None:
+            document_stage.memory_budget = self.memory_budget
+        # Per-worker lifecycle stats when results were merged from several processes
+        self.worker_stats = []
+        # Per-stage queue/throughput stats when the crawl ran through crawl_pipeline
+        self.pipeline_stats = None
     
-    def load_state_websites(self, state_code):
+    def load_state_websites(self, state_code, include_missing_urls=False):
         """
         Load health department websites for a specific state
         
         Args:
             state_code: Two-letter state code (e.g., 'ca', 'or', 'tx')
+            include_missing_urls: Keep rows with an empty pha_url (skipped by default
+                since they can only ever produce failed fetches)
         """
-        filename = f"../data/websites/us-{state_code.lower()}.csv"
-        websites = []
         try:
-            with open(filename, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file, delimiter=';')
-                for row in reader:
-                    # Use columns from the current CSV format
-                    websites.append({
-                        'name': row.get('name', 'Unknown'),
-                        'pha_url': row.get('pha_url', ''),
-                        'state_id': row.get('state_id', ''),
-                        'category': row.get('category', ''),
-                        'population': row.get('population_proper', 'Unknown')
-                    })
-            print(f"Loaded {len(websites)} health departments for {state_code.upper()}")
+            # The catalog compiles the CSVs once and only recompiles a file when it changes
+            if self.catalog is None:
+                self.catalog = SiteCatalog()
+            websites = self.catalog.sites(state=state_code, with_url=not include_missing_urls)
+            if not websites:
+                print(f"No catalog entries found for {state_code.upper()}")
+                return []
+            skipped = self.catalog.count(state_code) - len(websites)
+            if skipped:
+                print(f"Loaded {len(websites)} health departments for {state_code.upper()} ({skipped} without a URL skipped)")
+            else:
+                print(f"Loaded {len(websites)} health departments for {state_code.upper()}")
             return websites
-        except FileNotFoundError:
-            print(f"File not found: {filename}")
-            return []
         except Exception as e:
-            print(f"Error loading {filename}: {e}")
+            print(f"Error loading catalog for {state_code.upper()}: {e}")
             return []
     
     def crawl_state(self, state_code, max_sites=10, delay=2):
         """
         Crawl health departments for an entire state
         
+        Rows that share the same pha_url (e.g. counties in one health district)
+        are fetched once and the extracted resources are copied to each row.
+        Sites are crawled in scheduler priority order (people served, staleness
+        and past yield) until the state or global budget runs out.
+        
         Args:
             state_code: Two-letter state code
-            max_sites: Maximum number of sites to crawl (for testing)
-            delay: Seconds to wait between requests
+            max_sites: Maximum number of unique URLs to fetch for this state, used
+                when no budget was set for the state with set_state_budget
+                (None = no limit); the state's budget starts over on each call
+            delay: Starting seconds between requests to a host that has no
+                learned limit yet (the throttle adapts it per host from there)
         """
         print(f"\n=== Crawling {state_code.upper()} Health Departments ===")
         
@@ -63,117 +108,258 @@ class BatchHealthCrawler:
         if not websites:
             return
         
-        # Limit for testing/demo purposes
-        websites = websites[:max_sites]
+        groups = group_sites_by_url(websites)
+        shared = sum(len(members) for _, members in groups if len(members) > 1)
+        if shared:
+            print(f"{len(websites)} rows share {len(groups)} unique URLs ({shared} rows in shared groups)")
         
-        for i, site in enumerate(websites, 1):
-            print(f"\n[{i}/{len(websites)}] {site['name']}")
+        self.scheduler.start_state(state_code, max_requests=max_sites)
+        groups = self.scheduler.plan(groups, state_code)
+        # Hosts that don't resolve are failed up front instead of at fetch time
+        unresolved = {}
+        if self.dns is not None:
+            _, unresolved = self.dns.split_groups(groups)
+            self.dns.install()
+            self.dns.save()
+            if unresolved:
+                print(f"{len(unresolved)} of {len(groups)} URLs have hosts that don't resolve; marking them failed")
+        if self.throttle is not None:
+            self.throttle.default_interval = delay
+        
+        fetched = 0
+        # Fetches waiting on their documents, recorded in crawl order
+        pending = []
+        for url, members in groups:
+            if url in unresolved:
+                self.scheduler.record(url, False, 0)
+                self._record_fetch(members, {}, None, unresolved[url])
+                continue
+            if not self.scheduler.admit(state_code):
+                print(f"\nCrawl budget reached after {fetched} requests ({len(groups) - fetched} URLs left for {state_code.upper()})")
+                break
+            
+            # Backpressure: let queued document bodies drain before the next page
+            if self.document_stage is not None:
+                self.memory_budget.wait_below()
+            
+            # Be polite - the throttle spaces requests per host/IP/platform;
+            # without one, fall back to a fixed wait between requests
+            if self.throttle is None and fetched:
+                print(f"Waiting {delay} seconds...")
+                time.sleep(delay)
+            fetched += 1
+            
+            site = members[0]
+            print(f"\n[{fetched}/{len(groups)}] {site['name']}")
+            if len(members) > 1:
+                print(f"Shared by: {', '.join(m['name'] for m in members[1:])}")
             print(f"Category: {site['category']}")
             print(f"URL: {site['pha_url']}")
             
-            # Crawl the main page (wrap call to protect against unexpected exceptions)
-            try:
-                raw_results, status_code, error = self.crawler.crawl_page_with_categories(site['pha_url'])
-            except Exception as e:
-                raw_err = str(e)
-                try:
-                    err = re.sub(r'\sfor url:?.*$', ' for url', raw_err)
-                except Exception:
-                    err = raw_err
-                print(f"Unhandled error crawling {site['pha_url']}: {err}")
-                raw_results, status_code, error = {}, None, f"unhandled_crawl_error: {err}"
-            # Consider the crawl successful when we received an HTTP status code < 400
-            success = (status_code is not None and status_code < 400)
-            results = raw_results or {}
-            
-            # Add metadata
-            results.update({
-                'name': site['name'],
-                'category': site['category'],
-                'state_id': site['state_id'],
-                'population': site['population'],
-                'crawled_at': datetime.now().isoformat()
-            })
-            # Ensure the requested URL is always recorded even when crawling failed
-            # crawl_page_with_categories may return an empty dict on fetch failure,
-            # so set the 'url' to the requested pha_url if it's missing.
-            if not results.get('url'):
-                results['url'] = site['pha_url']
-
-            # Record the crawl success/failure for this site in crawl_log, include status and error
-            try:
-                entry = {'url': site['pha_url'], 'success': success}
-                # Include status_code when present
-                if status_code is not None:
-                    entry['status_code'] = status_code
-                # Include short error message when available
-                if error:
-                    entry['error'] = error
-                self.crawl_log.append(entry)
-            except Exception:
-                # Be defensive: fall back to simple url-only entry
-                self.crawl_log.append({'url': site['pha_url'], 'success': False})
+            started = time.monotonic()
+            raw_results, status_code, error = self.fetch_site(site['pha_url'])
+            page_text = (raw_results or {}).pop('page_text', None)
+            links = (raw_results or {}).pop('document_links', None)
+            total_resources = len((raw_results or {}).get('resources', []))
+            self.scheduler.record(url, status_code is not None and status_code < 400,
+                                  total_resources, time.monotonic() - started)
             
-            # Store results
-            self.results.append(results)
+            job = None
+            if self.document_stage is not None and links:
+                job = self.document_stage.submit(url, links)
+                print(f"Queued {len(job.futures)} linked document(s)")
+            pending.append((members, raw_results, status_code, error, page_text, job))
+            self._record_ready(pending)
             
             # Show quick summary
-            total_resources = len(results.get('resources', []))
             print(f"Found {total_resources} resources")
-            
-            # Be polite - wait between requests
-            if i < len(websites):
-                print(f"Waiting {delay} seconds...")
-                time.sleep(delay)
+            reason = self.lifecycle.page_done()
+            if reason:
+                # One process can't restart itself mid-state; distributed_crawl
+                # workers retire at this point and a fresh process takes over
+                print(f"Worker limit reached: {reason}")
+        
+        self._record_ready(pending, wait=True)
+        self.scheduler.history.save()
+        if self.throttle is not None:
+            self.throttle.save()
+            stats = self.throttle.stats
+            print(f"Throttle: {stats['requests']} requests, {stats['wait_seconds']:.1f}s waited, "
+                  f"{stats['throttled']} throttled responses")
+    
+    def _record_ready(self, pending, wait=False):
+        """
+        Record fetches from the front of `pending` whose documents are finished
+        
+        Keeps crawl order; with wait=True blocks until every document is done.
+        """
+        while pending:
+            members, raw_results, status_code, error, page_text, job = pending[0]
+            if job is not None and not wait and not job.done():
+                return
+            pending.pop(0)
+            if job is not None and raw_results:
+                added = self._merge_documents(raw_results, job)
+                if added:
+                    print(f"{members[0]['name']}: {added} resources from linked documents")
+            self._record_fetch(members, raw_results, status_code, error, page_text)
+    
+    def _merge_documents(self, raw_results, job):
+        """Add document resources that the page itself didn't already list"""
+        resources = raw_results.setdefault('resources', [])
+        seen = {resource_key(r) for r in resources}
+        added = 0
+        for resource in job.resources():
+            key = resource_key(resource)
+            if key not in seen:
+                seen.add(key)
+                resources.append(resource)
+                added += 1
+        return added
+    
+    def _record_fetch(self, members, raw_results, status_code, error, page_text=None):
+        """Store one fetch's result for every catalog row that shares its URL; returns the stored results"""
+        # Store resources column-wise; rows of a shared fetch all point at the
+        # same read-only table and only get their own metadata dict
+        if raw_results and 'resources' in raw_results:
+            raw_results['resources'] = ResourceTable.from_dicts(raw_results['resources'])
+        stored_results = []
+        for site in members:
+            shared_with = [m.get('community_id', '') for m in members if m is not site]
+            results = dict(raw_results) if raw_results else {}
+            stored = self.record_site(site, results, status_code, error, shared_with=shared_with)
+            if self.text_index is not None:
+                self.text_index.update_site(stored, page_text)
+            stored_results.append(stored)
+        return stored_results
+    
+    def fetch_site(self, url):
+        """
+        Crawl one URL, turning unexpected exceptions into an error result
+        
+        Returns (raw_results, status_code, error) like crawl_page_with_categories.
+        """
+        # Crawl the main page (wrap call to protect against unexpected exceptions)
+        try:
+            return self.crawler.crawl_page_with_categories(url, keep_text=self.text_index is not None,
+                                                           keep_links=self.document_stage is not None)
+        except Exception as e:
+            raw_err = str(e)
+            try:
+                err = re.sub(r'\sfor url:?.*$', ' for url', raw_err)
+            except Exception:
+                err = raw_err
+            print(f"Unhandled error crawling {url}: {err}")
+            return {}, None, f"unhandled_crawl_error: {err}"
     
-    def save_results(self, filename=None):
+    def record_site(self, site, raw_results, status_code, error, shared_with=None):
+        """
+        Attach site metadata to a crawl result and store it with its crawl_log entry
+        
+        Args:
+            site: Catalog row the result belongs to
+            raw_results: Result dict from crawl_page_with_categories (may be empty)
+            status_code / error: Fetch outcome
+            shared_with: community_ids of other rows served by the same fetch
+        """
+        # Consider the crawl successful when we received an HTTP status code < 400
+        success = (status_code is not None and status_code < 400)
+        results = raw_results or {}
+        
+        # Add metadata
+        results.update({
+            'name': site['name'],
+            'community_id': site.get('community_id', ''),
+            'parent_id': site.get('parent_id', ''),
+            'category': site['category'],
+            'state_id': site['state_id'],
+            'population': site['population'],
+            'crawled_at': datetime.now().isoformat()
+        })
+        # Ensure the requested URL is always recorded even when crawling failed
+        # crawl_page_with_categories may return an empty dict on fetch failure,
+        # so set the 'url' to the requested pha_url if it's missing.
+        if not results.get('url'):
+            results['url'] = site['pha_url']
+
+        # Record the crawl success/failure for this site in crawl_log, include status and error
+        try:
+            entry = {'url': site['pha_url'], 'success': success}
+            if site.get('community_id'):
+                entry['community_id'] = site['community_id']
+            # Include status_code when present
+            if status_code is not None:
+                entry['status_code'] = status_code
+            # Include short error message when available
+            if error:
+                entry['error'] = error
+            # Mark rows whose resources came from a fetch shared with other rows
+            if shared_with:
+                entry['shared_fetch'] = True
+                entry['shared_with'] = list(shared_with)
+            self.crawl_log.append(entry)
+        except Exception:
+            # Be defensive: fall back to simple url-only entry
+            self.crawl_log.append({'url': site['pha_url'], 'success': False})
+        self.aggregator.add_crawl(self.crawl_log[-1], site['state_id'])
+        
+        # Store results (resources as a compact ResourceTable)
+        if 'resources' in results:
+            results['resources'] = ResourceTable.from_dicts(results['resources'])
+        self.results.append(results)
+        self.entity_index.add_site(results)
+        self.aggregator.add_site(results)
+        return results
+    
+    def save_results(self, filename=None, compact_entities=False, output_dir='output'):
         """
         Save crawling results to a JSON file
+        
+        Args:
+            filename: Output file name inside output_dir (timestamped by default)
+            compact_entities: Store each phone/address once in a top-level
+                'entities' table and reference it from the site resources
+            output_dir: Directory the results file is written to
         """
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"batch_crawl_results_{timestamp}.json"
-        # Build summary information to include at top-level in the JSON
-        total_resources = sum(len(r.get('resources', [])) for r in self.results)
-
-        # Count by category
-        by_category = {}
-        by_tag = {}
-        for result in self.results:
-            for resource in result.get('resources', []):
-                cat = resource.get('category', 'Unknown')
-                by_category[cat] = by_category.get(cat, 0) + 1
-
-                for tag in (resource.get('tags') or []):
-                    by_tag[tag] = by_tag.get(tag, 0) + 1
+        # Summary totals are kept up to date by the aggregator as sites are
+        # recorded; rebuild it only if self.results was changed directly
+        aggregator = self.aggregator
+        if aggregator.site_count != len(self.results) or aggregator.sites_crawled != len(self.crawl_log):
+            aggregator = self.aggregator = ResultsAggregator.from_results(self.results, self.crawl_log)
 
         # Crawl info: include all crawled URLs, timestamp and student name
         # Use crawl_log entries which include success flags for each requested URL
-        crawled_entries = list(self.crawl_log)
-        # Count successful crawls as entries that reported success and did not include an error
-        successful_count = sum(1 for e in crawled_entries if e.get('success') and not e.get('error'))
+        # (successful = reported success and did not include an error)
         crawl_info = {
-            'url': crawled_entries,
-            'sites_crawled_count': len(crawled_entries),
-            'successful_crawls': successful_count,
+            'url': list(self.crawl_log),
+            'sites_crawled_count': aggregator.sites_crawled,
+            'successful_crawls': aggregator.successful_crawls,
             'timestamp': datetime.now().isoformat(),
-            'student_name': 'Muhammad Sualeh Alam'
+            'student_name': 'Muhammad Sualeh Alam',
+            'memory': self.memory_metrics()
         }
+        if self.pipeline_stats:
+            crawl_info['pipeline'] = self.pipeline_stats
 
-        summary = {
-            'total_resources': total_resources,
-            'by_category': by_category,
-            'by_tag': by_tag,
-            'crawl_info': crawl_info
-        }
+        summary = aggregator.summary()
+        summary['crawl_info'] = crawl_info
 
-        payload = {
-            'summary': summary,
-            'results': self.results
-        }
+        if compact_entities:
+            payload = {
+                'summary': summary,
+                'entities': self.entity_index.to_dict()['entities'],
+                'results': self.entity_index.compact_results(self.results)
+            }
+        else:
+            payload = {
+                'summary': summary,
+                'results': results_to_json(self.results)
+            }
 
         # Ensure output directory exists and write file into it
-        output_dir = 'output'
         try:
             os.makedirs(output_dir, exist_ok=True)
         except Exception:
@@ -208,164 +394,26 @@ class BatchHealthCrawler:
             summary_filename = f"summary_report_{ts_fname}.txt"
             summary_path = os.path.join(summary_dir, summary_filename)
 
-            # Build friendly timestamp for header using crawl_info timestamp if present
-            crawled_ts = crawl_info.get('timestamp') if isinstance(crawl_info, dict) else None
-            try:
-                if crawled_ts:
-                    crawled_dt = datetime.fromisoformat(crawled_ts)
-                    crawled_str = crawled_dt.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    crawled_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                crawled_str = crawled_ts or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            total_sites = crawl_info.get('sites_crawled_count', len(self.crawl_log))
-            successful = crawl_info.get('successful_crawls', sum(1 for e in self.crawl_log if e.get('success')))
-            failed = total_sites - successful
-
-            lines = []
-            lines.append(f"BATCH CRAWLING REPORT - {state_label}")
-            lines.append("=" * 50)
-            lines.append("")
-            lines.append(f"Crawled: {crawled_str}")
-            lines.append(f"Total Sites: {total_sites}")
-            lines.append(f"Successful: {successful}")
-            lines.append(f"Failed: {failed}")
-            lines.append("")
-            lines.append("SUMMARY STATISTICS")
-            lines.append("--------------------")
-            lines.append(f"Total Resources Found: {summary.get('total_resources', 0)}")
-            lines.append("")
-            lines.append("Resources by category:")
-            for cat, cnt in summary.get('by_category', {}).items():
-                lines.append(f"{cat}: {cnt}")
-            lines.append("")
-            lines.append("Resources by tag:")
-            # Exclude verification-only tags like 'uncertain' from the human-readable report
-            for tag, cnt in summary.get('by_tag', {}).items():
-                if str(tag).lower() == 'uncertain':
-                    continue
-                lines.append(f"{tag}: {cnt}")
-            lines.append("")
-            lines.append("TOP 5 COUNTIES BY RESOURCES FOUND")
-            lines.append("-----------------------------------")
-            # Compute resource counts by county/name from self.results
-            county_counts = {}
-            try:
-                for res in self.results:
-                    if not isinstance(res, dict):
-                        continue
-                    name = res.get('name') or res.get('state_id') or 'Unknown'
-                    cnt = len(res.get('resources', []) or [])
-                    county_counts[name] = county_counts.get(name, 0) + cnt
-            except Exception:
-                county_counts = {}
-
-            if not county_counts:
-                lines.append("TO BE DECIDED NOT YET")
-                top_n = []
-            else:
-                # Sort by count descending, then name
-                sorted_counties = sorted(county_counts.items(), key=lambda x: (-x[1], x[0]))
-                # Take top 5 (or fewer)
-                top_n = sorted_counties[:5]
-                for name, cnt in top_n:
-                    if name is None or str(name).strip() == '':
-                        display_name = 'Unknown'
-                    else:
-                        display_name = str(name)
-                    lines.append(f"{display_name}: {cnt} resource{'s' if cnt != 1 else ''}")
-
-            # DETAILED FINDINGS for the top counties
-            lines.append("")
-            lines.append("DETAILED FINDINGS")
-            lines.append("-----------------")
-            try:
-                for name, _ in top_n:
-                    # try to find the matching result entry by exact name, then by contains
-                    found = None
-                    for r in self.results:
-                        if not isinstance(r, dict):
-                            continue
-                        rname = (r.get('name') or '').strip()
-                        if rname and rname == name:
-                            found = r
-                            break
-                    if not found:
-                        for r in self.results:
-                            if not isinstance(r, dict):
-                                continue
-                            rname = (r.get('name') or '').strip()
-                            if rname and name and name.lower() in rname.lower():
-                                found = r
-                                break
-
-                    display_name = name if name else (found.get('name') if found else 'Unknown')
-                    lines.append("")
-                    lines.append(f"{display_name}:")
-                    # Population (format with commas when numeric)
-                    population = found.get('population') if found and isinstance(found, dict) else 'Unknown'
-                    pop_display = 'Unknown'
-                    try:
-                        if population is None:
-                            pop_display = 'Unknown'
-                        else:
-                            # Normalize and try converting to int
-                            pop_str = str(population).replace(',', '').strip()
-                            pop_int = int(pop_str)
-                            pop_display = f"{pop_int:,}"
-                    except Exception:
-                        pop_display = str(population)
-                    lines.append(f"- Population: {pop_display}")
-
-                    # Resource breakdown
-                    resources = found.get('resources', []) if found and isinstance(found, dict) else []
-                    total_resources_local = len(resources)
-                    phones = sum(1 for it in resources if str(it.get('category','')).upper() == 'CONTACT_INFO')
-                    addresses = sum(1 for it in resources if str(it.get('category','')).upper() == 'LOCATION')
-                    facilities = sum(1 for it in resources if str(it.get('category','')).upper() == 'FACILITY')
-                    # human-friendly pluralization
-                    phone_label = 'phone' if phones == 1 else 'phones'
-                    address_label = 'address' if addresses == 1 else 'addresses'
-                    facility_label = 'facility' if facilities == 1 else 'facilities'
-                    lines.append(f"- Resources: {total_resources_local} total ({phones} {phone_label}, {addresses} {address_label}, {facilities} {facility_label})")
-
-                    # Highlights: top tags for this county
-                    tag_counts = {}
-                    for it in resources:
-                        for t in (it.get('tags') or []):
-                            # Skip 'uncertain' tag for highlights (verification-only)
-                            if str(t).lower() == 'uncertain':
-                                continue
-                            tag_counts[t] = tag_counts.get(t, 0) + 1
-                    if tag_counts:
-                        sorted_tags = sorted(tag_counts.items(), key=lambda x: (-x[1], x[0]))
-                        top_tags = [t[0].replace('_', ' ').title() for t in sorted_tags[:5]]
-                        lines.append(f"- Highlights: {', '.join(top_tags)}")
-                    else:
-                        lines.append(f"- Highlights: None identified")
-            except Exception:
-                # If something goes wrong, keep the report generation resilient
-                lines.append("")
-                lines.append("DETAILED FINDINGS: unable to compute details due to an internal error.")
-            lines.append("")
-            lines.append("OBSERVATIONS")
-            lines.append("------------")
-            lines.append("- Larger counties tend to have more comprehensive online resources")
-            lines.append("- All counties provide main contact numbers")
-            lines.append("- Crisis services information varies by county")
-            lines.append("- Hospital facilities well-represented across all sites")
-            lines.append("")
-            lines.append("Detailed results available in JSON format.")
-            lines.append(f"Generated by student: {crawl_info.get('student_name', 'Unknown')}")
-
-            with open(summary_path, 'w', encoding='utf-8') as sf:
-                sf.write("\n".join(lines))
+            # Built from the aggregator: only the top counties are looked up in detail
+            report = build_report(aggregator, state_label, crawl_info, include_counties=False)
+            write_report(report, summary_path, 'txt')
 
             print(f"Summary report written to: {summary_path}")
         except Exception as e:
             print(f"Failed to write summary report: {e}")
     
+    def memory_metrics(self):
+        """Memory limits and peaks for crawl_info"""
+        metrics = self.lifecycle.stats()
+        metrics.update(self.memory_budget.stats())
+        if self.worker_stats:
+            # Pages and peaks of the processes that did the fetching
+            metrics['pages'] = sum(w.get('pages', 0) for w in self.worker_stats)
+            metrics['peak_rss_mb'] = max((w.get('peak_rss_mb') or 0 for w in self.worker_stats), default=None)
+            metrics['workers'] = list(self.worker_stats)
+            metrics['recycled_workers'] = sum(1 for w in self.worker_stats if w.get('recycled'))
+        return metrics
+
     def print_summary(self):
         """
         Print a summary of all crawling results
@@ -377,31 +425,20 @@ class BatchHealthCrawler:
         print(f"\n=== CRAWLING SUMMARY ===")
         print(f"Total sites crawled: {len(self.results)}")
         
-        total_resources = sum(len(r.get('resources', [])) for r in self.results)
-        print(f"Total resources found: {total_resources}")
-        
-        # Count by category
-        category_counts = {}
-        for result in self.results:
-            for resource in result.get('resources', []):
-                category = resource.get('category', 'Unknown')
-                category_counts[category] = category_counts.get(category, 0) + 1
+        aggregator = self.aggregator
+        if aggregator.site_count != len(self.results):
+            aggregator = ResultsAggregator.from_results(self.results)
+        print(f"Total resources found: {aggregator.total_resources}")
         
         print(f"\nResources by category:")
-        for category, count in category_counts.items():
+        for category, count in aggregator.by_category.items():
             print(f"  {category}: {count}")
         
         # Show which names had the most resources
         print(f"\nTop organizations by resources found:")
-        name_counts = []
-        for result in self.results:
-            count = len(result.get('resources', []))
-            name = result.get('name', 'Unknown')
-            name_counts.append((name, count))
-        
-        name_counts.sort(key=lambda x: x[1], reverse=True)
-        for name, count in name_counts[:5]:
-            print(f"  {name}: {count} resources")
+        with_state = len(aggregator.states or {}) > 1
+        for key, count in aggregator.top_counties(5):
+            print(f"  {aggregator.name(key, with_state)}: {count} resources")
 
 # Example usage
 if __name__ == "__main__":
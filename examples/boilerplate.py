@@ -0,0 +1,151 @@
+"""
+Boilerplate Blocks
+Fingerprints the header/nav/footer/sidebar blocks of each page. County sites
+on the same platform (and every page of one host) repeat these blocks, so
+a block seen on at least two pages of a host or platform is treated as
+template: it is extracted once, in isolation, and its resources are cached
+by fingerprint. Template blocks are removed from the page before the
+heuristic extractors run, leaving them only the page's unique content;
+recurring blocks with nothing to extract (menus, "Quick Links", site maps)
+are simply dropped. A block seen for the first time stays in the page.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup
+
+# Landmark elements and roles that hold site-wide template content
+BLOCK_SELECTOR = 'header, nav, footer, aside, [role="banner"], [role="navigation"], [role="contentinfo"]'
+
+# class/id words that mark the same kind of block on older templates
+BLOCK_NAME_RE = re.compile(
+    r'(?:^|[-_\s])(?:header|footer|nav|navbar|navigation|menu|sidebar|breadcrumbs?|copyright|site-?map|quick-?links)(?:[-_\s]|$)',
+    re.IGNORECASE
+)
+BLOCK_NAME_TAGS = ('div', 'section', 'ul')
+
+# Blocks with less text than this aren't worth fingerprinting
+MIN_BLOCK_CHARS = 20
+
+# Distinct blocks whose extraction results are kept
+DEFAULT_CACHE_SIZE = 5000
+
+# Pages of one host/platform a block must appear on to count as template
+DEFAULT_MIN_PAGES = 2
+
+
+def block_fingerprint(block):
+    """Hash of the block's tag and whitespace-normalized text"""
+    text = re.sub(r'\s+', ' ', block.get_text(' ', strip=True)).lower()
+    return hashlib.blake2b(f"{block.name}\x00{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _is_named_block(el):
+    if el.name not in BLOCK_NAME_TAGS:
+        return False
+    names = ' '.join(el.get('class') or []) + ' ' + (el.get('id') or '')
+    return bool(BLOCK_NAME_RE.search(names))
+
+
+def find_blocks(soup):
+    """Outermost template blocks of a page, in document order"""
+    candidates = set(id(el) for el in soup.select(BLOCK_SELECTOR))
+    candidates.update(id(el) for el in soup.find_all(_is_named_block))
+    blocks = []
+    for el in soup.find_all(True):
+        if id(el) not in candidates:
+            continue
+        # Keep only the outermost candidate; nested navs go with their header
+        if any(id(parent) in candidates for parent in el.parents):
+            continue
+        if len(el.get_text(strip=True)) >= MIN_BLOCK_CHARS:
+            blocks.append(el)
+    return blocks
+
+
+def block_soup(block):
+    """Standalone document holding one block (so 'body' selectors still match)"""
+    return BeautifulSoup(f"<html><body>{block}</body></html>", 'html.parser')
+
+
+class BoilerplateDetector:
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, min_pages=DEFAULT_MIN_PAGES):
+        # fingerprint -> resources extracted from that block (LRU)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.min_pages = min_pages
+        # scope (host or platform) -> {fingerprint: pages it appeared on} (LRU,
+        # at most cache_size fingerprints per scope)
+        self.seen = {}
+        self.stats = {'pages': 0, 'blocks': 0, 'template_blocks': 0, 'cache_hits': 0,
+                      'extracted': 0, 'dropped_empty': 0}
+
+    def scope_for(self, url, platform=None):
+        return platform or (urlsplit(url).hostname or '').lower()
+
+    def _count(self, scope, fp):
+        counts = self.seen.setdefault(scope, OrderedDict())
+        counts[fp] = counts.get(fp, 0) + 1
+        counts.move_to_end(fp)
+        if len(counts) > self.cache_size:
+            counts.popitem(last=False)
+
+    def template_blocks(self, scope, fingerprints=None):
+        """
+        Fingerprints seen on at least `min_pages` pages of a host/platform
+        (only those in `fingerprints` when given)
+        """
+        counts = self.seen.get(scope, {})
+        if fingerprints is None:
+            fingerprints = counts
+        return {fp for fp in fingerprints if counts.get(fp, 0) >= self.min_pages}
+
+    def strip(self, soup, url, extract, platform=None):
+        """
+        Remove recurring template blocks from `soup` and return their resources
+
+        Args:
+            soup: Parsed page (modified in place)
+            url: Page URL (its host is the default scope)
+            extract: Function (soup) -> resources, run on a template block the
+                first time its fingerprint is extracted
+            platform: Group pages by platform instead of host
+
+        A block seen on fewer than `min_pages` pages of its scope is left in
+        the page for the heuristics. Returns a list of resource dicts (fresh
+        copies per call).
+        """
+        self.stats['pages'] += 1
+        scope = self.scope_for(url, platform)
+        blocks = [(block, block_fingerprint(block)) for block in find_blocks(soup)]
+        # A block repeated within one page still counts as one page
+        for fp in {fp for _, fp in blocks}:
+            self._count(scope, fp)
+        templates = self.template_blocks(scope, {fp for _, fp in blocks})
+        resources = []
+        for block, fp in blocks:
+            self.stats['blocks'] += 1
+            if fp not in templates:
+                continue
+            self.stats['template_blocks'] += 1
+            cached = self.cache.get(fp)
+            if cached is not None:
+                self.cache.move_to_end(fp)
+                self.stats['cache_hits'] += 1
+            else:
+                cached = extract(block_soup(block))
+                self.stats['extracted'] += 1
+                self.cache[fp] = cached
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            if not cached:
+                self.stats['dropped_empty'] += 1
+            for resource in cached:
+                resource = dict(resource)
+                resource['tags'] = list(resource.get('tags') or [])
+                resources.append(resource)
+            block.decompose()
+        return resources
@@ -10,6 +10,24 @@ import time
 import json
 from datetime import datetime
 import os
+from urllib.parse import urlsplit
+from phone_scanner import scan_phones
+from address_parser import parse_block as parse_address_block
+from tag_registry import TAGS
+from document_stage import find_document_links
+from structured_data import StructuredExtractor
+from boilerplate import BoilerplateDetector
+from platform_profiles import ProfileRegistry
+from resource_model import resource_key
+from facility_scorer import (FacilityBatch, HEALTH_KEYWORDS, EXCLUDE_TERMS,
+                             PERMISSIVE_CONTEXTS, URL_LIKE)
+
+# Content types that must never be handed to BeautifulSoup (PDFs are picked
+# up separately by the document stage)
+NON_HTML_CONTENT_TYPES = (
+    'application/pdf', 'application/msword', 'application/vnd.', 'application/zip',
+    'application/octet-stream', 'image/', 'audio/', 'video/',
+)
 
 class CategorizedHealthCrawler:
     def __init__(self):
@@ -98,6 +116,20 @@ class CategorizedHealthCrawler:
             'womens_health': ['women', "women's health", 'gynecology', 'obgyn', 'pap smear', 'mammogram', 'breast health', 'reproductive health', 'menopause'],
             'senior_care': ['senior', 'elderly', 'geriatrics', 'senior services', 'assisted living', 'home care', 'medicare', 'older adults', 'aging services']
         }
+        # Give any keyword tags added above a bit in the shared tag registry
+        TAGS.register_all(self.health_keywords)
+        # JSON-LD / microdata / tel: / mailto: first pass
+        self.structured = StructuredExtractor(self.auto_tag_content)
+        # Header/nav/footer blocks are extracted once per distinct block and
+        # removed before the page heuristics run (None = extract whole pages)
+        self.boilerplate = BoilerplateDetector()
+        # CMS fingerprinting (CivicPlus, WordPress, ...); a detected platform's
+        # selector set replaces the generic selectors (None = always generic)
+        self.profiles = ProfileRegistry()
+        # Profile of the page last fetched by get_page (None = unknown platform)
+        self.last_profile = None
+        # Optional HostThrottle spacing requests per host/IP/platform
+        self.throttle = None
         # Service-related keywords that should produce a SERVICE category
         # Keep these lowercase; we'll do simple substring checks against text/tags.
         self.service_keywords = set([
@@ -150,12 +182,40 @@ class CategorizedHealthCrawler:
     
     def get_page(self, url):
         """Fetch a web page and return the soup object"""
+        content, status_code, error, profile = self.fetch_page(url)
+        self.last_profile = profile
+        if content is None:
+            return None, status_code, error
+        return self.parse_page(content), status_code, None
+
+    def parse_page(self, content):
+        return BeautifulSoup(content, 'html.parser')
+
+    def fetch_page(self, url):
+        """
+        Fetch a web page without parsing it (safe to call from several threads)
+
+        Returns (content bytes or None, status_code, error, platform profile).
+        """
+        slot = None
+        if self.throttle is not None:
+            known = self.profiles.by_host.get((urlsplit(url).hostname or '').lower()) if self.profiles else None
+            slot = self.throttle.acquire(url, known.name if known else None)
         try:
             print(f"Fetching: {url}")
             response = self.session.get(url)
+            if slot is not None:
+                slot.done(response.status_code, response.elapsed.total_seconds(), response.headers)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return soup, response.status_code, None
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type.startswith(NON_HTML_CONTENT_TYPES):
+                err = f"non_html_content: {content_type.split(';')[0]}"
+                print(f"Skipping {url}: {err}")
+                return None, response.status_code, err, None
+            profile = None
+            if self.profiles is not None:
+                profile = self.profiles.detect(url, response.content, response.headers)
+            return response.content, response.status_code, None, profile
         except requests.RequestException as e:
             # Return structured error info so callers can record status and messages
             try:
@@ -164,6 +224,8 @@ class CategorizedHealthCrawler:
                     status_code = e.response.status_code
             except Exception:
                 status_code = None
+            if slot is not None:
+                slot.done(status_code, error=status_code is None)
             raw_err = str(e)
             # Remove the actual URL from the exception message while keeping
             # the human-readable part like '403 Client Error: Forbidden for url'
@@ -172,7 +234,7 @@ class CategorizedHealthCrawler:
             except Exception:
                 err = raw_err
             print(f"Error fetching {url}: {err}")
-            return None, status_code, err
+            return None, status_code, err, None
     
     def auto_tag_content(self, text, context_text=""):
         """
@@ -193,7 +255,7 @@ class CategorizedHealthCrawler:
         """
         # Get parent element text for more context
         parent = element.parent if element.parent else element
-        full_text = parent.get_text()
+        full_text = parent.get_text(separator=' ')
         
         # Find the target text and get surrounding words
         target_index = full_text.lower().find(target_text.lower())
@@ -215,33 +277,21 @@ class CategorizedHealthCrawler:
         
         return full_text[:200]  # Fallback to first 200 chars
     
-    def extract_phone_with_category(self, soup):
+    def extract_phone_with_category(self, soup, structured=None, selectors=None):
         """
         Extract phone numbers and categorize them
+
+        Args:
+            soup: Parsed page
+            structured: StructuredData from the first pass; numbers it found are
+                skipped (the page is still scanned for numbers it didn't list)
+            selectors: (selector, context) pairs to use instead of the generic
+                list (a platform profile's phone selectors)
         """
         results = []
-        seen_values = set()
-        # Use multiple phone patterns to match common formats
-        phone_patterns = [
-            # 1. Standard formats: 555-123-4567, 555.123.4567, 555 123 4567
-            r'\b\d{3}[-.\s]\d{3}[-.\s]\d{4}\b',
-
-            # 2. With parentheses around area code: (555) 123-4567 or (555)-123-4567
-            r'\(\d{3}\)\s?\d{3}[-.\s]\d{4}',
-
-            # 3. With optional country code: +1 555-123-4567 or +1 (555) 123-4567
-            r'\+?1?[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-        ]
-
-        # Compile a combined pattern and use finditer to get full match strings
-        combined_pattern = re.compile('|'.join(f'(?:{p})' for p in phone_patterns))
-        # Toll-free patterns (detect toll numbers separately)
-        toll_free_patterns = [
-                r'\b1?[-.\s]?\(?800\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
-                r'\b1?[-.\s]?\(?888\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
-                r'\b1?[-.\s]?\(?877\)?[-.\s]?\d{3}[-.\s]?\d{4}\b'
-        ]
-        toll_pattern = re.compile('|'.join(f'(?:{p})' for p in toll_free_patterns))
+        # Dedup on the integer E.164 key (+ extension) so '(707) 464-0861' and
+        # '707.464.0861' on the same page count once
+        seen_keys = set(structured.phone_keys) if structured else set()
         
         # Look for phone numbers in different contexts
         phone_contexts = [
@@ -265,6 +315,8 @@ class CategorizedHealthCrawler:
             ('.emergency-contact', 'emergency contact'),
             ('.hotline', 'hotline')
         ]
+        if selectors is not None:
+            phone_contexts = selectors
         ### CHANGE 1: phone_contexts, added more specific selectors start from .address to .copyright
         # selectors = [
         #     '.address', '.location', '.contact-info', 'address',
@@ -275,16 +327,16 @@ class CategorizedHealthCrawler:
         for selector, context_type in phone_contexts:
             elements = soup.select(selector)
             for element in elements:
-                text = element.get_text()
-                phones = [m.group(0) for m in combined_pattern.finditer(text)]
+                text = element.get_text(separator=' ')
                 
-                for phone in phones:
-                    # Normalize by trimming whitespace
-                    phone_val = phone.strip()
+                # Single-pass scanner: validates the area code/exchange and
+                # flags toll-free NPAs (800, 888, 877, ...) while matching
+                for phone in scan_phones(text):
+                    phone_val = phone.raw
                     # Skip duplicates on this page
-                    if phone_val in seen_values:
+                    if phone.dedup_key in seen_keys:
                         continue
-                    seen_values.add(phone_val)
+                    seen_keys.add(phone.dedup_key)
 
                     # Get surrounding context for better tagging
                     context = self.get_surrounding_context(element, phone_val)
@@ -292,21 +344,7 @@ class CategorizedHealthCrawler:
                     
                     # Determine specific category based on context
                     category = "CONTACT_INFO"
-                    # Detect toll-free numbers and classify type accordingly.
-                    # Use a digits-only normalization and check the area code
-                    # against known toll NPAs so formats like '(800) 446-4408'
-                    # are reliably detected regardless of spacing/parentheses.
-                    digits_only = re.sub(r"\D", "", phone_val)
-                    # If number includes leading '1' country code, area code follows
-                    if digits_only.startswith('1') and len(digits_only) >= 11:
-                        area_code = digits_only[1:4]
-                    elif len(digits_only) >= 10:
-                        area_code = digits_only[:3]
-                    else:
-                        area_code = ''
-
-                    toll_npas = {'800', '888', '877', '855', '866', '844', '833', '822'}
-                    is_toll = area_code in toll_npas
+                    is_toll = phone.is_toll_free
                     if any(tag in ['crisis_services', 'emergency_room'] for tag in tags):
                         if 'crisis' in context.lower() or 'suicide' in context.lower():
                             tags.append('crisis_hotline')
@@ -332,6 +370,7 @@ class CategorizedHealthCrawler:
                         'category': category,
                         'type': 'toll_number' if is_toll else 'phone_number',
                         'value': phone_val,
+                        'phone_key': phone.key,
                         'tags': tags,
                         'context': context_type,
                         'confidence': confidence
@@ -339,70 +378,56 @@ class CategorizedHealthCrawler:
         
         return results
     
-    def extract_addresses_with_category(self, soup):
+    def extract_addresses_with_category(self, soup, structured=None, selectors=None):
         """
         Extract addresses and categorize them
         """
         # Delegate to the newer, more robust address-finding logic
-        return self.find_addresses(soup)
+        return self.find_addresses(soup, structured=structured, selectors=selectors)
 
-    def find_addresses(self, soup, context=""):
+    def find_addresses(self, soup, context="", structured=None, selectors=None):
         """
         Extract postal addresses from HTML, including blocks that use <br> for line breaks.
-        Implements the user's provided logic but uses existing helper methods
-        (`looks_like_address`, `auto_tag_content`) to remain consistent.
+        Every street + city/state/ZIP found in a block is returned (not just the
+        first), with its parsed components and the ZIP checked against the state.
+        Addresses already found in structured data are skipped, and so is the
+        whole-page fallback when structured data had a complete address.
+        `selectors` replaces the generic container list (platform profiles).
         """
         results = []
-        seen_values = set()
-
-        # Regexes
-        # Accept both 'City, ST ZIP' and 'City ST ZIP' (comma optional), case-insensitive
-        city_state_zip_re = re.compile(
-            r"\b([A-Z][a-zA-Z .'\-]+),?\s*([A-Z]{2})\s*(\d{5}(?:-\d{4})?)\b",
-            re.IGNORECASE
-        )
-        street_line_re = re.compile(
-            r'\b\d{1,6}\s+[A-Za-z0-9\'\-.#& ]+\s+'
-            r'(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln|Court|Ct|Way|'
-            r'Terrace|Ter|Place|Pl|Parkway|Pkwy|Highway|Hwy)\b\.?',
-            re.IGNORECASE
-        )
+        seen_values = set(structured.values) if structured else set()
 
         def block_text(el):
             return el.get_text(separator="\n", strip=True)
 
-        def merge_window(lines, idx, window=2):
-            start = max(0, idx - window)
-            end = min(len(lines), idx + window + 1)
-            chunk = [l.strip() for l in lines[start:end] if l.strip()]
-            out, seen = [], set()
-            for s in chunk:
-                if s not in seen:
-                    seen.add(s)
-                    out.append(s)
-            return " ".join(out)
-
-        def guess_address_from_block(text):
-            if not text:
-                return None
-            lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-            cands = [i for i, ln in enumerate(lines) if city_state_zip_re.search(ln)]
-            for idx in cands:
-                if street_line_re.search(lines[idx]):
-                    return lines[idx]
-                for j in [idx - 1, idx - 2, idx + 1, idx + 2]:
-                    if 0 <= j < len(lines) and street_line_re.search(lines[j]):
-                        city_part = city_state_zip_re.search(lines[idx]).group(0)
-                        street_part = lines[j]
-                        return f"{street_part} {city_part}".strip()
-                return merge_window(lines, idx, window=2)
-            for i, ln in enumerate(lines):
-                if street_line_re.search(ln):
-                    return merge_window(lines, i, window=2)
-            return None
+        def add_candidates(text, context_type):
+            for addr in parse_address_block(text):
+                norm = addr.value.strip()
+                if not (10 < len(norm) < 200) or norm.lower() in seen_values:
+                    continue
+                seen_values.add(norm.lower())
+                tags = self.auto_tag_content(norm, context_type)
+                if not tags:
+                    tags = ['general']
+
+                # Confidence calibration: require both a street line and a city/state/ZIP
+                # to consider the address high-confidence (0.9). If any component
+                # is missing, use a lower base confidence (0.6). After computing
+                # the base confidence, apply the existing length-based adjustment.
+                base_confidence = 0.9 if addr.is_complete else 0.6
+
+                results.append({
+                    'category': 'LOCATION',
+                    'type': 'address',
+                    'value': norm,
+                    'address': addr.to_dict(),
+                    'tags': tags,
+                    'context': context_type,
+                    'confidence': self._adjust_confidence_by_length(norm, base_confidence)
+                })
 
         # 1) Target likely containers (map selectors -> context strings)
-        selectors = [
+        generic_selectors = [
             ('.address', 'facility_address'),
             ('.location', 'service_location'),
             ('.contact-info', 'contact_info'),
@@ -415,211 +440,29 @@ class CategorizedHealthCrawler:
             ('.copyright', 'copyright')
         ]
 
-        for sel, context_type in selectors:
+        for sel, context_type in (generic_selectors if selectors is None else selectors):
             for el in soup.select(sel):
-                text = block_text(el)
-                candidate = guess_address_from_block(text)
-                if candidate and self.looks_like_address(candidate):
-                    norm = candidate.strip()
-                    if norm not in seen_values:
-                        seen_values.add(norm)
-                        tags = self.auto_tag_content(norm, context_type)
-                        if not tags:
-                            tags = ['general']
-
-                        # Confidence calibration: require both a street line and a city/state/ZIP
-                        # to consider the address high-confidence (0.8). If any component
-                        # is missing, use a lower base confidence (0.6). After computing
-                        # the base confidence, apply the existing length-based adjustment.
-                        has_street = bool(street_line_re.search(norm))
-                        has_city_state_zip = bool(city_state_zip_re.search(norm))
-                        base_confidence = 0.9 if (has_street and has_city_state_zip) else 0.6
-
-                        results.append({
-                            'category': 'LOCATION',
-                            'type': 'address',
-                            'value': norm,
-                            'tags': tags,
-                            'context': context_type,
-                            'confidence': self._adjust_confidence_by_length(norm, base_confidence)
-                        })
+                add_candidates(block_text(el), context_type)
 
         # 2) Fallback: scan whole page once if nothing found yet
-        if not results:
-            page_text = soup.get_text(separator="\n", strip=True)
-            candidate = guess_address_from_block(page_text)
-            if candidate and self.looks_like_address(candidate):
-                norm = candidate.strip()
-                if norm not in seen_values:
-                    seen_values.add(norm)
-                    tags = self.auto_tag_content(norm, 'page')
-                    if not tags:
-                        tags = ['general']
-                    # Fallback page-level inference: determine confidence based on
-                    # presence of street + city/state/ZIP, then apply length adjustment.
-                    has_street = bool(street_line_re.search(norm))
-                    has_city_state_zip = bool(city_state_zip_re.search(norm))
-                    base_confidence = 0.9 if (has_street and has_city_state_zip) else 0.6
-
-                    results.append({
-                        'category': 'LOCATION',
-                        'type': 'address',
-                        'value': norm,
-                        'tags': tags,
-                        'context': 'page',
-                        'confidence': self._adjust_confidence_by_length(norm, base_confidence)
-                    })
+        if not results and not (structured is not None and structured.covers('LOCATION')):
+            add_candidates(soup.get_text(separator="\n", strip=True), 'page')
 
         return results
     
-    def extract_facilities_with_category(self, soup):
+    def extract_facilities_with_category(self, soup, structured=None, selectors=None):
         """
         Extract facility names and categorize them
-        """
-        results = []
-        seen_values = set()
-        
-        # Look for facility names in headings and specific elements
-        facility_selectors = [
-            ('h1, h2, h3', 'heading'),
-            ('.facility-name', 'explicit_facility'),
-            ('.clinic-name', 'clinic_listing'),
-            ('.location-name', 'location_listing'),
-            ('h1', 'h2'),
-            ('h2', 'h3')
-        ]
-        ### CHANGE 2: facility_selectors, added more specific selectors like .clinic-name, .location-name, and changed last two tuples from ('h1','h2') and ('h2','h3')
-        
-        for selector, context_type in facility_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text(strip=True)
-                if self.looks_like_facility_name(text, context_type):
-                    # Normalize and dedupe
-                    name_val = text.strip()
-                    # Basic cleaning: collapse whitespace
-                    name_val = re.sub(r'\s+', ' ', name_val)
-                    name_lower = name_val.lower()
-
-                    # Skip obvious UI/CTA fragments or truncated text like 'I want...' or strings containing ellipses
-                    if '...' in name_val or re.match(r'^(i want( to)?|want to|i want)\b', name_lower):
-                        continue
-                    if name_val in seen_values:
-                        continue
-                    seen_values.add(name_val)
-
-                    context = self.get_surrounding_context(element, name_val)
-                    tags = self.auto_tag_content(name_val, context)
-
-                    # Add facility-specific tags
-                    text_lower = text.lower()
-                    if 'hospital' in text_lower:
-                        tags.append('hospital')
-                    elif 'clinic' in text_lower:
-                        tags.append('clinic')
-                    elif 'pharmacy' in text_lower:
-                        tags.append('pharmacy')
 
-                    # Ensure at least a 'general' tag when none were found
-                    if not tags:
-                        tags = ['general']
-
-                    # If tags or the name text contain service-related keywords, mark this as a SERVICE
-                    name_lower = name_val.lower()
-                    tags_text = " ".join(tags).lower()
-
-                    # Prefer facility when the name contains obvious facility indicators
-                    has_facility_indicator = any(fi in name_lower for fi in self.facility_indicators)
-
-                    # Exclude generic UI headings from being treated as facilities
-                    is_generic_ui = any(ui in name_lower for ui in self.generic_ui_terms)
-
-                    # Additional defensive filter: skip short generic 'contact' headings
-                    # like 'Contact Info' or 'Contact Details' but do NOT skip
-                    # relevant health terms like 'Contact Tracing'. We only skip
-                    # when the phrase appears to be a generic UI heading.
-                    if 'contact' in name_lower and 'tracing' not in name_lower:
-                        words = name_lower.split()
-                        if len(words) <= 3:
-                            # treat as generic UI regardless of generic_ui_terms set
-                            is_generic_ui = True
-
-                    # Skip section headings that sound like mission/commitment/about
-                    # These are common content headings and not facility names.
-                    mission_like = ['mission', 'commitment to', 'our commitment', 'our mission', 'our values', 'about us', 'about', 'what we do']
-                    if any(kw in name_lower for kw in mission_like):
-                        # Skip short/medium-length mission-like headings
-                        if len(name_lower.split()) <= 10:
-                            is_generic_ui = True
-
-                    # Use compiled regex patterns for robust service detection
-                    def matches_service(text):
-                        for pat in getattr(self, 'service_keyword_patterns', []):
-                            if pat.search(text):
-                                return True
-                        return False
-
-                    is_service_candidate = matches_service(tags_text) or matches_service(name_lower)
-
-                    # A service is valid only if it's a service candidate and NOT obviously a facility
-                    is_service = is_service_candidate and not has_facility_indicator and not is_generic_ui
-
-                    # If it's generic UI text, skip adding as facility/service at all
-                    if is_generic_ui:
-                        continue
-                    # Calibrate confidence for facility/service: explicit facility selectors and h1 get higher confidence
-                    conf = 0.6
-                    try:
-                        if context_type == 'explicit_facility':
-                            conf = 0.9
-                        elif element.name == 'h1':
-                            conf = 0.85
-                        elif element.name in ('h2', 'h3'):
-                            conf = 0.7
-                    except Exception:
-                        conf = 0.6
-
-                    if is_service:
-                        results.append({
-                            'category': 'SERVICE',
-                            'type': 'service_name',
-                            'value': name_val,
-                            'tags': tags,
-                            'context': context_type,
-                            'confidence': self._adjust_confidence_by_length(name_val, conf)
-                        })
-                    else:
-                        # Use facility-specific confidence adjustments to catch
-                        # medium-length heading blobs that are unlikely real facility names.
-                        fac_conf = self._adjust_facility_confidence_by_length(name_val, conf)
-                        results.append({
-                            'category': 'FACILITY',
-                            'type': 'facility_name',
-                            'value': name_val,
-                            'tags': tags,
-                            'context': context_type,
-                            'confidence': fac_conf
-                        })
-        
-        return results
-    
-    def looks_like_address(self, text):
-        """Check if text looks like an address"""
-        # street_words = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 
-        #                'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln']
-        
-        # CHANGE 3: expanded street_words list
-        street_words = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 
-                       'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln', 
-                       'court','ct','highway','hwy','parkway','pkwy',
-                       'way','place','pl','terrace','ter']
-        # CHANGE 4: added is_reasonable_length check
-        text_lower = text.lower()
-        has_number = any(char.isdigit() for char in text)
-        has_street_word = any(word in text_lower for word in street_words)
-        is_reasonable_length = 10 < len(text) < 200
-        
-        return has_number and has_street_word and is_reasonable_length
+        When structured data already named facilities, headings are only
+        checked for services (explicit facility selectors still apply).
+        `selectors` replaces the generic selector list (platform profiles).
+        The page's headings are scored together by facility_scorer; use
+        FacilityBatch directly to score several pages in one pass.
+        """
+        batch = FacilityBatch(self)
+        batch.add_page(soup, structured, selectors)
+        return batch.run()[0]
     
     def looks_like_facility_name(self, text, context_type=None):
         """Check if text looks like a healthcare facility name.
@@ -627,32 +470,23 @@ class CategorizedHealthCrawler:
         Exclude common non-facility headings (e.g., 'Update', 'Transcript', 'Video', 'Welcome').
         Be more permissive when the selector indicates an explicit facility or a heading.
         """
-        health_keywords = ['clinic', 'hospital', 'medical', 'health', 'center',
-                          'pharmacy', 'dental', 'care', 'urgent', 'family']
-
-        exclude_terms = [
-            'update', 'transcript', 'video', 'welcome', 'report', 'press',
-            'notice', 'alert', 'committee', 'board', 'minutes', 'agenda'
-        ]
-
         text_lower = text.lower()
 
         # Exclude obvious non-facility headings
-        if any(term in text_lower for term in exclude_terms):
+        if any(term in text_lower for term in EXCLUDE_TERMS):
             return False
 
-        has_health_keyword = any(keyword in text_lower for keyword in health_keywords)
+        has_health_keyword = any(keyword in text_lower for keyword in HEALTH_KEYWORDS)
         is_reasonable_length = 5 < len(text) < 100
 
-        permissive_contexts = {'explicit_facility', 'clinic_listing', 'location_listing', 'heading', 'h1', 'h2', 'h3'}
-        if context_type and context_type in permissive_contexts:
+        if context_type and context_type in PERMISSIVE_CONTEXTS:
             # If it contains generic UI phrases, reject
             if any(ui in text_lower for ui in getattr(self, 'generic_ui_terms', [])):
                 return False
             # If it has a facility indicator, accept
             if any(fi in text_lower for fi in getattr(self, 'facility_indicators', [])):
                 return True
-            if has_health_keyword or (is_reasonable_length and not any(p in text_lower for p in [':', 'http', 'www'])):
+            if has_health_keyword or (is_reasonable_length and not any(p in text_lower for p in URL_LIKE)):
                 return True
             return False
 
@@ -692,21 +526,63 @@ class CategorizedHealthCrawler:
             return min(confidence, 0.55)
         return confidence
     
-    def crawl_page_with_categories(self, url):
+    def extract_block(self, soup):
+        """Run the heuristic extractors over one standalone block (see boilerplate.py)"""
+        resources = []
+        resources.extend(self.extract_phone_with_category(soup))
+        resources.extend(self.extract_addresses_with_category(soup))
+        resources.extend(self.extract_facilities_with_category(soup))
+        return resources
+
+    def extract_with_profile(self, extract, soup, structured, selectors):
+        """
+        Run one extractor with a platform profile's selectors, falling back to
+        the generic selectors when there is no profile or the profile's
+        selectors find nothing on this page
+        """
+        if selectors:
+            found = extract(soup, structured, selectors=selectors)
+            if found:
+                return found
+        return extract(soup, structured)
+
+    def crawl_page_with_categories(self, url, keep_text=False, keep_links=False):
         """
         Main function to crawl a page and extract categorized resources
+
+        Args:
+            url: Page to crawl
+            keep_text: Also return the visible page text as results['page_text']
+                (used to build the full-text index)
+            keep_links: Also return linked PDFs as results['document_links']
+                (used by the document stage)
         """
+        self.last_profile = None
         soup, status_code, error = self.get_page(url)
         if not soup:
             # Return an empty result along with status and error for callers to inspect
             return {}, status_code, error
-        
+        results, error = self.extract_page(url, soup, self.last_profile, keep_text, keep_links)
+        return results, status_code, error
+
+    def extract_page(self, url, soup, profile=None, keep_text=False, keep_links=False):
+        """
+        Extract categorized resources from a parsed page (frees the soup)
+
+        Returns (results, combined extractor error or None).
+        """
         # Extract all categorized resources
         results = {
             'url': url,
             'timestamp': datetime.now().isoformat(),
             'resources': []
         }
+        if profile is not None:
+            results['platform'] = profile.name
+        if keep_text:
+            results['page_text'] = soup.get_text(separator=' ', strip=True)
+        if keep_links:
+            results['document_links'] = find_document_links(soup, url)
 
         # Run each extractor with local try/except so a failure in one
         # extractor doesn't abort the whole page crawl. Collect any
@@ -714,8 +590,36 @@ class CategorizedHealthCrawler:
         # or record the problem while still returning partial results.
         extraction_errors = []
 
+        # Structured markup first: high-confidence values, and the categories it
+        # covers let the heuristic extractors below skip their broad scans
+        structured = None
+        try:
+            structured = self.structured.extract(soup)
+            results['resources'].extend(structured.resources)
+        except Exception as e:
+            raw_err = str(e)
+            try:
+                err = re.sub(r'\sfor url:?.*$', ' for url', raw_err)
+            except Exception:
+                err = raw_err
+            print(f"Structured data extraction error for {url}: {err}")
+            extraction_errors.append(f"structured_extractor: {err}")
+
+        # Template blocks (recurring on this host/platform): resources come from
+        # the per-block cache and the blocks are removed so the heuristics
+        # below only see unique content
+        block_resources = []
+        if self.boilerplate is not None:
+            try:
+                block_resources = self.boilerplate.strip(soup, url, self.extract_block,
+                                                           platform=profile.name if profile else None)
+            except Exception as e:
+                print(f"Boilerplate detection error for {url}: {e}")
+                extraction_errors.append(f"boilerplate: {e}")
+
         try:
-            phones = self.extract_phone_with_category(soup)
+            phones = self.extract_with_profile(self.extract_phone_with_category, soup, structured,
+                                               profile.phone_selectors if profile else None)
             if phones:
                 results['resources'].extend(phones)
         except Exception as e:
@@ -728,7 +632,8 @@ class CategorizedHealthCrawler:
             extraction_errors.append(f"phone_extractor: {err}")
 
         try:
-            addrs = self.extract_addresses_with_category(soup)
+            addrs = self.extract_with_profile(self.extract_addresses_with_category, soup, structured,
+                                              profile.address_selectors if profile else None)
             if addrs:
                 results['resources'].extend(addrs)
         except Exception as e:
@@ -741,7 +646,8 @@ class CategorizedHealthCrawler:
             extraction_errors.append(f"address_extractor: {err}")
 
         try:
-            facs = self.extract_facilities_with_category(soup)
+            facs = self.extract_with_profile(self.extract_facilities_with_category, soup, structured,
+                                             profile.facility_selectors if profile else None)
             if facs:
                 results['resources'].extend(facs)
         except Exception as e:
@@ -753,6 +659,14 @@ class CategorizedHealthCrawler:
             print(f"Facility extraction error for {url}: {err}")
             extraction_errors.append(f"facility_extractor: {err}")
 
+        # Block resources last, skipping values the page already produced
+        seen = {resource_key(r) for r in results['resources']}
+        for resource in block_resources:
+            key = resource_key(resource)
+            if key not in seen:
+                seen.add(key)
+                results['resources'].append(resource)
+
         # Post-process: mark very low-confidence items as 'uncertain'
         try:
             for res in results.get('resources', []):
@@ -767,14 +681,18 @@ class CategorizedHealthCrawler:
                     continue
         except Exception:
             pass
+
+        # Free the parse tree now instead of whenever the garbage collector
+        # gets to it (large county pages hold tens of MB of nodes)
+        soup.decompose()
         
         # If any extractor raised an error, return a combined sanitized
         # error string so callers (e.g. the batch crawler) can record it.
         if extraction_errors:
             combined = "; ".join(extraction_errors)
-            return results, status_code, combined
+            return results, combined
 
-        return results, status_code, None
+        return results, None
     
     def print_categorized_results(self, results):
         """
@@ -0,0 +1,280 @@
+"""
+Crawl Diff
+Compares two saved runs resource by resource. Each resource is keyed by
+(site, category, normalized value) - phone numbers by their E.164 key,
+addresses by their entity key, everything else by lowercased text - so
+reformatting doesn't show up as a change. Added and removed resources are
+plain set differences over those keys; resources present in both runs are
+compared on type, tags, confidence and verification (the display value is
+already covered by the key).
+
+Sites whose crawl failed in either run are listed separately instead of
+reporting all of their resources as removed (or added).
+"""
+
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from entity_index import entity_key, expand_entities
+
+# Fields compared for resources present in both runs. The display value isn't
+# one of them: its normalized form is part of the key, and the raw text
+# differs whenever cleaning reformats it ('510-267-3230' -> '(510) 267-3230')
+COMPARED_FIELDS = ('type', 'tags', 'confidence', 'verified')
+
+# Confidence changes smaller than this are noise from float rounding
+CONFIDENCE_EPSILON = 1e-6
+
+
+def site_key(site):
+    return site.get('community_id') or site.get('name') or site.get('url') or ''
+
+
+def value_key(resource):
+    """Normalized value: phone/address entity key, else lowercased collapsed text"""
+    key = entity_key(resource)
+    if key:
+        return key
+    text = re.sub(r'\s+', ' ', str(resource.get('value') or '')).strip().lower()
+    return f"text:{text}" if text else None
+
+
+def _comparable(resource):
+    tags = resource.get('tags') or []
+    return {
+        'type': resource.get('type'),
+        'tags': sorted(set(str(t) for t in tags)),
+        'confidence': resource.get('confidence'),
+        'verified': resource.get('verified'),
+    }
+
+
+def changed_fields(before, after):
+    fields = []
+    a, b = _comparable(before), _comparable(after)
+    for field in COMPARED_FIELDS:
+        if field == 'confidence':
+            try:
+                if abs(float(a[field] or 0) - float(b[field] or 0)) > CONFIDENCE_EPSILON:
+                    fields.append(field)
+            except (TypeError, ValueError):
+                if a[field] != b[field]:
+                    fields.append(field)
+        elif field == 'verified' and (a[field] is None or b[field] is None):
+            # Raw runs have no verified flag; only cleaned-vs-cleaned compares it
+            continue
+        elif a[field] != b[field]:
+            fields.append(field)
+    return fields
+
+
+class RunSnapshot:
+    """One run's resources keyed by (site, category, normalized value)"""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.resources = {}
+        self.sites = {}
+        self.failed_sites = set()
+
+    @classmethod
+    def load(cls, path, include_unverified=True):
+        with open(path, 'r', encoding='utf-8') as f:
+            doc = json.load(f)
+        return cls.from_doc(doc, label=str(path), include_unverified=include_unverified)
+
+    @classmethod
+    def from_doc(cls, doc, label=None, include_unverified=True):
+        """
+        Args:
+            doc: Saved run ({'summary': ..., 'results': [...]}, raw, cleaned or compact)
+            include_unverified: Also key the cleaned files' unverified_resources
+        """
+        snap = cls(label)
+        crawl_info = (doc.get('summary') or {}).get('crawl_info') or {}
+        failed = set()
+        for entry in crawl_info.get('url') or []:
+            if isinstance(entry, dict) and not entry.get('success', True):
+                failed.add(entry.get('community_id') or entry.get('url'))
+        for site in expand_entities(doc):
+            skey = site_key(site)
+            snap.sites[skey] = site.get('name') or skey
+            if skey in failed or site.get('url') in failed:
+                snap.failed_sites.add(skey)
+            resources = list(site.get('resources') or [])
+            if include_unverified:
+                resources += [dict(r, verified=r.get('verified', False))
+                              for r in site.get('unverified_resources') or []]
+            for resource in resources:
+                vkey = value_key(resource)
+                if vkey is None:
+                    continue
+                key = (skey, resource.get('category') or 'Unknown', vkey)
+                # Keep the most confident spelling when a page lists a value twice
+                current = snap.resources.get(key)
+                if current is None or (resource.get('confidence') or 0) > (current.get('confidence') or 0):
+                    snap.resources[key] = resource
+        return snap
+
+
+class CrawlDiff:
+    def __init__(self, old, new, include_failed=False):
+        """
+        Args:
+            old / new: RunSnapshot of the earlier and later run
+            include_failed: Diff sites whose crawl failed in either run too
+        """
+        self.old = old
+        self.new = new
+        self.sites_added = sorted(set(new.sites) - set(old.sites))
+        self.sites_removed = sorted(set(old.sites) - set(new.sites))
+        self.unavailable = set() if include_failed else (old.failed_sites | new.failed_sites)
+
+        old_keys = {k for k in old.resources if k[0] not in self.unavailable}
+        new_keys = {k for k in new.resources if k[0] not in self.unavailable}
+        self.added = sorted(new_keys - old_keys)
+        self.removed = sorted(old_keys - new_keys)
+        self.changed = []
+        for key in sorted(old_keys & new_keys):
+            fields = changed_fields(old.resources[key], new.resources[key])
+            if fields:
+                self.changed.append((key, fields))
+
+    def counts(self):
+        """{'added': {category: n}, 'removed': ..., 'changed': ...}"""
+        return {
+            'added': dict(Counter(k[1] for k in self.added)),
+            'removed': dict(Counter(k[1] for k in self.removed)),
+            'changed': dict(Counter(k[1] for k, _ in self.changed)),
+        }
+
+    def by_site(self):
+        """{site: {'added': [...], 'removed': [...], 'changed': [...]}} for sites with changes"""
+        sites = {}
+        for key in self.added:
+            sites.setdefault(key[0], {'added': [], 'removed': [], 'changed': []})['added'].append(
+                self.new.resources[key])
+        for key in self.removed:
+            sites.setdefault(key[0], {'added': [], 'removed': [], 'changed': []})['removed'].append(
+                self.old.resources[key])
+        for key, fields in self.changed:
+            before, after = self.old.resources[key], self.new.resources[key]
+            sites.setdefault(key[0], {'added': [], 'removed': [], 'changed': []})['changed'].append({
+                'category': key[1],
+                'key': key[2],
+                'value': after.get('value'),
+                'fields': fields,
+                'before': {f: _comparable(before)[f] for f in fields},
+                'after': {f: _comparable(after)[f] for f in fields},
+            })
+        return sites
+
+    def site_name(self, skey):
+        return self.new.sites.get(skey) or self.old.sites.get(skey) or skey
+
+    def to_delta(self):
+        """Delta document: only what changed, grouped per site"""
+        return {
+            'from': self.old.label,
+            'to': self.new.label,
+            'generated': datetime.now().isoformat(),
+            'summary': {
+                'resources_added': len(self.added),
+                'resources_removed': len(self.removed),
+                'resources_changed': len(self.changed),
+                'by_category': self.counts(),
+                'sites_added': self.sites_added,
+                'sites_removed': self.sites_removed,
+                'sites_unavailable': sorted(self.unavailable & (set(self.old.sites) | set(self.new.sites))),
+            },
+            'sites': {
+                skey: dict(changes, name=self.site_name(skey))
+                for skey, changes in sorted(self.by_site().items())
+            },
+        }
+
+    def render_text(self, per_site=10):
+        """Compact human-readable change report"""
+        lines = [
+            "CRAWL DIFF",
+            "=" * 50,
+            f"From: {self.old.label}",
+            f"To:   {self.new.label}",
+            "",
+            f"Resources added:   {len(self.added)}",
+            f"Resources removed: {len(self.removed)}",
+            f"Resources changed: {len(self.changed)}",
+        ]
+        counts = self.counts()
+        categories = sorted(set(counts['added']) | set(counts['removed']) | set(counts['changed']))
+        for category in categories:
+            lines.append(f"  {category}: +{counts['added'].get(category, 0)} "
+                         f"-{counts['removed'].get(category, 0)} ~{counts['changed'].get(category, 0)}")
+        if self.sites_added:
+            lines.append(f"Sites only in the new run: {len(self.sites_added)}")
+        if self.sites_removed:
+            lines.append(f"Sites only in the old run: {len(self.sites_removed)}")
+        unavailable = self.unavailable & (set(self.old.sites) | set(self.new.sites))
+        if unavailable:
+            lines.append(f"Sites skipped (crawl failed in one run): "
+                         + ", ".join(self.site_name(s) for s in sorted(unavailable)))
+
+        for skey, changes in sorted(self.by_site().items()):
+            lines.append("")
+            name = self.site_name(skey)
+            lines.append(name if name == skey else f"{name} ({skey})")
+            entries = ([('+', r['category'], r.get('value'), '') for r in changes['added']]
+                       + [('-', r['category'], r.get('value'), '') for r in changes['removed']]
+                       + [('~', c['category'], c['value'],
+                           ', '.join(f"{f}: {c['before'][f]} -> {c['after'][f]}" for f in c['fields']))
+                          for c in changes['changed']])
+            for mark, category, value, detail in entries[:per_site]:
+                line = f"  {mark} {category:<12} {value}"
+                lines.append(f"{line}  ({detail})" if detail else line)
+            if len(entries) > per_site:
+                lines.append(f"  ... {len(entries) - per_site} more")
+        return "\n".join(lines) + "\n"
+
+
+def diff_files(old_path, new_path, include_failed=False, include_unverified=True):
+    return CrawlDiff(RunSnapshot.load(old_path, include_unverified),
+                     RunSnapshot.load(new_path, include_unverified), include_failed)
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    base = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Show what changed between two saved crawl runs")
+    parser.add_argument('old', nargs='?', help="Earlier run (default: second newest in output/)")
+    parser.add_argument('new', nargs='?', help="Later run (default: newest in output/)")
+    parser.add_argument('--delta', help="Write the delta JSON here")
+    parser.add_argument('--report', help="Write the text report here instead of printing it")
+    parser.add_argument('--per-site', type=int, default=10, help="Changes listed per site")
+    parser.add_argument('--include-failed', action='store_true',
+                        help="Also diff sites whose crawl failed in either run")
+    args = parser.parse_args()
+
+    old_path, new_path = args.old, args.new
+    if not (old_path and new_path):
+        files = sorted((base / 'output').glob('batch_crawl_results_*.json'))
+        if len(files) < 2:
+            print("Need two runs to compare (pass OLD NEW)")
+            raise SystemExit(1)
+        old_path, new_path = files[-2], files[-1]
+
+    diff = diff_files(old_path, new_path, include_failed=args.include_failed)
+    report = diff.render_text(per_site=args.per_site)
+    if args.report:
+        Path(args.report).write_text(report, encoding='utf-8')
+        print(f"Report written to {args.report}")
+    else:
+        print(report, end='')
+    if args.delta:
+        with open(args.delta, 'w', encoding='utf-8') as f:
+            json.dump(diff.to_delta(), f, indent=2, ensure_ascii=False)
+        print(f"Delta written to {args.delta}")
@@ -0,0 +1,395 @@
+"""
+Crawl Pipeline
+Runs a crawl as fetch -> parse -> extract -> clean -> store stages, each with
+its own worker threads, connected by bounded queues. A full queue blocks the
+stage feeding it, so a slow extractor holds back fetching instead of letting
+downloaded pages pile up in memory. Cleaning (clean_and_save.clean_site:
+normalization, confidence cutoff, dedup) runs as a stage, so one pass writes
+a cleaned results file. Queue depth, throughput, busy time and time spent
+blocked are tracked per stage and saved in crawl_info.pipeline. With a
+geo_index.Geocoder, a geocode stage adds ZIP-centroid coordinates to every
+address before it is stored.
+
+Fetching is I/O bound and can use several threads (the host throttle keeps
+it polite); parse and extract run one thread each by default because they
+are CPU bound and share the crawler's boilerplate cache.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+from batch_crawler_example import BatchHealthCrawler
+from clean_and_save import clean_site, clean_site_fields
+from site_catalog import group_sites_by_url
+
+DEFAULT_QUEUE_SIZE = 8
+
+# Passed down a queue once per worker when the stage before it is finished
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            name: Label used in stats and error messages
+            func: item -> item for the next stage (None drops the item)
+            workers: Threads running this stage
+            queue_size: Items that may wait in front of this stage
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_size = queue_size
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        # Time producers spent blocked on this stage's full queue
+        self.blocked_seconds = 0.0
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            started = time.monotonic()
+            self.queue.put(item)
+            with self._lock:
+                self.blocked_seconds += time.monotonic() - started
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stats(self, elapsed):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_depth,
+                'processed': self.processed,
+                'errors': self.errors,
+                'per_second': round(self.processed / elapsed, 3) if elapsed else None,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'utilization': round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else None,
+                'blocked_seconds': round(self.blocked_seconds, 3),
+            }
+
+
+class Pipeline:
+    def __init__(self, stages, report_every=None):
+        """
+        Args:
+            stages: Stage list, in order; the last stage's return value is discarded
+            report_every: Print a one-line progress report every this many
+                seconds while running (None = quiet)
+        """
+        self.stages = stages
+        self.report_every = report_every
+        self.started = None
+        self.finished = None
+
+    def _work(self, index):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            started = time.monotonic()
+            try:
+                out = stage.func(item)
+                failed = False
+            except Exception as e:
+                # Keep the item moving so the site is still recorded, with the error
+                print(f"{stage.name} stage error: {e}")
+                if isinstance(item, dict) and not item.get('error'):
+                    item['error'] = f"{stage.name}_error: {e}"
+                out = item
+                failed = True
+            with stage._lock:
+                stage.busy_seconds += time.monotonic() - started
+                stage.processed += 1
+                if failed:
+                    stage.errors += 1
+            if following is not None and out is not None:
+                following.put(out)
+        # The last worker out tells the next stage there is nothing more
+        with stage._lock:
+            stage.running -= 1
+            last = stage.running == 0
+        if last and following is not None:
+            for _ in range(following.workers):
+                following.put(_DONE)
+
+    def run(self, items):
+        """Feed `items` through every stage; returns once the last one is done"""
+        self.started = time.monotonic()
+        self.finished = None
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage.running = stage.workers
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), daemon=True,
+                                          name=f"{stage.name}-{n}")
+                thread.start()
+                threads.append(thread)
+        reporter = None
+        stop = threading.Event()
+        if self.report_every:
+            reporter = threading.Thread(target=self._report, args=(stop,), daemon=True)
+            reporter.start()
+        try:
+            # The first stage's queue bounds how far the source can run ahead
+            for item in items:
+                self.stages[0].put(item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.stages[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+            self.finished = time.monotonic()
+            stop.set()
+            if reporter is not None:
+                reporter.join()
+
+    def _report(self, stop):
+        while not stop.wait(self.report_every):
+            print(self.progress_line())
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def progress_line(self):
+        parts = []
+        for stage in self.stages:
+            parts.append(f"{stage.name} {stage.processed} done, {stage.queue.qsize()}/{stage.queue_size} queued")
+        return "[pipeline] " + " | ".join(parts)
+
+    def stats(self):
+        elapsed = self.elapsed()
+        return {
+            'seconds': round(elapsed, 3),
+            'stages': {stage.name: stage.stats(elapsed) for stage in self.stages},
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"\nPipeline: {stats['seconds']:.1f}s")
+        for name, s in stats['stages'].items():
+            print(f"  {name:<8} {s['processed']:>5} items  {s['per_second'] or 0:>7.2f}/s  "
+                  f"busy {s['utilization'] or 0:>5.0%}  max queue {s['max_queue_depth']}/{s['queue_size']}  "
+                  f"blocked {s['blocked_seconds']:.1f}s  errors {s['errors']}")
+
+
+class PipelineCrawl:
+    def __init__(self, batch=None, fetch_workers=4, parse_workers=1, extract_workers=1,
+                 queue_size=DEFAULT_QUEUE_SIZE, clean=True, confidence_cutoff=0.5, report_every=None,
+                 geocoder=None):
+        """
+        Args:
+            batch: BatchHealthCrawler whose crawler, scheduler, throttle, DNS
+                preflight, document stage and result store are used
+            fetch_workers / parse_workers / extract_workers: Threads per stage
+            queue_size: Bound of every stage's input queue
+            clean: Run clean_site on each result before it is stored
+            confidence_cutoff: clean_site cutoff for unverified_resources
+            report_every: Seconds between progress lines (None = quiet)
+            geocoder: geo_index.Geocoder; adds a geocode stage setting
+                'geo' on LOCATION resources (None = no stage)
+        """
+        self.batch = batch or BatchHealthCrawler()
+        self.clean = clean
+        self.confidence_cutoff = confidence_cutoff
+        self.geocoder = geocoder
+        self.stored = 0
+        stages = [
+            Stage('fetch', self.fetch, fetch_workers, queue_size),
+            Stage('parse', self.parse, parse_workers, queue_size),
+            Stage('extract', self.extract, extract_workers, queue_size),
+            Stage('clean', self.clean_item, 1, queue_size),
+        ]
+        if geocoder is not None:
+            stages.append(Stage('geocode', self.geocode, 1, queue_size))
+        stages.append(Stage('store', self.store, 1, queue_size))
+        self.pipeline = Pipeline(stages, report_every=report_every)
+
+    # -- stages (each takes and returns one item dict) --
+
+    def fetch(self, item):
+        if item.get('error'):
+            return item
+        batch = self.batch
+        # Let queued document bodies drain before pulling in another page
+        if batch.document_stage is not None:
+            batch.memory_budget.wait_below()
+        started = time.monotonic()
+        # Fetch the catalog's spelling of the URL, as crawl_state does (item['url']
+        # is the canonical form the scheduler keys on)
+        content, status_code, error, profile = batch.crawler.fetch_page(item['members'][0]['pha_url'])
+        item.update(content=content, status_code=status_code, error=error, profile=profile,
+                    seconds=time.monotonic() - started)
+        return item
+
+    def parse(self, item):
+        content = item.pop('content', None)
+        if content is not None:
+            started = time.monotonic()
+            item['soup'] = self.batch.crawler.parse_page(content)
+            item['seconds'] += time.monotonic() - started
+        return item
+
+    def extract(self, item):
+        soup = item.pop('soup', None)
+        if soup is None:
+            item['results'] = {}
+            return item
+        batch = self.batch
+        started = time.monotonic()
+        results, error = batch.crawler.extract_page(item['members'][0]['pha_url'], soup, item.get('profile'),
+                                                    keep_text=batch.text_index is not None,
+                                                    keep_links=batch.document_stage is not None)
+        item['seconds'] += time.monotonic() - started
+        item['page_text'] = results.pop('page_text', None)
+        links = results.pop('document_links', None)
+        if batch.document_stage is not None and links:
+            item['job'] = batch.document_stage.submit(item['url'], links)
+        item['results'] = results
+        item['error'] = item.get('error') or error
+        return item
+
+    def clean_item(self, item):
+        results = item.get('results')
+        job = item.pop('job', None)
+        if job is not None and results:
+            # Waits for this page's PDFs, so their resources are cleaned too
+            self.batch._merge_documents(results, job)
+        if self.clean and results is not None:
+            clean_site(results, self.confidence_cutoff)
+        return item
+
+    def geocode(self, item):
+        results = item.get('results')
+        if results:
+            self.geocoder.annotate(results.get('resources', []))
+        return item
+
+    def store(self, item):
+        batch = self.batch
+        results = item.get('results') or {}
+        status_code = item.get('status_code')
+        if item.get('seconds') is not None:
+            batch.scheduler.record(item['url'], status_code is not None and status_code < 400,
+                                   len(results.get('resources', [])), item['seconds'])
+        else:
+            batch.scheduler.record(item['url'], False, 0)
+        stored = batch._record_fetch(item['members'], results, status_code, item.get('error'),
+                                     item.get('page_text'))
+        if self.clean:
+            # The catalog metadata (population, crawled_at) only exists once
+            # stored, so normalize it here the way clean_and_save.py does
+            for site in stored:
+                clean_site_fields(site)
+        self.stored += 1
+        print(f"[{self.stored}] {item['members'][0]['name']}: {len(results.get('resources', []))} resources"
+              + (f" ({item['error']})" if item.get('error') else ""))
+        reason = batch.lifecycle.page_done()
+        if reason:
+            print(f"Worker limit reached: {reason}")
+        return None
+
+    # -- driving a crawl --
+
+    def items(self, state_code, groups, unresolved):
+        """Admitted (url, members) groups as pipeline items, in plan order"""
+        scheduler = self.batch.scheduler
+        admitted = 0
+        for url, members in groups:
+            if url in unresolved:
+                yield {'url': url, 'members': members, 'error': unresolved[url]}
+                continue
+            if not scheduler.admit(state_code):
+                print(f"\nCrawl budget reached after {admitted} requests for {state_code.upper()}")
+                return
+            admitted += 1
+            yield {'url': url, 'members': members}
+
+    def plan_state(self, state_code, max_sites=10, delay=2):
+        """Catalog groups for a state in priority order, plus the URLs whose host didn't resolve"""
+        batch = self.batch
+        print(f"\n=== Crawling {state_code.upper()} Health Departments (pipeline) ===")
+        websites = batch.load_state_websites(state_code)
+        if not websites:
+            return [], {}
+        batch.scheduler.start_state(state_code, max_requests=max_sites)
+        groups = batch.scheduler.plan(group_sites_by_url(websites), state_code)
+        unresolved = {}
+        if batch.dns is not None:
+            _, unresolved = batch.dns.split_groups(groups)
+            batch.dns.install()
+            batch.dns.save()
+            if unresolved:
+                print(f"{len(unresolved)} of {len(groups)} URLs have hosts that don't resolve; marking them failed")
+        if batch.throttle is not None:
+            batch.throttle.default_interval = delay
+        return groups, unresolved
+
+    def crawl(self, states, max_sites=10, delay=2):
+        """Crawl several states through one pipeline run"""
+        def all_items():
+            for state_code in states:
+                groups, unresolved = self.plan_state(state_code, max_sites, delay)
+                yield from self.items(state_code, groups, unresolved)
+
+        self.pipeline.run(all_items())
+        batch = self.batch
+        batch.scheduler.history.save()
+        if batch.throttle is not None:
+            batch.throttle.save()
+        batch.pipeline_stats = self.pipeline.stats()
+
+    def save(self, filename=None):
+        """Write the results (to cleaned_output/ when cleaning ran inline)"""
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = '.cleaned.json' if self.clean else '.json'
+            filename = f"batch_crawl_results_{timestamp}{suffix}"
+        self.batch.save_results(filename, output_dir='cleaned_output' if self.clean else 'output')
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl states through the staged pipeline")
+    parser.add_argument('--state', action='append', default=[], help="State code (repeatable)")
+    parser.add_argument('--max-sites', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=2)
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument('--no-clean', action='store_true', help="Store raw results (clean later with clean_and_save.py)")
+    parser.add_argument('--report-every', type=float, default=10, help="Seconds between progress lines (0 = off)")
+    parser.add_argument('--geocode', action='store_true', help="Add ZIP-centroid coordinates (needs the table in data/)")
+    args = parser.parse_args()
+
+    geocoder = None
+    if args.geocode:
+        from geo_index import Geocoder, ZipTableMissing
+        try:
+            geocoder = Geocoder()
+        except ZipTableMissing as e:
+            print(e)
+            raise SystemExit(1)
+    crawl = PipelineCrawl(fetch_workers=args.fetch_workers, queue_size=args.queue_size,
+                          clean=not args.no_clean, report_every=args.report_every or None,
+                          geocoder=geocoder)
+    crawl.crawl(args.state or ['ca'], max_sites=args.max_sites, delay=args.delay)
+    crawl.pipeline.print_stats()
+    crawl.save()
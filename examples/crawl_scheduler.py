@@ -0,0 +1,260 @@
+"""
+Crawl Scheduler
+Orders and admits sites by priority so a partial crawl covers the most
+people served per request instead of whatever comes first in the CSV.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+DEFAULT_HISTORY_PATH = os.path.join('output', 'crawl_history.json')
+
+# Days after which a successful crawl counts as fully stale again
+STALE_AFTER_DAYS = 30
+
+# Expected fetch + extraction time for a URL when no crawl of the plan has a
+# recorded avg_seconds yet
+DEFAULT_FETCH_SECONDS = 5.0
+
+
+class CrawlBudget:
+    """Request and/or wall-clock limit for a crawl (None means unlimited)"""
+
+    def __init__(self, max_requests=None, max_seconds=None):
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.requests = 0
+        self.started = None
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def elapsed(self):
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def renew(self):
+        """Start counting from zero again (same limits)"""
+        self.requests = 0
+        self.started = None
+
+    def charge(self, requests=1):
+        self.start()
+        self.requests += requests
+
+    def exhausted(self):
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            return True
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return True
+        return False
+
+    def __repr__(self):
+        return f"CrawlBudget(requests={self.requests}/{self.max_requests}, seconds={self.elapsed():.0f}/{self.max_seconds})"
+
+
+class CrawlHistory:
+    """Per-URL record of past crawls, kept in a small JSON file between runs"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not read crawl history {path}: {e}")
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def record(self, url, success, resource_count, seconds=None):
+        """
+        Update the history for one fetched URL
+
+        Args:
+            url: Canonical URL that was fetched
+            success: Whether the fetch succeeded
+            resource_count: Number of resources extracted
+            seconds: How long the fetch + extraction took
+        """
+        entry = self.entries.setdefault(url, {'attempts': 0, 'successes': 0, 'total_resources': 0})
+        entry['attempts'] += 1
+        entry['last_attempt'] = datetime.now().isoformat()
+        if success:
+            entry['successes'] += 1
+            entry['total_resources'] += resource_count
+            entry['last_success'] = entry['last_attempt']
+        if seconds is not None:
+            # Exponential moving average keeps one slow fetch from dominating
+            prev = entry.get('avg_seconds')
+            entry['avg_seconds'] = round(seconds if prev is None else 0.7 * prev + 0.3 * seconds, 3)
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+        except Exception as e:
+            print(f"Failed to save crawl history to {self.path}: {e}")
+
+
+def population_served(members):
+    """Total population_proper across the catalog rows served by one fetch"""
+    total = 0
+    for site in members:
+        pop = site.get('population_proper')
+        if pop is None:
+            try:
+                pop = int(str(site.get('population', '')).replace(',', '').strip())
+            except ValueError:
+                pop = 0
+        total += pop
+    return total
+
+
+def default_priority(url, members, history_entry, now=None):
+    """
+    People served per request, weighted by staleness and past yield
+
+    Args:
+        url: Canonical URL of the group
+        members: Catalog rows that share this URL
+        history_entry: CrawlHistory entry for the URL (or None if never crawled)
+        now: Current datetime (for testing)
+    """
+    people = population_served(members)
+    if not history_entry:
+        # Never crawled: full staleness and a neutral yield guess
+        return float(people)
+
+    now = now or datetime.now()
+    staleness = 1.0
+    last_success = history_entry.get('last_success')
+    if last_success:
+        try:
+            age_days = (now - datetime.fromisoformat(last_success)).total_seconds() / 86400
+            staleness = 0.1 + 0.9 * min(1.0, max(0.0, age_days) / STALE_AFTER_DAYS)
+        except ValueError:
+            pass
+
+    attempts = history_entry.get('attempts', 0) or 1
+    successes = history_entry.get('successes', 0)
+    avg_resources = history_entry.get('total_resources', 0) / successes if successes else 0.0
+    # Sites that keep failing or return nothing slide down the list but never drop out
+    success_rate = (successes + 1) / (attempts + 1)
+    yield_factor = 0.5 + min(avg_resources, 20) / 40
+    return people * staleness * success_rate * yield_factor
+
+
+class CrawlScheduler:
+    def __init__(self, priority=None, history=None, global_budget=None):
+        """
+        Args:
+            priority: Callable (url, members, history_entry) -> float; higher crawls first
+            history: CrawlHistory used for staleness/yield (defaults to output/crawl_history.json)
+            global_budget: CrawlBudget shared across every state crawled with this scheduler
+        """
+        self.priority = priority or default_priority
+        self.history = history if history is not None else CrawlHistory()
+        self.global_budget = global_budget or CrawlBudget()
+        self.state_budgets = {}
+        # States whose budget was set with set_state_budget (not from max_sites)
+        self.explicit_budgets = set()
+
+    def set_state_budget(self, state_code, max_requests=None, max_seconds=None):
+        """Limit how many requests / seconds a single state may use per crawl"""
+        budget = CrawlBudget(max_requests=max_requests, max_seconds=max_seconds)
+        self.state_budgets[state_code.lower()] = budget
+        self.explicit_budgets.add(state_code.lower())
+        return budget
+
+    def state_budget(self, state_code):
+        return self.state_budgets.get(state_code.lower())
+
+    def start_state(self, state_code, max_requests=None):
+        """
+        Budget for one crawl of a state
+
+        A budget set with set_state_budget starts over with its own limits;
+        otherwise a fresh one limited to max_requests is used, so crawling the
+        same state again doesn't start with the last crawl's spent budget.
+        """
+        code = state_code.lower()
+        budget = self.state_budgets.get(code)
+        if budget is not None and code in self.explicit_budgets:
+            budget.renew()
+            return budget
+        budget = self.state_budgets[code] = CrawlBudget(max_requests=max_requests)
+        return budget
+
+    def time_budgeted(self, state_code=None):
+        """True when the global or the state's budget limits seconds"""
+        state_budget = self.state_budget(state_code) if state_code else None
+        return (self.global_budget.max_seconds is not None
+                or (state_budget is not None and state_budget.max_seconds is not None))
+
+    def plan(self, groups, state_code=None):
+        """
+        Order (url, members) groups by priority, highest first
+
+        Under a time budget the priority is divided by each URL's expected
+        seconds (its recorded avg_seconds, else the median over the plan), so
+        the budget goes to the most people served per second rather than per
+        request. Ties keep their original file order.
+        """
+        per_second = self.time_budgeted(state_code)
+        if per_second:
+            known = sorted(entry['avg_seconds'] for entry in (self.history.get(url) for url, _ in groups)
+                           if entry and entry.get('avg_seconds'))
+            typical = known[len(known) // 2] if known else DEFAULT_FETCH_SECONDS
+        scored = []
+        for order, (url, members) in enumerate(groups):
+            entry = self.history.get(url)
+            try:
+                score = float(self.priority(url, members, entry))
+            except Exception as e:
+                print(f"Priority function failed for {url}: {e}")
+                score = 0.0
+            if per_second:
+                score /= max((entry or {}).get('avg_seconds') or typical, 0.1)
+            scored.append((-score, order, url, members))
+        scored.sort(key=lambda x: (x[0], x[1]))
+        return [(url, members) for _, _, url, members in scored]
+
+    def admit(self, state_code):
+        """
+        Charge one request to the global and state budgets
+
+        Returns False (and charges nothing) when either budget is exhausted.
+        """
+        budgets = [self.global_budget]
+        state_budget = self.state_budget(state_code)
+        if state_budget is not None:
+            budgets.append(state_budget)
+        for budget in budgets:
+            budget.start()
+            if budget.exhausted():
+                return False
+        for budget in budgets:
+            budget.charge()
+        return True
+
+    def record(self, url, success, resource_count, seconds=None):
+        self.history.record(url, success, resource_count, seconds)
+
+
+# Example usage
+if __name__ == "__main__":
+    from site_catalog import SiteCatalog, group_sites_by_url
+
+    catalog = SiteCatalog()
+    scheduler = CrawlScheduler(history=CrawlHistory())
+    plan = scheduler.plan(group_sites_by_url(catalog.sites(state='ca')))
+    print("First 10 CA sites by priority:")
+    for url, members in plan[:10]:
+        print(f"  {population_served(members):>10,}  {members[0]['name']}  {url}")
@@ -0,0 +1,500 @@
+"""
+Distributed Crawl
+Coordinator/worker mode for the batch crawler. The coordinator puts catalog
+sites into a durable SQLite job queue; any number of stateless worker
+processes lease jobs, fetch and extract the page and write the result back.
+Leases expire, so jobs held by a worker that died are handed out again, and
+the coordinator merges finished jobs into the usual results file and summary.
+
+Workers on other machines need the queue file on a shared disk with working
+file locks (SQLite does not lock reliably over most network filesystems);
+several processes on one machine always work.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+OUTPUT_DIR = Path(__file__).resolve().parent / 'output'
+DEFAULT_QUEUE_PATH = OUTPUT_DIR / 'crawl_queue.sqlite'
+
+# A worker must renew its lease within this many seconds or lose the job
+DEFAULT_LEASE_SECONDS = 120
+# Jobs whose lease expired this many times are given up on
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class JobQueue:
+    def __init__(self, path=None, timeout=30.0):
+        """
+        Open (and create if needed) the queue database
+
+        Args:
+            path: SQLite file shared by coordinator and workers
+                (defaults to output/crawl_queue.sqlite)
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = Path(path) if path else DEFAULT_QUEUE_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                state_code TEXT,
+                members TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                enqueued_at REAL NOT NULL,
+                finished_at REAL,
+                seconds REAL,
+                status_code INTEGER,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_run ON jobs(run_id, job_id);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT NOT NULL,
+                run_id TEXT,
+                finished_at REAL NOT NULL,
+                stats TEXT NOT NULL
+            );
+        """)
+
+    def enqueue(self, run_id, groups, state_code=None, errors=None):
+        """
+        Add one job per (url, members) group; returns the number added
+
+        Groups whose url is in `errors` ({url: error}) are stored as already
+        failed (e.g. hosts that don't resolve), so no worker leases them.
+        """
+        now = time.time()
+        errors = errors or {}
+        rows = [(run_id, url, state_code, json.dumps(members), now,
+                 'failed' if url in errors else 'queued', errors.get(url), now if url in errors else None)
+                for url, members in groups]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT INTO jobs (run_id, url, state_code, members, enqueued_at, status, error, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS, run_id=None):
+        """
+        Claim the oldest available job for `worker`
+
+        Expired leases are reclaimed first: the job goes back in the queue, or
+        is marked failed once it has used up `max_attempts`.
+        Returns a job dict (url, members, ...) or None when nothing is left.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease_expired', finished_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, max_attempts)
+            )
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL "
+                "WHERE status = 'leased' AND lease_expires < ?",
+                (now,)
+            )
+            sql = "SELECT * FROM jobs WHERE status = 'queued'"
+            params = []
+            if run_id:
+                sql += " AND run_id = ?"
+                params.append(run_id)
+            row = self.conn.execute(sql + " ORDER BY job_id LIMIT 1", params).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE job_id = ?",
+                (worker, now + lease_seconds, row['job_id'])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job['members'] = json.loads(job['members'])
+        job['attempts'] += 1
+        return job
+
+    def renew(self, job_id, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend a lease; False if the job is no longer leased to `worker`"""
+        cur = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, job_id, worker)
+        )
+        return cur.rowcount == 1
+
+    def complete(self, job_id, worker, raw_results, status_code, error, seconds=None):
+        """
+        Store a job's result
+
+        The first result written wins; a late result from a worker whose lease
+        had expired is dropped. Returns True if this result was stored.
+        """
+        cur = self.conn.execute(
+            "UPDATE jobs SET status = 'done', worker = ?, lease_expires = NULL, finished_at = ?, "
+            "seconds = ?, status_code = ?, error = ?, result = ? "
+            "WHERE job_id = ? AND status IN ('queued', 'leased')",
+            (worker, time.time(), seconds, status_code, error,
+             json.dumps(raw_results or {}, ensure_ascii=False), job_id)
+        )
+        return cur.rowcount == 1
+
+    def counts(self, run_id=None):
+        """{status: jobs} for one run (or the whole queue)"""
+        sql = "SELECT status, COUNT(*) FROM jobs"
+        params = []
+        if run_id:
+            sql += " WHERE run_id = ?"
+            params.append(run_id)
+        return dict(self.conn.execute(sql + " GROUP BY status", params).fetchall())
+
+    def pending(self, run_id=None):
+        counts = self.counts(run_id)
+        return counts.get('queued', 0) + counts.get('leased', 0)
+
+    def finished(self, run_id):
+        """Done and failed jobs of a run, in enqueue order"""
+        for row in self.conn.execute(
+                "SELECT * FROM jobs WHERE run_id = ? AND status IN ('done', 'failed') ORDER BY job_id",
+                (run_id,)):
+            job = dict(row)
+            job['members'] = json.loads(job['members'])
+            job['result'] = json.loads(job['result']) if job['result'] else {}
+            yield job
+
+    def record_worker(self, worker, run_id, stats):
+        """Store a worker's lifecycle stats when it exits"""
+        self.conn.execute("INSERT INTO workers VALUES (?, ?, ?, ?)",
+                          (worker, run_id, time.time(), json.dumps(stats)))
+
+    def worker_stats(self, run_id):
+        return [dict(json.loads(row['stats']), worker=row['worker']) for row in self.conn.execute(
+            "SELECT worker, stats FROM workers WHERE run_id = ? ORDER BY finished_at", (run_id,))]
+
+    def runs(self):
+        return [row[0] for row in self.conn.execute(
+            "SELECT run_id FROM jobs GROUP BY run_id ORDER BY MIN(job_id)")]
+
+    def close(self):
+        self.conn.close()
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def run_worker(queue_path=None, worker=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               max_attempts=DEFAULT_MAX_ATTEMPTS, delay=2, run_id=None, max_jobs=None,
+               wait_for_jobs=0, max_pages=None, max_rss_mb=None):
+    """
+    Lease, fetch and report jobs until the queue is empty
+
+    Args:
+        queue_path: Queue database (shared with the coordinator)
+        worker: Name recorded on leased jobs (host-pid-random by default)
+        lease_seconds: Lease length; renewed in the background while fetching
+        delay: Starting seconds between requests to one host (the worker's
+            HostThrottle adapts it per host and saves what it learned)
+        run_id: Only take jobs of this run
+        max_jobs: Stop after this many jobs (None = until the queue is empty)
+        wait_for_jobs: Keep polling this many seconds for new jobs before exiting
+        max_pages / max_rss_mb: Retire after this many pages or once RSS passes
+            this many MB, so a fresh process can take over (see run_local)
+
+    Returns the number of jobs this worker completed.
+    """
+    # Imported here so the coordinator can run without the crawler stack
+    from batch_crawler_example import BatchHealthCrawler
+    from worker_lifecycle import WorkerLifecycle, MB
+
+    queue = JobQueue(queue_path)
+    worker = worker or worker_name()
+    lifecycle = WorkerLifecycle(max_pages=max_pages,
+                                max_rss_bytes=None if max_rss_mb is None else int(max_rss_mb * MB))
+    crawler = BatchHealthCrawler(lifecycle=lifecycle)
+    crawler.throttle.default_interval = delay
+    # Answer lookups from the coordinator's preflight cache
+    crawler.dns.install()
+    done = 0
+    idle_since = None
+    while max_jobs is None or done < max_jobs:
+        job = queue.lease(worker, lease_seconds, max_attempts, run_id)
+        if job is None:
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since >= wait_for_jobs:
+                break
+            time.sleep(1)
+            continue
+        idle_since = None
+        print(f"[{worker}] job {job['job_id']}: {job['members'][0]['name']} ({job['url']})")
+
+        # Keep the lease alive while the fetch runs (own connection per thread)
+        stop = threading.Event()
+
+        def heartbeat(job_id=job['job_id']):
+            beat = JobQueue(queue.path)
+            try:
+                while not stop.wait(lease_seconds / 3):
+                    if not beat.renew(job_id, worker, lease_seconds):
+                        break
+            finally:
+                beat.close()
+
+        beater = threading.Thread(target=heartbeat, daemon=True)
+        beater.start()
+        started = time.monotonic()
+        try:
+            raw_results, status_code, error = crawler.fetch_site(job['members'][0]['pha_url'])
+        finally:
+            stop.set()
+            beater.join()
+        if not queue.complete(job['job_id'], worker, raw_results, status_code, error,
+                              time.monotonic() - started):
+            print(f"[{worker}] job {job['job_id']} was already finished elsewhere; result dropped")
+        done += 1
+        # Nothing is kept between jobs, so drop references before sampling RSS
+        raw_results = None
+        reason = lifecycle.page_done()
+        if reason:
+            print(f"[{worker}] retiring: {reason}")
+            break
+    stats = lifecycle.stats()
+    stats['recycled'] = lifecycle.recycle is not None
+    queue.record_worker(worker, run_id, stats)
+    queue.close()
+    crawler.throttle.save()
+    print(f"[{worker}] finished {done} job(s)")
+    return done
+
+
+class Coordinator:
+    def __init__(self, queue_path=None, catalog=None, scheduler=None, dns=None):
+        """
+        Args:
+            queue_path: Queue database shared with the workers
+            catalog: SiteCatalog to read sites from (opened lazily)
+            scheduler: CrawlScheduler for crawl order, budgets and history
+            dns: DnsPreflight used to fail unresolvable hosts before they are
+                queued (defaults to one with the shared cache file)
+        """
+        self.queue = JobQueue(queue_path)
+        self.catalog = catalog
+        self.scheduler = scheduler
+        self.dns = dns
+
+    def submit(self, states, max_sites=10, run_id=None):
+        """
+        Enqueue the highest-priority sites of each state
+
+        Rows sharing a pha_url become one job, and URLs whose host doesn't
+        resolve are stored as failed jobs. Returns the run id.
+        """
+        from site_catalog import SiteCatalog, group_sites_by_url
+        from crawl_scheduler import CrawlScheduler
+        from dns_preflight import DnsPreflight
+
+        if self.catalog is None:
+            self.catalog = SiteCatalog()
+        if self.scheduler is None:
+            self.scheduler = CrawlScheduler()
+        if self.dns is None:
+            self.dns = DnsPreflight()
+        run_id = run_id or new_run_id()
+        for state_code in states:
+            sites = self.catalog.sites(state=state_code)
+            if not sites:
+                print(f"No catalog entries found for {state_code.upper()}")
+                continue
+            self.scheduler.start_state(state_code, max_requests=max_sites)
+            planned = self.scheduler.plan(group_sites_by_url(sites), state_code)
+            _, unresolved = self.dns.split_groups(planned)
+            groups = []
+            for url, members in planned:
+                if url not in unresolved and not self.scheduler.admit(state_code):
+                    break
+                groups.append((url, members))
+            added = self.queue.enqueue(run_id, groups, state_code.lower(), errors=unresolved)
+            dead = sum(1 for url, _ in groups if url in unresolved)
+            print(f"Queued {added - dead} URLs for {state_code.upper()} (run {run_id}), "
+                  f"{dead} failed up front (host doesn't resolve)")
+        self.dns.save()
+        return run_id
+
+    def wait(self, run_id, poll=2.0, timeout=None):
+        """Block until no job of the run is queued or leased; False on timeout"""
+        started = time.monotonic()
+        while self.queue.pending(run_id):
+            if timeout is not None and time.monotonic() - started > timeout:
+                return False
+            time.sleep(poll)
+        return True
+
+    def merge(self, run_id, batch=None, save=True):
+        """
+        Record every finished job of a run on a BatchHealthCrawler
+
+        Failed jobs (lease expired too often) are recorded as failed crawls.
+        Returns the BatchHealthCrawler holding the merged results.
+        """
+        from batch_crawler_example import BatchHealthCrawler
+
+        batch = batch or BatchHealthCrawler(catalog=self.catalog, scheduler=self.scheduler)
+        for job in self.queue.finished(run_id):
+            raw_results = job['result']
+            if job['status'] == 'done':
+                batch.scheduler.record(job['url'], job['status_code'] is not None and job['status_code'] < 400,
+                                       len(raw_results.get('resources', [])), job['seconds'])
+            elif (job['error'] or '').startswith('dns_'):
+                batch.scheduler.record(job['url'], False, 0)
+            batch._record_fetch(job['members'], raw_results, job['status_code'], job['error'])
+        batch.worker_stats = self.queue.worker_stats(run_id)
+        batch.scheduler.history.save()
+        if save:
+            batch.save_results(f"batch_crawl_results_{run_id}.json")
+        return batch
+
+    def close(self):
+        self.queue.close()
+        if self.catalog is not None:
+            self.catalog.close()
+
+
+def run_local(states, workers=3, max_sites=10, queue_path=None, delay=2,
+              lease_seconds=DEFAULT_LEASE_SECONDS, max_pages=None, max_rss_mb=None, catalog=None):
+    """
+    Coordinator plus `workers` local worker processes in one call
+
+    A worker that retires (max_pages / max_rss_mb) is replaced by a fresh
+    process while jobs are still queued. Returns the merged BatchHealthCrawler.
+    """
+    import multiprocessing
+
+    coordinator = Coordinator(queue_path, catalog=catalog)
+    run_id = coordinator.submit(states, max_sites=max_sites)
+    kwargs = {
+        'queue_path': str(coordinator.queue.path), 'lease_seconds': lease_seconds,
+        'delay': delay, 'run_id': run_id, 'max_pages': max_pages, 'max_rss_mb': max_rss_mb,
+    }
+
+    def start():
+        proc = multiprocessing.Process(target=run_worker, kwargs=kwargs)
+        proc.start()
+        return proc
+
+    procs = [start() for _ in range(workers)]
+    while procs:
+        procs[0].join(timeout=0.5)
+        for proc in [p for p in procs if not p.is_alive()]:
+            procs.remove(proc)
+            if coordinator.queue.counts(run_id).get('queued', 0):
+                procs.append(start())
+    # Jobs left by a crashed worker come back after their lease expires
+    while coordinator.queue.pending(run_id):
+        print("Re-running jobs left by workers that exited early")
+        run_worker(coordinator.queue.path, lease_seconds=lease_seconds, delay=delay,
+                   run_id=run_id, wait_for_jobs=lease_seconds)
+    batch = coordinator.merge(run_id)
+    batch.print_summary()
+    coordinator.close()
+    return batch
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed batch crawl over a shared SQLite job queue")
+    parser.add_argument('--queue', help="Queue database (default: output/crawl_queue.sqlite)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('submit', help="Enqueue catalog sites")
+    p.add_argument('--state', action='append', required=True, help="State code (repeatable)")
+    p.add_argument('--max-sites', type=int, default=10)
+
+    p = sub.add_parser('worker', help="Lease and crawl jobs until the queue is empty")
+    p.add_argument('--run', help="Only take jobs of this run")
+    p.add_argument('--delay', type=float, default=2)
+    p.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS)
+    p.add_argument('--wait', type=float, default=0, help="Seconds to keep polling once the queue is empty")
+    p.add_argument('--max-pages', type=int, help="Exit after this many pages (restart it from a supervisor)")
+    p.add_argument('--max-rss-mb', type=float, help="Exit once resident memory passes this many MB")
+
+    p = sub.add_parser('merge', help="Write the results file and summary for a run")
+    p.add_argument('--run', help="Run id (default: latest)")
+    p.add_argument('--wait', action='store_true', help="Wait for the run's jobs to finish first")
+
+    p = sub.add_parser('status', help="Job counts per run")
+
+    p = sub.add_parser('local', help="Submit, crawl with local worker processes and merge")
+    p.add_argument('--state', action='append', required=True)
+    p.add_argument('--max-sites', type=int, default=10)
+    p.add_argument('--workers', type=int, default=3)
+    p.add_argument('--delay', type=float, default=2)
+    p.add_argument('--max-pages', type=int, help="Recycle a worker after this many pages")
+    p.add_argument('--max-rss-mb', type=float, help="Recycle a worker once its RSS passes this many MB")
+
+    args = parser.parse_args()
+    if args.command == 'submit':
+        coordinator = Coordinator(args.queue)
+        run_id = coordinator.submit(args.state, max_sites=args.max_sites)
+        print(f"Start workers with: python distributed_crawl.py worker --run {run_id}")
+    elif args.command == 'worker':
+        run_worker(args.queue, lease_seconds=args.lease, delay=args.delay, run_id=args.run,
+                   wait_for_jobs=args.wait, max_pages=args.max_pages, max_rss_mb=args.max_rss_mb)
+    elif args.command == 'merge':
+        coordinator = Coordinator(args.queue)
+        runs = coordinator.queue.runs()
+        run_id = args.run or (runs[-1] if runs else None)
+        if run_id is None:
+            print("Queue is empty")
+        else:
+            if args.wait:
+                coordinator.wait(run_id)
+            left = coordinator.queue.pending(run_id)
+            if left:
+                print(f"Warning: {left} job(s) of run {run_id} are still queued or leased")
+            coordinator.merge(run_id).print_summary()
+    elif args.command == 'status':
+        queue = JobQueue(args.queue)
+        for run_id in queue.runs():
+            counts = queue.counts(run_id)
+            print(f"{run_id}: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+    elif args.command == 'local':
+        run_local(args.state, workers=args.workers, max_sites=args.max_sites,
+                  queue_path=args.queue, delay=args.delay, max_pages=args.max_pages,
+                  max_rss_mb=args.max_rss_mb)
@@ -0,0 +1,244 @@
+"""
+DNS Preflight
+Resolves every host a crawl is about to visit up front, many at a time, and
+keeps the answers in a TTL-bounded cache (saved between runs). Hosts that
+don't resolve (stale pha_url domains are common) are reported as failed
+before any fetch is attempted, and resolved hosts skip the blocking lookup
+inside session.get once the cache is installed as the process resolver.
+
+The resolver is pluggable: anything mapping host -> [ip, ...] and raising
+socket.gaierror for unknown names works, e.g. StubResolver for tests.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+DEFAULT_CACHE_PATH = os.path.join('output', 'dns_cache.json')
+
+# Lifetime of a positive answer and of a failure (failures are retried sooner)
+DEFAULT_TTL = 6 * 3600
+NEGATIVE_TTL = 15 * 60
+# Lookups running at once, and how long one may take before the host is given up on
+DEFAULT_WORKERS = 32
+DEFAULT_TIMEOUT = 5.0
+
+
+def system_resolver(host):
+    """All addresses the OS resolver returns for `host` (IPv4 first)"""
+    infos = socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+    ips = []
+    for family, _, _, _, sockaddr in sorted(infos, key=lambda i: i[0] != socket.AF_INET):
+        if sockaddr[0] not in ips:
+            ips.append(sockaddr[0])
+    return ips
+
+
+class StubResolver:
+    """Resolver answering from a dict (host -> ip, list of ips, or None for NXDOMAIN)"""
+
+    def __init__(self, answers, delay=0.0):
+        self.answers = {h.lower(): v for h, v in answers.items()}
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, host):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        answer = self.answers.get(host.lower())
+        if not answer:
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        return [answer] if isinstance(answer, str) else list(answer)
+
+
+def url_host(url):
+    return (urlsplit(url or '').hostname or '').lower()
+
+
+class DnsPreflight:
+    def __init__(self, resolver=None, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=NEGATIVE_TTL, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            resolver: Function host -> [ip, ...] (defaults to the OS resolver)
+            path: JSON file the cache is loaded from and saved to (None = memory only)
+            ttl / negative_ttl: Seconds answers / failures stay cached
+            workers: Concurrent lookups
+            timeout: Seconds before a lookup counts as failed ('dns_timeout')
+        """
+        self.resolver = resolver or system_resolver
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.workers = workers
+        self.timeout = timeout
+        # host -> {'ips': [...], 'error': str|None, 'expires': epoch seconds}
+        self.cache = {}
+        self._lock = threading.Lock()
+        self._original_getaddrinfo = None
+        self.stats = {'hosts': 0, 'cache_hits': 0, 'resolved': 0, 'failed': 0, 'timeouts': 0, 'seconds': 0.0}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Could not read DNS cache {path}: {e}")
+
+    def _cached(self, host, now):
+        entry = self.cache.get(host)
+        if entry and entry.get('expires', 0) > now:
+            return entry
+        return None
+
+    def _store(self, host, ips, error, now):
+        ttl = self.ttl if ips else self.negative_ttl
+        entry = {'ips': list(ips or []), 'error': error, 'expires': now + ttl}
+        with self._lock:
+            self.cache[host] = entry
+        return entry
+
+    def _lookup(self, host):
+        try:
+            return list(self.resolver(host) or []), None
+        except socket.gaierror as e:
+            return [], f"dns_unresolved: {e.strerror or e}"
+        except (OSError, UnicodeError) as e:
+            return [], f"dns_error: {e}"
+
+    def resolve_all(self, hosts):
+        """
+        Resolve hosts concurrently (cached answers are reused)
+
+        Returns {host: entry} where entry['ips'] is empty and entry['error']
+        set for hosts that could not be resolved.
+        """
+        started = time.monotonic()
+        now = time.time()
+        hosts = sorted({h.lower() for h in hosts if h})
+        results = {}
+        todo = []
+        for host in hosts:
+            entry = self._cached(host, now)
+            if entry is not None:
+                results[host] = entry
+                self.stats['cache_hits'] += 1
+            else:
+                todo.append(host)
+        if todo:
+            pool = ThreadPoolExecutor(max_workers=min(self.workers, len(todo)))
+            futures = {host: pool.submit(self._lookup, host) for host in todo}
+            # Every lookup gets `timeout` seconds once a worker picks it up
+            rounds = -(-len(todo) // min(self.workers, len(todo)))
+            deadline = time.monotonic() + self.timeout * rounds
+            for host, future in futures.items():
+                try:
+                    ips, error = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FutureTimeout:
+                    ips, error = [], 'dns_timeout'
+                    self.stats['timeouts'] += 1
+                results[host] = self._store(host, ips, error, now)
+                self.stats['resolved' if ips else 'failed'] += 1
+            # Lookups stuck past the timeout are left to finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
+        self.stats['hosts'] += len(hosts)
+        self.stats['seconds'] += time.monotonic() - started
+        return results
+
+    def split_groups(self, groups):
+        """
+        Resolve the hosts of (url, members) groups
+
+        Returns (live_groups, {url: error}) where the dict holds the groups
+        whose host did not resolve.
+        """
+        answers = self.resolve_all(url_host(url) for url, _ in groups)
+        live, dead = [], {}
+        for url, members in groups:
+            entry = answers.get(url_host(url))
+            if entry is not None and not entry['ips']:
+                dead[url] = entry['error'] or 'dns_unresolved'
+            else:
+                live.append((url, members))
+        return live, dead
+
+    def ip(self, host):
+        """First cached address of a host (resolving it now if needed), or None"""
+        host = (host or '').lower()
+        entry = self._cached(host, time.time())
+        if entry is None:
+            entry = self.resolve_all([host]).get(host)
+        return entry['ips'][0] if entry and entry['ips'] else None
+
+    # -- process resolver --
+
+    def install(self):
+        """
+        Answer socket.getaddrinfo from the cache for hosts resolved here
+
+        Other hosts, and expired entries, fall through to the real resolver.
+        """
+        if self._original_getaddrinfo is not None:
+            return
+        original = self._original_getaddrinfo = socket.getaddrinfo
+
+        def getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+            name = host.decode('ascii', 'ignore') if isinstance(host, bytes) else host
+            entry = self._cached((name or '').lower(), time.time()) if name else None
+            if not entry or not entry['ips']:
+                return original(host, port, family, type, proto, flags)
+            infos = []
+            for ip in entry['ips']:
+                fam = socket.AF_INET6 if ':' in ip else socket.AF_INET
+                if family and fam != family:
+                    continue
+                sockaddr = (ip, port or 0, 0, 0) if fam == socket.AF_INET6 else (ip, port or 0)
+                infos.append((fam, type or socket.SOCK_STREAM, proto or socket.IPPROTO_TCP, '', sockaddr))
+            return infos or original(host, port, family, type, proto, flags)
+
+        socket.getaddrinfo = getaddrinfo
+
+    def uninstall(self):
+        if self._original_getaddrinfo is not None:
+            socket.getaddrinfo = self._original_getaddrinfo
+            self._original_getaddrinfo = None
+
+    def save(self):
+        """Write unexpired entries to the cache file"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            live = {h: e for h, e in self.cache.items() if e.get('expires', 0) > now}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(live, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Failed to save DNS cache to {self.path}: {e}")
+
+
+# Example usage
+if __name__ == "__main__":
+    from site_catalog import SiteCatalog
+
+    catalog = SiteCatalog()
+    hosts = {url_host(site['pha_url']) for site in catalog.sites()}
+    preflight = DnsPreflight()
+    answers = preflight.resolve_all(hosts)
+    preflight.save()
+    dead = sorted(h for h, e in answers.items() if not e['ips'])
+    print(f"{len(answers)} hosts: {len(answers) - len(dead)} resolved, {len(dead)} failed "
+          f"({preflight.stats['seconds']:.1f}s, {preflight.stats['cache_hits']} from cache)")
+    for host in dead:
+        print(f"  {host}: {answers[host]['error']}")
@@ -0,0 +1,451 @@
+"""
+Document Stage
+Fetches the PDFs a county page links to (clinic schedules, phone lists),
+extracts their text in a process pool and runs the same phone/address/tag
+extraction over it. Downloads run on background threads under a byte budget
+and results are cached by content hash, so heavy documents never hold up the
+HTML crawl and an unchanged PDF is only parsed once.
+
+Text extraction uses pypdf when it is installed; otherwise a small built-in
+reader handles plain and Flate-compressed text streams (enough for most
+county-generated PDFs, not for scanned images or CID-encoded fonts).
+
+Bodies are streamed into a PageBufferPool and the extraction processes read
+them by handle from shared memory, so PDFs are never pickled across.
+"""
+
+import hashlib
+import io
+import json
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from address_parser import parse_block as parse_address_block
+from page_buffers import PageBufferPool, call_with_buffer
+from phone_scanner import scan_phones
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional dependency
+    PdfReader = None
+
+OUTPUT_DIR = Path(__file__).resolve().parent / 'output'
+DEFAULT_CACHE_DIR = OUTPUT_DIR / 'document_cache'
+
+# Total bytes downloaded per run, per document, and documents taken per page
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_DOCUMENT_BYTES = 10 * 1024 * 1024
+DEFAULT_MAX_DOCUMENTS_PER_PAGE = 5
+DOWNLOAD_THREADS = 4
+DOWNLOAD_TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+
+# Bump when extraction output changes so old cache entries are ignored
+CACHE_VERSION = 1
+
+DOCUMENT_CONTEXT = 'document'
+
+
+def is_document_link(href):
+    path = urlsplit(href or '').path.lower()
+    return path.endswith('.pdf')
+
+
+def find_document_links(soup, base_url, limit=None):
+    """Absolute URLs of the PDFs linked from a page, in page order, without duplicates"""
+    links = []
+    seen = set()
+    for a in soup.find_all('a', href=True):
+        href = a['href'].strip()
+        if not (is_document_link(href) or 'pdf' in (a.get('type') or '').lower()):
+            continue
+        url = urljoin(base_url, href).split('#', 1)[0]
+        if url in seen or not url.startswith(('http://', 'https://')):
+            continue
+        seen.add(url)
+        links.append(url)
+        if limit and len(links) >= limit:
+            break
+    return links
+
+
+# --- PDF text -----------------------------------------------------------
+
+_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\n?endstream', re.S)
+_TEXT_TOKEN_RE = re.compile(
+    rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)"   # (string), one level of nested parens
+    rb"|\[(?:\\.|[^\]\\])*\]\s*TJ"                   # [(array) -120 (of strings)] TJ
+    rb"|\bT\*|\bT[dD]\b|\bET\b|'|\"",                 # line breaks
+    re.S
+)
+_ARRAY_PART_RE = re.compile(rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)|-?\d+(?:\.\d+)?")
+_PAGE_RE = re.compile(rb'/Type\s*/Page\b')
+_ESCAPES = {b'n': '\n', b'r': '\r', b't': '\t', b'b': '\b', b'f': '\f',
+            b'(': '(', b')': ')', b'\\': '\\'}
+
+# Kerning offsets in TJ arrays larger than this (in 1/1000 em) read as a space
+TJ_SPACE_OFFSET = 200
+
+
+def _pdf_string(raw):
+    """Decode a literal PDF string body (escapes and octal codes) as Latin-1"""
+    out = []
+    i = 0
+    while i < len(raw):
+        c = raw[i:i + 1]
+        if c != b'\\':
+            out.append(c.decode('latin-1'))
+            i += 1
+            continue
+        nxt = raw[i + 1:i + 2]
+        if nxt in _ESCAPES:
+            out.append(_ESCAPES[nxt])
+            i += 2
+        elif nxt.isdigit():
+            digits = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4]).group(0)
+            out.append(chr(int(digits, 8)))
+            i += 1 + len(digits)
+        else:
+            i += 2  # line continuation or unknown escape
+    return ''.join(out)
+
+
+def _content_text(content):
+    parts = []
+    for m in _TEXT_TOKEN_RE.finditer(content):
+        token = m.group(0)
+        if token.startswith(b'('):
+            parts.append(_pdf_string(token[1:-1]))
+        elif token.startswith(b'['):
+            for piece in _ARRAY_PART_RE.findall(token[1:token.rindex(b']')]):
+                if piece.startswith(b'('):
+                    parts.append(_pdf_string(piece[1:-1]))
+                elif -float(piece) > TJ_SPACE_OFFSET:
+                    parts.append(' ')
+        else:
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def _builtin_pdf_text(data):
+    """Text from the content streams of a simple PDF (see module docstring)"""
+    chunks = []
+    for m in _STREAM_RE.finditer(data):
+        stream = m.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        if b'BT' not in stream:
+            continue
+        text = _content_text(stream)
+        if text.strip():
+            chunks.append(text)
+    return '\n'.join(chunks), len(_PAGE_RE.findall(data))
+
+
+def pdf_text(data):
+    """Return (text, page_count) for PDF bytes"""
+    if PdfReader is not None:
+        reader = PdfReader(io.BytesIO(data))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages), len(reader.pages)
+    return _builtin_pdf_text(data)
+
+
+# --- Extraction (runs in worker processes) -------------------------------
+
+def _tags(text, keywords):
+    """Same keyword matching as CategorizedHealthCrawler.auto_tag_content"""
+    text_lower = text.lower()
+    return [tag for tag, words in keywords.items() if any(w in text_lower for w in words)]
+
+
+def extract_document(data, keywords):
+    """
+    Extract phone/address resources from one PDF
+
+    Args:
+        data: PDF bytes (or a memoryview of them)
+        keywords: {tag: [keyword, ...]} (CategorizedHealthCrawler.health_keywords)
+
+    Returns {'pages', 'chars', 'resources'}.
+    """
+    text, pages = pdf_text(data)
+    resources = []
+    seen = set()
+    for line in text.splitlines():
+        for phone in scan_phones(line):
+            if phone.dedup_key in seen:
+                continue
+            seen.add(phone.dedup_key)
+            context = line.strip()[:200]
+            tags = _tags(f"{phone.raw} {context}", keywords)
+            if any(t in ('crisis_services', 'emergency_room') for t in tags):
+                if 'crisis' in context.lower() or 'suicide' in context.lower():
+                    tags.append('crisis_hotline')
+            resources.append({
+                'category': 'CONTACT_INFO',
+                'type': 'toll_number' if phone.is_toll_free else 'phone_number',
+                'value': phone.raw,
+                'phone_key': phone.key,
+                'tags': tags or ['general'],
+                'context': DOCUMENT_CONTEXT,
+                'confidence': 0.7,
+            })
+    for addr in parse_address_block(text):
+        value = addr.value.strip()
+        if not (10 < len(value) < 200) or value.lower() in seen:
+            continue
+        seen.add(value.lower())
+        resources.append({
+            'category': 'LOCATION',
+            'type': 'address',
+            'value': value,
+            'address': addr.to_dict(),
+            'tags': _tags(value, keywords) or ['general'],
+            'context': DOCUMENT_CONTEXT,
+            'confidence': 0.9 if addr.is_complete else 0.6,
+        })
+    return {'pages': pages, 'chars': len(text), 'resources': resources}
+
+
+# --- Stage --------------------------------------------------------------
+
+class DocumentJob:
+    """Handle for the documents queued from one page"""
+
+    def __init__(self, page_url, futures):
+        self.page_url = page_url
+        self.futures = futures
+
+    def done(self):
+        return all(f.done() for f in self.futures)
+
+    def documents(self):
+        """Per-document results (blocks until all are finished); failures are left out"""
+        out = []
+        for future in self.futures:
+            try:
+                doc = future.result()
+            except Exception:
+                continue
+            if doc:
+                out.append(doc)
+        return out
+
+    def resources(self):
+        """All document resources, each tagged with the PDF it came from"""
+        resources = []
+        for doc in self.documents():
+            for resource in doc['resources']:
+                resource = dict(resource)
+                resource['source_url'] = doc['url']
+                resources.append(resource)
+        return resources
+
+
+class DocumentStage:
+    def __init__(self, keywords, session=None, max_bytes=DEFAULT_MAX_BYTES,
+                 max_document_bytes=DEFAULT_MAX_DOCUMENT_BYTES,
+                 max_documents_per_page=DEFAULT_MAX_DOCUMENTS_PER_PAGE,
+                 workers=None, cache_dir=None, throttle=None, memory_budget=None, buffers=None):
+        """
+        Args:
+            keywords: Tag keywords used for the extracted resources
+            session: requests.Session to download with (headers are copied)
+            max_bytes: Download budget for the whole run; documents that would
+                exceed it are skipped
+            max_document_bytes: Larger documents are abandoned mid-download
+            max_documents_per_page: PDFs taken from one page, in link order
+            workers: Processes for text extraction (None = one per CPU)
+            cache_dir: Where extraction results are cached by sha256
+            throttle: HostThrottle shared with the page crawl (optional)
+            memory_budget: MemoryBudget for document bodies held in memory;
+                downloads wait while it is full (optional)
+            buffers: PageBufferPool bodies are handed to the extraction
+                processes through (None = a pool of its own)
+        """
+        self.keywords = keywords
+        self.session = requests.Session()
+        if session is not None:
+            self.session.headers.update(session.headers)
+        self.bytes_left = max_bytes
+        self.max_document_bytes = max_document_bytes
+        self.max_documents_per_page = max_documents_per_page
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.throttle = throttle
+        self.memory_budget = memory_budget
+        self.buffers = buffers if buffers is not None else PageBufferPool()
+        self._lock = threading.Lock()
+        self._downloads = ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS)
+        self._extractors = ProcessPoolExecutor(max_workers=workers)
+        self._by_url = {}
+        self.stats = {'queued': 0, 'downloaded': 0, 'bytes': 0, 'cache_hits': 0,
+                      'extracted': 0, 'skipped': 0, 'failed': 0}
+
+    @classmethod
+    def for_crawler(cls, crawler, **kwargs):
+        kwargs.setdefault('throttle', getattr(crawler, 'throttle', None))
+        return cls(crawler.health_keywords, session=crawler.session, **kwargs)
+
+    def submit(self, page_url, links):
+        """Queue a page's PDF links; returns a DocumentJob right away"""
+        futures = []
+        with self._lock:
+            for url in links[:self.max_documents_per_page]:
+                future = self._by_url.get(url)
+                if future is None:
+                    future = self._by_url[url] = self._downloads.submit(self._process, url)
+                    self.stats['queued'] += 1
+                futures.append(future)
+        return DocumentJob(page_url, futures)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def _download(self, url):
+        """
+        Stream a PDF into a page buffer within the per-document cap and the run
+        budget; returns its handle (None if skipped)
+        """
+        slot = self.throttle.acquire(url) if self.throttle is not None else None
+        try:
+            response = self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        except requests.RequestException:
+            if slot is not None:
+                slot.done(error=True)
+            raise
+        if slot is not None:
+            slot.done(response.status_code, response.elapsed.total_seconds(), response.headers)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type and 'pdf' not in content_type and 'octet-stream' not in content_type:
+                print(f"Skipping document {url}: not a PDF ({content_type})")
+                return None
+            declared = int(response.headers.get('Content-Length') or 0)
+            if declared > self.max_document_bytes:
+                print(f"Skipping document {url}: {declared:,} bytes is over the per-document limit")
+                return None
+            buffer = self.buffers.writer(declared)
+            handle = None
+            held = 0
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    with self._lock:
+                        if len(chunk) > self.bytes_left:
+                            print(f"Document byte budget used up; skipping {url}")
+                            return None
+                        self.bytes_left -= len(chunk)
+                        self.stats['bytes'] += len(chunk)
+                    if self.memory_budget is not None:
+                        self.memory_budget.acquire(len(chunk))
+                        held += len(chunk)
+                    buffer.write(chunk)
+                    if buffer.size > self.max_document_bytes:
+                        print(f"Skipping document {url}: over the per-document limit")
+                        return None
+                handle = buffer.handle()
+                with self.buffers.view(handle) as view:
+                    is_pdf = view[:4] == b'%PDF'
+                if not is_pdf:
+                    print(f"Skipping document {url}: response is not a PDF")
+                    self.buffers.release(handle)
+                    handle = None
+                return handle
+            finally:
+                # On success _process releases the body once it is extracted
+                if handle is None:
+                    buffer.discard()
+                    if self.memory_budget is not None:
+                        self.memory_budget.release(held)
+
+    def _process(self, url):
+        try:
+            handle = self._download(url)
+        except Exception as e:
+            err = re.sub(r'\sfor url:?.*$', ' for url', str(e))
+            print(f"Error fetching document {url}: {err}")
+            self._count('failed')
+            return None
+        if handle is None:
+            self._count('skipped')
+            return None
+        self._count('downloaded')
+        try:
+            return self._extract(url, handle)
+        finally:
+            self.buffers.release(handle)
+            if self.memory_budget is not None:
+                self.memory_budget.release(handle.size)
+
+    def _extract(self, url, handle):
+        with self.buffers.view(handle) as view:
+            digest = hashlib.sha256(view).hexdigest()
+        doc = self._cached(digest)
+        if doc is not None:
+            self._count('cache_hits')
+        else:
+            try:
+                # Blocks this download thread only; the HTML crawl keeps going
+                doc = self._extractors.submit(call_with_buffer, handle, extract_document,
+                                              self.keywords).result()
+            except Exception as e:
+                print(f"Error extracting document {url}: {e}")
+                self._count('failed')
+                return None
+            self._count('extracted')
+            doc['sha256'] = digest
+            self._store(digest, doc)
+        doc = dict(doc)
+        doc['url'] = url
+        return doc
+
+    def _cache_path(self, digest):
+        return self.cache_dir / f"{digest}.json"
+
+    def _cached(self, digest):
+        try:
+            with open(self._cache_path(digest), 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return doc if doc.get('version') == CACHE_VERSION else None
+
+    def _store(self, digest, doc):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._cache_path(digest), 'w', encoding='utf-8') as f:
+                json.dump(dict(doc, version=CACHE_VERSION), f, ensure_ascii=False)
+        except OSError as e:
+            print(f"Could not cache document {digest[:12]}: {e}")
+
+    def close(self):
+        self._downloads.shutdown(wait=True)
+        self._extractors.shutdown(wait=True)
+        self.buffers.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    from categorized_example import CategorizedHealthCrawler
+
+    crawler = CategorizedHealthCrawler()
+    stage = DocumentStage.for_crawler(crawler)
+    job = stage.submit('cli', sys.argv[1:])
+    for doc in job.documents():
+        print(f"{doc['url']}: {doc['pages']} pages, {len(doc['resources'])} resources")
+        for r in doc['resources']:
+            print(f"  {r['category']}: {r['value']}")
+    stage.close()
+    print(stage.stats)
+    print(stage.buffers.summary())
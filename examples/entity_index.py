@@ -0,0 +1,196 @@
+"""
+Entity Index
+Maps normalized phone numbers and addresses to one canonical resource and the
+set of communities that list it, so state-wide hotlines and shared district
+offices are stored once across a nationwide crawl.
+"""
+
+import json
+import re
+
+from phone_scanner import phone_key
+
+# Street suffixes/unit words folded to one spelling for address keys
+ADDRESS_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'road': 'rd', 'boulevard': 'blvd', 'drive': 'dr',
+    'lane': 'ln', 'court': 'ct', 'highway': 'hwy', 'parkway': 'pkwy', 'place': 'pl',
+    'terrace': 'ter', 'suite': 'ste', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+
+
+def address_key(value):
+    """Lowercase address key with punctuation removed and suffixes abbreviated"""
+    words = re.sub(r'[^a-z0-9 ]+', ' ', (value or '').lower()).split()
+    if not words:
+        return None
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(w, w) for w in words)
+
+
+def entity_key(resource):
+    """
+    Return the index key for a resource, or None if it isn't a phone/address
+
+    Keys look like 'phone:17074640861' or 'address:1100 san leandro blvd ...'.
+    """
+    category = resource.get('category')
+    if category == 'CONTACT_INFO' and 'email' not in (resource.get('type') or ''):
+        key = resource.get('phone_key') or phone_key(resource.get('value'))
+        return f"phone:{key}" if key else None
+    if category == 'LOCATION':
+        key = address_key(resource.get('value'))
+        return f"address:{key}" if key else None
+    return None
+
+
+def expand_entities(doc):
+    """Resolve compact {'entity_id': ...} references back into full resources"""
+    entities = {e['entity_id']: e for e in doc.get('entities', []) or []}
+    if not entities:
+        return doc.get('results', []) or []
+    results = []
+    for site in doc.get('results', []) or []:
+        resources = []
+        for r in site.get('resources', []) or []:
+            entity = entities.get(r.get('entity_id')) if 'entity_id' in r else None
+            if entity is None:
+                resources.append(r)
+                continue
+            full = {k: entity[k] for k in ('category', 'type', 'value', 'tags') if k in entity}
+            full['context'] = r.get('context')
+            full['confidence'] = r.get('confidence', entity.get('confidence'))
+            resources.append(full)
+        site = dict(site)
+        site['resources'] = resources
+        results.append(site)
+    return results
+
+
+class EntityIndex:
+    def __init__(self):
+        # key -> canonical entity dict (with a set of communities listing it)
+        self.entities = {}
+        # community -> set of keys it lists
+        self.by_community = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def add_site(self, result):
+        """
+        Index the phone/address resources of one crawled site
+
+        Args:
+            result: A site result dict as stored in BatchHealthCrawler.results
+        """
+        community = result.get('community_id') or result.get('name') or 'Unknown'
+        keys = self.by_community.setdefault(community, set())
+        for resource in result.get('resources', []) or []:
+            key = entity_key(resource)
+            if not key:
+                continue
+            keys.add(key)
+            entity = self.entities.get(key)
+            if entity is None:
+                self.entities[key] = {
+                    'entity_id': f"e{len(self.entities) + 1}",
+                    'category': resource.get('category'),
+                    'type': resource.get('type'),
+                    'value': resource.get('value'),
+                    'tags': list(resource.get('tags') or []),
+                    'confidence': resource.get('confidence'),
+                    'communities': {community},
+                }
+                continue
+            entity['communities'].add(community)
+            # Keep the most confident spelling as the canonical value
+            try:
+                better = float(resource.get('confidence') or 0) > float(entity.get('confidence') or 0)
+            except (TypeError, ValueError):
+                better = False
+            if better:
+                entity['value'] = resource.get('value')
+                entity['type'] = resource.get('type')
+                entity['confidence'] = resource.get('confidence')
+            for tag in resource.get('tags') or []:
+                if tag not in entity['tags']:
+                    entity['tags'].append(tag)
+
+    def add_results(self, results):
+        """Index a list of site results (e.g. doc['results'] from a saved run)"""
+        for result in results:
+            if isinstance(result, dict):
+                self.add_site(result)
+
+    def get(self, value, kind='phone'):
+        """Return the canonical entity for a raw phone/address string (or None)"""
+        key = phone_key(value) if kind == 'phone' else address_key(value)
+        return self.entities.get(f"{kind}:{key}") if key else None
+
+    def listed_by(self, value, kind='phone'):
+        """Return the set of communities that list this phone number/address"""
+        entity = self.get(value, kind)
+        return set(entity['communities']) if entity else set()
+
+    def shared_entities(self, min_communities=2):
+        """Entities listed by at least `min_communities` communities, most shared first"""
+        shared = [e for e in self.entities.values() if len(e['communities']) >= min_communities]
+        shared.sort(key=lambda e: (-len(e['communities']), e['entity_id']))
+        return shared
+
+    def to_dict(self):
+        entities = []
+        for key, entity in self.entities.items():
+            out = dict(entity)
+            out['key'] = key
+            out['communities'] = sorted(entity['communities'])
+            entities.append(out)
+        return {'entities': entities}
+
+    def compact_results(self, results):
+        """
+        Return a copy of `results` where indexed resources are references
+
+        Each indexed phone/address becomes {'entity_id', 'context', 'confidence'}
+        pointing into the entity table; everything else is left inline.
+        """
+        compacted = []
+        for result in results:
+            site = dict(result)
+            resources = []
+            for resource in result.get('resources', []) or []:
+                key = entity_key(resource)
+                entity = self.entities.get(key) if key else None
+                if entity is None:
+                    resources.append(resource)
+                else:
+                    resources.append({
+                        'entity_id': entity['entity_id'],
+                        'context': resource.get('context'),
+                        'confidence': resource.get('confidence'),
+                    })
+            site['resources'] = resources
+            compacted.append(site)
+        return compacted
+
+    def save(self, path):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            print(f"Entity index saved to {path} ({len(self.entities)} entities)")
+        except Exception as e:
+            print(f"Failed to save entity index to {path}: {e}")
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    files = sys.argv[1:] or [str(p) for p in sorted((Path(__file__).parent / 'output').glob('batch_crawl_results_*.json'))[-1:]]
+    index = EntityIndex()
+    for fname in files:
+        with open(fname, 'r', encoding='utf-8') as f:
+            index.add_results(json.load(f).get('results', []))
+    print(f"{len(index)} unique phone numbers/addresses")
+    for entity in index.shared_entities()[:10]:
+        print(f"  {entity['value']}: listed by {len(entity['communities'])} communities")
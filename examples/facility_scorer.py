@@ -0,0 +1,339 @@
+"""
+Facility Scorer
+Classifies facility/service heading candidates in bulk. The headings of a
+page (or of many pages) are collected first, then each shared feature -
+length, word count, exclude/health/indicator/UI/mission term hits, service
+keyword hits - is computed for all of them at once: one combined regex scan
+over the joined texts per term list instead of an any() loop per heading.
+Features are kept as parallel arrays and handed to a pluggable gate (which
+headings are worth tagging) and scorer (category and confidence). The
+default gate and scorer apply the crawler's existing rules unchanged.
+"""
+
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+
+# Look for facility names in headings and specific elements
+### CHANGE 2: facility_selectors, added more specific selectors like .clinic-name, .location-name, and changed last two tuples from ('h1','h2') and ('h2','h3')
+DEFAULT_SELECTORS = [
+    ('h1, h2, h3', 'heading'),
+    ('.facility-name', 'explicit_facility'),
+    ('.clinic-name', 'clinic_listing'),
+    ('.location-name', 'location_listing'),
+    ('h1', 'h2'),
+    ('h2', 'h3')
+]
+
+# Words that make a heading plausible as a facility name
+HEALTH_KEYWORDS = ['clinic', 'hospital', 'medical', 'health', 'center',
+                   'pharmacy', 'dental', 'care', 'urgent', 'family']
+
+# Obvious non-facility headings
+EXCLUDE_TERMS = [
+    'update', 'transcript', 'video', 'welcome', 'report', 'press',
+    'notice', 'alert', 'committee', 'board', 'minutes', 'agenda'
+]
+
+# Section headings that sound like mission/commitment/about text
+MISSION_LIKE = ['mission', 'commitment to', 'our commitment', 'our mission', 'our values', 'about us', 'about', 'what we do']
+
+URL_LIKE = [':', 'http', 'www']
+
+# Contexts where any reasonable heading is accepted
+PERMISSIVE_CONTEXTS = {'explicit_facility', 'clinic_listing', 'location_listing', 'heading', 'h1', 'h2', 'h3'}
+
+# Contexts that name facilities even when structured data already did
+LISTING_CONTEXTS = ('explicit_facility', 'clinic_listing', 'location_listing')
+
+# UI/CTA fragments like 'I want to...'
+TRUNCATED_RE = re.compile(r'(?:\A|(?<=\x00))(?:i want( to)?|want to|i want)\b')
+
+# Separator between texts in a joined scan (can't occur in a term)
+SEP = '\x00'
+
+
+@lru_cache(maxsize=32)
+def term_pattern(terms, word_bounded=False):
+    """One alternation matching any of `terms` (a frozenset); None when empty"""
+    terms = sorted((t for t in terms if t), key=lambda t: (-len(t), t))
+    if not terms:
+        return None
+    body = '|'.join(re.escape(t) for t in terms)
+    return re.compile(r'\b(?:' + body + r')\b' if word_bounded else body)
+
+
+def count_hits(pattern, texts):
+    """Matches of `pattern` in each text, from a single scan over all of them"""
+    hits = array('I', [0]) * len(texts)
+    if pattern is None or not texts:
+        return hits
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + 1
+    for match in pattern.finditer(SEP.join(texts)):
+        hits[bisect_right(starts, match.start()) - 1] += 1
+    return hits
+
+
+class FacilityFeatures:
+    """Candidate headings and their feature columns (index i = one heading)"""
+
+    def __init__(self):
+        self.texts = []      # element text as extracted
+        self.names = []      # whitespace-collapsed text (the emitted value)
+        self.contexts = []   # selector context type
+        self.tag_names = []  # element tag ('h1', 'div', ...)
+        self.pages = []      # page index within the batch
+        self.elements = []
+        # Filled by compute() / compute_services()
+        self.raw_chars = self.chars = self.words = None
+        self.excluded = self.health = self.url_like = None
+        self.raw_ui = self.raw_indicator = None
+        self.ui = self.indicator = self.mission = None
+        self.contact = self.tracing = self.truncated = None
+        self.kept = None
+        self.service_name = self.service_tags = None
+        self.tags = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text, context_type, element, page=0):
+        self.texts.append(text)
+        self.names.append(re.sub(r'\s+', ' ', text.strip()))
+        self.contexts.append(context_type)
+        self.tag_names.append(getattr(element, 'name', None))
+        self.elements.append(element)
+        self.pages.append(page)
+
+    def compute(self, generic_ui_terms, facility_indicators):
+        """Text features for every candidate (lowercased raw and collapsed forms)"""
+        raw = [t.lower() for t in self.texts]
+        lower = [n.lower() for n in self.names]
+        ui = term_pattern(frozenset(generic_ui_terms))
+        indicator = term_pattern(frozenset(facility_indicators))
+
+        self.raw_chars = array('I', map(len, self.texts))
+        self.chars = array('I', map(len, self.names))
+        self.words = array('I', (len(n.split()) for n in self.names))
+        self.excluded = count_hits(term_pattern(frozenset(EXCLUDE_TERMS)), raw)
+        self.health = count_hits(term_pattern(frozenset(HEALTH_KEYWORDS)), raw)
+        self.url_like = count_hits(term_pattern(frozenset(URL_LIKE)), raw)
+        self.raw_ui = count_hits(ui, raw)
+        self.raw_indicator = count_hits(indicator, raw)
+        self.ui = count_hits(ui, lower)
+        self.indicator = count_hits(indicator, lower)
+        self.mission = count_hits(term_pattern(frozenset(MISSION_LIKE)), lower)
+        self.contact = count_hits(term_pattern(frozenset(['contact'])), lower)
+        self.tracing = count_hits(term_pattern(frozenset(['tracing'])), lower)
+        self.truncated = count_hits(TRUNCATED_RE, lower)
+        for i, name in enumerate(self.names):
+            if '...' in name:
+                self.truncated[i] += 1
+
+    def compute_services(self, service_keywords, tags):
+        """
+        Service keyword hits in the name and in the tags of kept candidates
+
+        Args:
+            tags: {index: tag list} for the candidates that were tagged
+        """
+        pattern = term_pattern(frozenset(service_keywords), word_bounded=True)
+        self.tags = tags
+        indices = sorted(tags)
+        names = [self.names[i].lower() for i in indices]
+        tag_texts = [" ".join(tags[i]).lower() for i in indices]
+        name_hits = count_hits(pattern, names)
+        tag_hits = count_hits(pattern, tag_texts)
+        self.service_name = array('I', [0]) * len(self)
+        self.service_tags = array('I', [0]) * len(self)
+        for j, i in enumerate(indices):
+            self.service_name[i] = name_hits[j]
+            self.service_tags[i] = tag_hits[j]
+
+
+# -- default rules --
+
+def looks_like_facility(f, i):
+    """CategorizedHealthCrawler.looks_like_facility_name over feature columns"""
+    if f.excluded[i]:
+        return False
+    reasonable_length = 5 < f.raw_chars[i] < 100
+    if f.contexts[i] and f.contexts[i] in PERMISSIVE_CONTEXTS:
+        if f.raw_ui[i]:
+            return False
+        if f.raw_indicator[i]:
+            return True
+        return bool(f.health[i] or (reasonable_length and not f.url_like[i]))
+    return bool(f.health[i]) and reasonable_length
+
+
+def is_generic_ui(f, i):
+    """UI headings, short 'contact ...' headings and mission/about headings"""
+    if f.ui[i]:
+        return True
+    if f.contact[i] and not f.tracing[i] and f.words[i] <= 3:
+        return True
+    return bool(f.mission[i]) and f.words[i] <= 10
+
+
+def rule_gate(f):
+    """Candidates worth tagging: facility-like, not truncated, not generic UI"""
+    return bytearray(
+        1 if looks_like_facility(f, i) and not f.truncated[i] and not is_generic_ui(f, i) else 0
+        for i in range(len(f))
+    )
+
+
+def base_confidence(context_type, tag_name):
+    if context_type == 'explicit_facility':
+        return 0.9
+    if tag_name == 'h1':
+        return 0.85
+    if tag_name in ('h2', 'h3'):
+        return 0.7
+    return 0.6
+
+
+def length_confidence(chars, words, confidence):
+    """_adjust_confidence_by_length: very long values are likely false positives"""
+    if chars and (chars > 100 or words > 12):
+        return min(confidence, 0.35)
+    return confidence
+
+
+def facility_length_confidence(chars, words, confidence):
+    """_adjust_facility_confidence_by_length: also caps 8-11 word names at 0.55"""
+    if not chars:
+        return confidence
+    if chars > 100 or words > 12:
+        return min(confidence, 0.35)
+    if 7 < words < 12:
+        return min(confidence, 0.55)
+    return confidence
+
+
+def rule_scorer(f):
+    """
+    Today's rules: a service keyword (in name or tags) makes a SERVICE unless
+    the name has a facility indicator; everything else is a FACILITY
+
+    Returns [(category, confidence) or None] aligned with the candidates.
+    """
+    decisions = [None] * len(f)
+    for i in range(len(f)):
+        if not f.kept[i]:
+            continue
+        conf = base_confidence(f.contexts[i], f.tag_names[i])
+        is_service = ((f.service_tags[i] or f.service_name[i])
+                      and not f.indicator[i] and not is_generic_ui(f, i))
+        if is_service:
+            decisions[i] = ('SERVICE', length_confidence(f.chars[i], f.words[i], conf))
+        else:
+            decisions[i] = ('FACILITY', facility_length_confidence(f.chars[i], f.words[i], conf))
+    return decisions
+
+
+def facility_tags(crawler, f, i):
+    """Keyword tags from the heading and its surroundings, plus the facility type"""
+    name = f.names[i]
+    context = crawler.get_surrounding_context(f.elements[i], name)
+    tags = crawler.auto_tag_content(name, context)
+    text_lower = f.texts[i].lower()
+    if 'hospital' in text_lower:
+        tags.append('hospital')
+    elif 'clinic' in text_lower:
+        tags.append('clinic')
+    elif 'pharmacy' in text_lower:
+        tags.append('pharmacy')
+    # Ensure at least a 'general' tag when none were found
+    return tags or ['general']
+
+
+class FacilityBatch:
+    def __init__(self, crawler, gate=rule_gate, scorer=rule_scorer):
+        """
+        Args:
+            crawler: CategorizedHealthCrawler (term sets, context and tagging)
+            gate: Function features -> bytearray flagging candidates to tag
+            scorer: Function features -> [(category, confidence) or None]
+        """
+        self.crawler = crawler
+        self.gate = gate
+        self.scorer = scorer
+        self.features = FacilityFeatures()
+        # Per page: (structured values, facilities covered by structured data)
+        self.page_info = []
+
+    def add_page(self, soup, structured=None, selectors=None):
+        """Collect one page's heading candidates; returns its page index"""
+        page = len(self.page_info)
+        self.page_info.append((structured.values if structured else set(),
+                               structured is not None and structured.covers('FACILITY')))
+        for selector, context_type in (selectors if selectors is not None else DEFAULT_SELECTORS):
+            for element in soup.select(selector):
+                self.features.add(element.get_text(strip=True), context_type, element, page)
+        return page
+
+    def run(self):
+        """Score every collected candidate; returns one resource list per page"""
+        f = self.features
+        crawler = self.crawler
+        f.compute(getattr(crawler, 'generic_ui_terms', ()), getattr(crawler, 'facility_indicators', ()))
+        f.kept = self.gate(f)
+
+        # Dedupe in document order, per page
+        seen = [set() for _ in self.page_info]
+        for i in range(len(f)):
+            if not f.kept[i]:
+                continue
+            name = f.names[i]
+            structured_values = self.page_info[f.pages[i]][0]
+            if name in seen[f.pages[i]] or name.lower() in structured_values:
+                f.kept[i] = 0
+                continue
+            seen[f.pages[i]].add(name)
+
+        tags = {i: facility_tags(crawler, f, i) for i in range(len(f)) if f.kept[i]}
+        f.compute_services(getattr(crawler, 'service_keywords', ()), tags)
+
+        results = [[] for _ in self.page_info]
+        for i, decision in enumerate(self.scorer(f)):
+            if decision is None:
+                continue
+            category, confidence = decision
+            if (category == 'FACILITY' and self.page_info[f.pages[i]][1]
+                    and f.contexts[i] not in LISTING_CONTEXTS):
+                continue
+            results[f.pages[i]].append({
+                'category': category,
+                'type': 'service_name' if category == 'SERVICE' else 'facility_name',
+                'value': f.names[i],
+                'tags': f.tags.get(i) or ['general'],
+                'context': f.contexts[i],
+                'confidence': confidence,
+            })
+        return results
+
+
+# Example usage
+if __name__ == "__main__":
+    from bs4 import BeautifulSoup
+
+    from categorized_example import CategorizedHealthCrawler
+
+    html = """
+    <h1>Alameda County Public Health Department</h1>
+    <h2>Immunization Clinic</h2><h2>Quick Links</h2><h2>Flu Vaccination Program</h2>
+    <h3>Contact Us</h3><h3>Contact Tracing</h3>
+    <div class="clinic-name">Eastmont Wellness Center</div>
+    """
+    crawler = CategorizedHealthCrawler()
+    batch = FacilityBatch(crawler)
+    batch.add_page(BeautifulSoup(html, 'html.parser'))
+    for resource in batch.run()[0]:
+        print(f"{resource['category']:<9} {resource['confidence']:.2f}  {resource['value']}")
@@ -0,0 +1,452 @@
+"""
+Geo Index
+Offline geocoding and nearest-resource queries. Each LOCATION resource's
+ZIP (from its parsed address, or the 'ST 12345' in its value) is mapped to
+that ZIP's centroid using a ZIP-centroid table in data/ - no network calls.
+Located resources go into a 3-D k-d tree (points on the unit sphere, so
+straight-line distance orders results the same as great-circle distance),
+built lazily per tag, so "nearest vaccination clinic to ZIP 95401" is a
+k-nearest-neighbour search over only the places that carry that tag.
+
+data/zip_centroids.csv (Census ZCTA interior points) is bundled, so this
+runs offline out of the box; `python geo_index.py --download` fetches the
+latest Census ZCTA Gazetteer file into data/, which is then used instead
+(any CSV with zip / lat / lon columns works too; see data/README.md).
+Positions are ZIP-level, so distances are approximate (a few miles in rural
+ZIPs).
+"""
+
+import csv
+import gzip
+import heapq
+import io
+import json
+import math
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+from address_parser import STATE_ZIP_RE, STATE_CODES, zip_matches_state
+from entity_index import entity_key, expand_entities
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+# Census ZCTA Gazetteer (public domain); one tab-separated file per year
+GAZETTEER_URL = ('https://www2.census.gov/geo/docs/maps-data/data/gazetteer/'
+                 '2023_Gazetteer/2023_Gaz_zcta_national.zip')
+
+# Looked for in data/ in this order, so a downloaded Census file (which keeps
+# its own name) wins over the bundled zip_centroids.csv
+ZIP_TABLE_PATTERNS = ('*Gaz_zcta_national*', 'zip_centroids.csv', 'zip_centroids.txt',
+                      'zip_centroids.csv.gz', 'zip_centroids.txt.gz')
+
+# Header names accepted for each column (compared lowercased and stripped)
+ZIP_COLUMNS = ('zip', 'zipcode', 'zip_code', 'postal_code', 'zcta', 'zcta5', 'geoid')
+LAT_COLUMNS = ('lat', 'latitude', 'intptlat')
+LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'intptlong')
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Ranges holding at most this many points are scanned instead of split
+LEAF_SIZE = 8
+
+
+class ZipTableMissing(Exception):
+    pass
+
+
+def find_zip_table(data_dir=DATA_DIR):
+    for pattern in ZIP_TABLE_PATTERNS:
+        matches = sorted(Path(data_dir).glob(pattern))
+        if matches:
+            return matches[-1]
+    return None
+
+
+def download_zip_table(url=GAZETTEER_URL, data_dir=DATA_DIR):
+    """
+    Save the ZCTA Gazetteer file (or another centroid table) into data/
+
+    The download is checked with read_zip_table before it replaces anything,
+    so a failed or wrong download never leaves a broken table behind.
+    Returns the saved path.
+    """
+    import requests
+
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    dest = data_dir / url.rstrip('/').rsplit('/', 1)[-1]
+    # Temporary name doesn't match ZIP_TABLE_PATTERNS while it is incomplete
+    fd, tmp = tempfile.mkstemp(prefix='download-', suffix=dest.suffix, dir=data_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            response = requests.get(url, stream=True, timeout=60)
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+        rows = len(read_zip_table(tmp))
+        if not rows:
+            raise ValueError(f"{url}: no ZIP rows")
+        os.replace(tmp, dest)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return dest
+
+
+def _open_text(path):
+    path = Path(path)
+    if path.suffix == '.zip':
+        archive = zipfile.ZipFile(path)
+        member = next(n for n in archive.namelist() if n.endswith(('.txt', '.csv')))
+        return io.TextIOWrapper(archive.open(member), encoding='utf-8-sig')
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8-sig')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def _column(header, names):
+    for i, name in enumerate(header):
+        if name.strip().lower() in names:
+            return i
+    return None
+
+
+def read_zip_table(path):
+    """{zip5: (lat, lon)} from a Gazetteer (tab-separated) or CSV centroid file"""
+    table = {}
+    with _open_text(path) as f:
+        first = f.readline()
+        delimiter = '\t' if '\t' in first else ','
+        header = next(csv.reader([first], delimiter=delimiter))
+        zip_col, lat_col, lon_col = (_column(header, ZIP_COLUMNS), _column(header, LAT_COLUMNS),
+                                     _column(header, LON_COLUMNS))
+        if None in (zip_col, lat_col, lon_col):
+            raise ValueError(f"{path}: need zip, latitude and longitude columns (got {header})")
+        for row in csv.reader(f, delimiter=delimiter):
+            try:
+                zip5 = row[zip_col].strip().zfill(5)[:5]
+                table[zip5] = (float(row[lat_col]), float(row[lon_col]))
+            except (IndexError, ValueError):
+                continue
+    return table
+
+
+def unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_miles(chord):
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, chord / 2))
+
+
+def miles_to_chord(miles):
+    return 2 * math.sin(min(math.pi / 2, miles / (2 * EARTH_RADIUS_MILES)))
+
+
+def resource_zip(resource):
+    """5-digit ZIP of an address resource (parsed components first, then its text)"""
+    address = resource.get('address')
+    if isinstance(address, dict) and address.get('zip'):
+        return str(address['zip'])[:5]
+    found = None
+    for m in STATE_ZIP_RE.finditer(str(resource.get('value') or '')):
+        state = m.group(1).upper()
+        if state in STATE_CODES and zip_matches_state(m.group(2), state):
+            found = m.group(2)
+    return found
+
+
+class Geocoder:
+    def __init__(self, table=None, path=None):
+        """
+        Args:
+            table: {zip5: (lat, lon)} (loaded from `path` or data/ when omitted)
+            path: Centroid file to load
+
+        Raises ZipTableMissing when no table is given and none is found.
+        """
+        if table is None:
+            path = path or find_zip_table()
+            if path is None:
+                raise ZipTableMissing(
+                    f"No ZIP centroid table in {DATA_DIR} (data/zip_centroids.csv is missing); "
+                    f"restore it or run `python geo_index.py --download` "
+                    f"once (see data/README.md, 'ZIP centroids')")
+            table = read_zip_table(path)
+        self.table = table
+        self.stats = {'located': 0, 'no_zip': 0, 'unknown_zip': 0}
+
+    def locate_zip(self, zip_code):
+        return self.table.get(str(zip_code or '').strip()[:5])
+
+    def geocode(self, resource):
+        """{'lat', 'lon', 'zip', 'precision'} for an address resource, or None"""
+        zip5 = resource_zip(resource)
+        if not zip5:
+            self.stats['no_zip'] += 1
+            return None
+        point = self.table.get(zip5)
+        if point is None:
+            self.stats['unknown_zip'] += 1
+            return None
+        self.stats['located'] += 1
+        return {'lat': point[0], 'lon': point[1], 'zip': zip5, 'precision': 'zip_centroid'}
+
+    def annotate(self, resources):
+        """Set resource['geo'] on every LOCATION resource that can be located; returns the count"""
+        located = 0
+        for resource in resources:
+            if resource.get('category') != 'LOCATION':
+                continue
+            geo = self.geocode(resource)
+            if geo is not None:
+                resource['geo'] = geo
+                located += 1
+        return located
+
+
+class KDTree:
+    """Static 3-D k-d tree over unit vectors (median splits, implicit layout)"""
+
+    def __init__(self, points):
+        self.xs = [p[0] for p in points]
+        self.ys = [p[1] for p in points]
+        self.zs = [p[2] for p in points]
+        self.axes = (self.xs, self.ys, self.zs)
+        self.order = list(range(len(points)))
+        self._build(0, len(points), 0)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _build(self, lo, hi, depth):
+        # Explicit stack: ranges are independent once their parent is sorted
+        stack = [(lo, hi, depth)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            axis = self.axes[depth % 3]
+            self.order[lo:hi] = sorted(self.order[lo:hi], key=axis.__getitem__)
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+
+    def nearest(self, point, k=1, max_chord=None):
+        """[(chord distance, point index)] of the k nearest points, closest first"""
+        if k <= 0 or not self.order:
+            return []
+        qx, qy, qz = point
+        q = (qx, qy, qz)
+        xs, ys, zs, order = self.xs, self.ys, self.zs, self.order
+        bound = max_chord * max_chord if max_chord is not None else math.inf
+        heap = []  # max-heap of (-d2, index)
+
+        def consider(i):
+            d2 = (xs[i] - qx) ** 2 + (ys[i] - qy) ** 2 + (zs[i] - qz) ** 2
+            if d2 > bound:
+                return
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, i))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, i))
+
+        def worst():
+            return -heap[0][0] if len(heap) == k else bound
+
+        def search(lo, hi, depth):
+            if hi - lo <= LEAF_SIZE:
+                for n in range(lo, hi):
+                    consider(order[n])
+                return
+            mid = (lo + hi) // 2
+            i = order[mid]
+            consider(i)
+            diff = q[depth % 3] - self.axes[depth % 3][i]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff <= 0 else ((mid + 1, hi), (lo, mid))
+            search(near[0], near[1], depth + 1)
+            if diff * diff <= worst():
+                search(far[0], far[1], depth + 1)
+
+        search(0, len(order), 0)
+        return sorted((math.sqrt(-d2), i) for d2, i in heap)
+
+
+class GeoIndex:
+    def __init__(self, geocoder=None, min_confidence=0.5):
+        """
+        Args:
+            geocoder: Geocoder used for resources without a 'geo' field
+            min_confidence: Resources below this confidence are not indexed
+        """
+        self.geocoder = geocoder
+        self.min_confidence = min_confidence
+        # Distinct located resources (an address shared by several sites is one entry)
+        self.entries = []
+        self._entry_by_key = {}
+        # Distinct positions: (lat, lon) -> point id, and the entries at each point
+        self.points = []
+        self._point_by_pos = {}
+        self.point_entries = []
+        self._trees = {}
+
+    def add_site(self, site):
+        """Index one site result's located resources; returns how many were added"""
+        added = 0
+        for resource in site.get('resources') or []:
+            if resource.get('category') != 'LOCATION':
+                continue
+            try:
+                if float(resource.get('confidence', 1.0)) < self.min_confidence:
+                    continue
+            except (TypeError, ValueError):
+                continue
+            geo = resource.get('geo')
+            if geo is None and self.geocoder is not None:
+                geo = self.geocoder.geocode(resource)
+            if not geo:
+                continue
+            key = entity_key(resource) or str(resource.get('value') or '').lower()
+            site_ref = {'community_id': site.get('community_id'), 'name': site.get('name'),
+                        'state_id': site.get('state_id')}
+            index = self._entry_by_key.get(key)
+            if index is not None:
+                entry = self.entries[index]
+                tags = {str(t).lower() for t in resource.get('tags') or []}
+                if not tags <= entry['tags']:
+                    entry['tags'] |= tags
+                    self._trees.clear()
+                if site_ref not in entry['sites']:
+                    entry['sites'].append(site_ref)
+                continue
+            pos = (round(geo['lat'], 6), round(geo['lon'], 6))
+            point = self._point_by_pos.get(pos)
+            if point is None:
+                point = self._point_by_pos[pos] = len(self.points)
+                self.points.append(unit_vector(*pos))
+                self.point_entries.append([])
+            self._entry_by_key[key] = len(self.entries)
+            self.point_entries[point].append(len(self.entries))
+            self.entries.append({
+                'value': resource.get('value'),
+                'type': resource.get('type'),
+                'tags': {str(t).lower() for t in resource.get('tags') or []},
+                'confidence': resource.get('confidence'),
+                'lat': geo['lat'],
+                'lon': geo['lon'],
+                'zip': geo.get('zip'),
+                'sites': [site_ref],
+            })
+            added += 1
+        if added:
+            self._trees.clear()
+        return added
+
+    def add_doc(self, doc):
+        added = 0
+        for site in expand_entities(doc):
+            added += self.add_site(site)
+        return added
+
+    @classmethod
+    def from_paths(cls, paths, geocoder=None, min_confidence=0.5):
+        index = cls(geocoder, min_confidence)
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                index.add_doc(json.load(f))
+        return index
+
+    def _tree(self, tag):
+        """k-d tree over the points holding at least one entry with `tag` (None = any)"""
+        tree = self._trees.get(tag)
+        if tree is None:
+            ids = [p for p, entries in enumerate(self.point_entries)
+                   if tag is None or any(tag in self.entries[e]['tags'] for e in entries)]
+            tree = self._trees[tag] = (KDTree([self.points[p] for p in ids]), ids)
+        return tree
+
+    def nearest(self, zip_code=None, lat=None, lon=None, tag=None, k=5, max_miles=None):
+        """
+        The k located resources closest to a ZIP or a lat/lon
+
+        Args:
+            zip_code: Origin ZIP (needs a geocoder); otherwise pass lat and lon
+            tag: Only resources with this tag (e.g. 'vaccination')
+            max_miles: Ignore resources farther away than this
+
+        Returns result dicts with 'miles', closest first.
+        """
+        if zip_code is not None:
+            origin = self.geocoder.locate_zip(zip_code) if self.geocoder else None
+            if origin is None:
+                raise KeyError(f"ZIP {zip_code} is not in the centroid table")
+            lat, lon = origin
+        tag = tag.lower() if tag else None
+        tree, ids = self._tree(tag)
+        max_chord = miles_to_chord(max_miles) if max_miles is not None else None
+        # Each of the k nearest points holds at least one matching entry
+        results = []
+        for chord, n in tree.nearest(unit_vector(lat, lon), k, max_chord):
+            miles = round(chord_to_miles(chord), 2)
+            for e in self.point_entries[ids[n]]:
+                entry = self.entries[e]
+                if tag is None or tag in entry['tags']:
+                    results.append(dict(entry, tags=sorted(entry['tags']), miles=miles))
+        return results[:k]
+
+    def stats(self):
+        return {'entries': len(self.entries), 'points': len(self.points), 'trees': len(self._trees)}
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    base = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Nearest located resources to a ZIP code")
+    parser.add_argument('zip', nargs='?', help="Origin ZIP, e.g. 95401")
+    parser.add_argument('--tag', help="Only resources with this tag, e.g. vaccination")
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--max-miles', type=float)
+    parser.add_argument('paths', nargs='*', help="Saved runs (default: cleaned_output/, else output/)")
+    parser.add_argument('--download', action='store_true',
+                        help="Fetch the latest Census ZCTA Gazetteer file into data/ first")
+    args = parser.parse_args()
+
+    if args.download:
+        try:
+            saved = download_zip_table()
+        except Exception as e:
+            print(f"Download failed: {e}")
+            raise SystemExit(1)
+        print(f"Saved {saved}")
+    if not args.zip:
+        if not args.download:
+            parser.error("a ZIP is required")
+        raise SystemExit(0)
+
+    try:
+        geocoder = Geocoder()
+    except ZipTableMissing as e:
+        print(e)
+        raise SystemExit(1)
+    paths = args.paths or sorted((base / 'cleaned_output').glob('*.json')) or sorted((base / 'output').glob('batch_crawl_results_*.json'))
+    started = time.perf_counter()
+    index = GeoIndex.from_paths(paths, geocoder)
+    print(f"Indexed {len(index.entries)} located resources at {len(index.points)} ZIP centroids "
+          f"from {len(paths)} file(s) in {time.perf_counter() - started:.2f}s "
+          f"({geocoder.stats['no_zip']} without a ZIP, {geocoder.stats['unknown_zip']} with an unknown ZIP)")
+    started = time.perf_counter()
+    try:
+        found = index.nearest(zip_code=args.zip, tag=args.tag, k=args.k, max_miles=args.max_miles)
+    except KeyError as e:
+        print(e.args[0])
+        raise SystemExit(1)
+    print(f"Query took {(time.perf_counter() - started) * 1000:.1f} ms")
+    for r in found:
+        sites = ', '.join(s['name'] or s['community_id'] or '' for s in r['sites'])
+        print(f"{r['miles']:>8.1f} mi  {r['value']}  [{', '.join(r['tags'])}]  ({sites})")
@@ -0,0 +1,294 @@
+"""
+Host Throttle
+Adaptive request spacing and concurrency per host, per resolved IP and per
+hosting platform (many counties share one CivicPlus or Granicus cluster).
+Each key follows AIMD feedback: every healthy response shortens its interval
+a little and, after a streak, allows one more request in flight; a 429/503
+(or a 403 from a fragile host), an error or a very slow answer doubles the
+interval and halves the concurrency. Retry-After is honored as a hard pause.
+Learned limits are saved to a JSON file so the next run starts at the right
+speed instead of the old fixed delay.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+DEFAULT_LIMITS_PATH = os.path.join('output', 'host_limits.json')
+
+# Starting interval for a host with no saved limit (the old global delay)
+DEFAULT_INTERVAL = 2.0
+MIN_INTERVAL = 0.5
+MAX_INTERVAL = 60.0
+MAX_CONCURRENCY = 4
+
+# AIMD steps: additive speed-up per healthy response, multiplicative back-off
+DECREASE_STEP = 0.25
+BACKOFF_FACTOR = 2.0
+SLOW_BACKOFF_FACTOR = 1.5
+# Healthy responses in a row before one more concurrent request is allowed
+INCREASE_EVERY = 5
+
+# Responses slower than this (or 3x the host's usual latency) count as congestion
+SLOW_SECONDS = 10.0
+
+# Statuses that mean "you are going too fast"
+THROTTLE_STATUSES = {429, 503}
+# Fragile hosts answer bot-like traffic with 403
+SOFT_THROTTLE_STATUSES = {403}
+
+# Longest Retry-After pause honored
+MAX_RETRY_AFTER = 600
+
+# Share of a host's interval applied to its IP and platform keys: several
+# hosts on one server or platform may go faster together than one host alone
+KIND_SCALE = {'host': 1.0, 'ip': 0.5, 'platform': 0.25}
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = when.timestamp() - (now if now is not None else time.time())
+    return max(0.0, min(seconds, MAX_RETRY_AFTER))
+
+
+class KeyLimit:
+    """AIMD state for one host / IP / platform key"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, concurrency=1):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.next_allowed = 0.0
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.streak = 0
+        self.latency = None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def wait_time(self, now):
+        return max(self.next_allowed - now, self.blocked_until - now, 0.0)
+
+    def success(self, seconds):
+        if seconds is not None:
+            slow = seconds > SLOW_SECONDS or (self.latency is not None and seconds > 3 * self.latency + 1)
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            if slow:
+                self.streak = 0
+                self.interval = min(MAX_INTERVAL, self.interval * SLOW_BACKOFF_FACTOR)
+                return
+        self.interval = max(MIN_INTERVAL, self.interval - DECREASE_STEP)
+        self.streak += 1
+        if self.streak >= INCREASE_EVERY:
+            self.streak = 0
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1)
+
+    def backoff(self, factor=BACKOFF_FACTOR):
+        self.streak = 0
+        self.interval = min(MAX_INTERVAL, self.interval * factor)
+        self.concurrency = max(1, self.concurrency // 2)
+
+    def to_dict(self):
+        return {
+            'interval': round(self.interval, 3),
+            'concurrency': self.concurrency,
+            'latency': None if self.latency is None else round(self.latency, 3),
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'updated': datetime.now().isoformat(),
+        }
+
+
+class Slot:
+    """One admitted request; report its outcome with done()"""
+
+    def __init__(self, throttle, keys):
+        self.throttle = throttle
+        self.keys = keys
+        self.started = time.monotonic()
+        self.finished = False
+
+    def done(self, status_code=None, seconds=None, headers=None, error=False):
+        """
+        Args:
+            status_code: HTTP status (None when no response arrived)
+            seconds: Response time (measured from acquire when omitted)
+            headers: Response headers (for Retry-After)
+            error: True for connection errors and timeouts
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if seconds is None:
+            seconds = time.monotonic() - self.started
+        self.throttle._release(self.keys, status_code, seconds, headers, error)
+
+
+class HostThrottle:
+    def __init__(self, path=DEFAULT_LIMITS_PATH, default_interval=DEFAULT_INTERVAL, resolver=None):
+        """
+        Args:
+            path: JSON file learned limits are loaded from and saved to
+                (None = keep them in memory only)
+            default_interval: Starting seconds between requests for new hosts
+            resolver: Function host -> IP (or None) for the per-IP key;
+                None skips per-IP limits
+        """
+        self.path = path
+        self.default_interval = default_interval
+        self.resolver = resolver
+        self.limits = {}
+        self.saved = {}
+        # host -> resolved IP (resolved once per run)
+        self.ips = {}
+        self._cond = threading.Condition()
+        self.stats = {'requests': 0, 'waits': 0, 'wait_seconds': 0.0, 'throttled': 0, 'retry_after': 0}
+        if path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.saved = json.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Could not read host limits {path}: {e}")
+
+    def keys_for(self, url, platform=None):
+        host = (urlsplit(url).hostname or '').lower()
+        keys = [f"host:{host}"]
+        if self.resolver is not None and host:
+            if host not in self.ips:
+                try:
+                    self.ips[host] = self.resolver(host)
+                except Exception:
+                    self.ips[host] = None
+            ip = self.ips[host]
+            if ip:
+                keys.append(f"ip:{ip}")
+        if platform:
+            keys.append(f"platform:{platform}")
+        return keys
+
+    def limit(self, key):
+        limit = self.limits.get(key)
+        if limit is None:
+            scale = KIND_SCALE.get(key.split(':', 1)[0], 1.0)
+            saved = self.saved.get(key)
+            if saved:
+                limit = KeyLimit(saved.get('interval', self.default_interval * scale),
+                                 saved.get('concurrency', 1))
+                limit.latency = saved.get('latency')
+            else:
+                limit = KeyLimit(max(MIN_INTERVAL, self.default_interval * scale))
+            self.limits[key] = limit
+        return limit
+
+    def acquire(self, url, platform=None):
+        """Block until every key of `url` allows another request; returns a Slot"""
+        keys = self.keys_for(url, platform)
+        waited = 0.0
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                limits = [self.limit(k) for k in keys]
+                wait = max(l.wait_time(now) for l in limits)
+                if wait <= 0 and all(l.in_flight < l.concurrency for l in limits):
+                    break
+                # Woken early when a slot is released
+                timeout = wait if wait > 0 else None
+                started = time.monotonic()
+                self._cond.wait(timeout)
+                waited += time.monotonic() - started
+            for l in limits:
+                l.in_flight += 1
+                l.requests += 1
+                l.next_allowed = now + l.interval
+            self.stats['requests'] += 1
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += waited
+        return Slot(self, keys)
+
+    def _release(self, keys, status_code, seconds, headers, error):
+        retry_after = parse_retry_after(headers.get('Retry-After')) if headers else None
+        with self._cond:
+            now = time.monotonic()
+            for key in keys:
+                l = self.limit(key)
+                l.in_flight = max(0, l.in_flight - 1)
+                if status_code in THROTTLE_STATUSES or status_code in SOFT_THROTTLE_STATUSES:
+                    l.throttled += 1
+                    l.backoff()
+                elif error or (status_code is not None and status_code >= 500):
+                    l.errors += 1
+                    l.backoff(SLOW_BACKOFF_FACTOR)
+                else:
+                    l.success(seconds)
+                if retry_after is not None and status_code in THROTTLE_STATUSES:
+                    l.blocked_until = max(l.blocked_until, now + retry_after)
+            if status_code in THROTTLE_STATUSES or status_code in SOFT_THROTTLE_STATUSES:
+                self.stats['throttled'] += 1
+            if retry_after is not None and status_code in THROTTLE_STATUSES:
+                self.stats['retry_after'] += 1
+            self._cond.notify_all()
+
+    def save(self):
+        """Merge this run's limits into the JSON file (other processes' keys are kept)"""
+        if not self.path:
+            return
+        with self._cond:
+            observed = {key: l.to_dict() for key, l in self.limits.items() if l.requests}
+        try:
+            current = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    current = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+            current.update(observed)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+            self.saved = current
+        except Exception as e:
+            print(f"Failed to save host limits to {self.path}: {e}")
+
+    def summary(self):
+        """Per-key limits for crawl_info"""
+        with self._cond:
+            return {key: l.to_dict() for key, l in self.limits.items() if l.requests}
+
+
+def resolve_host(host):
+    """Default resolver for per-IP limits (first IPv4/IPv6 address, or None)"""
+    try:
+        return socket.getaddrinfo(host, None)[0][4][0]
+    except (socket.gaierror, OSError):
+        return None
+
+
+# Example usage
+if __name__ == "__main__":
+    throttle = HostThrottle(path=DEFAULT_LIMITS_PATH)
+    if not throttle.saved:
+        print(f"No saved limits in {DEFAULT_LIMITS_PATH}")
+    for key, saved in sorted(throttle.saved.items(), key=lambda kv: -kv[1].get('interval', 0)):
+        print(f"{key:50} interval {saved['interval']:>6.2f}s  concurrency {saved['concurrency']}"
+              f"  throttled {saved.get('throttled', 0)}")
@@ -0,0 +1,332 @@
+"""
+Page Buffers
+Hands raw response bodies from fetch threads to parser processes without
+pickling them. A fetcher streams the body into a buffer from the pool
+(a multiprocessing.shared_memory segment, or an mmap'd spill file once the
+shared-memory budget is used up or /dev/shm is unavailable) and passes the
+small BufferHandle to the worker, which maps the same memory and reads it
+as a memoryview. Once extraction finishes the owner releases the buffer:
+segments go back to a free list by size class, spill files are deleted.
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+MB = 1024 * 1024
+
+# Shared memory held by live and idle buffers (docker's /dev/shm is 64 MB)
+DEFAULT_SHARED_BYTES = 32 * MB
+# Idle segments kept for reuse
+DEFAULT_IDLE_BYTES = 8 * MB
+# Smallest size class; larger buffers round up to a power of two
+MIN_BUFFER_SIZE = 64 * 1024
+
+# kind is 'shm' (name = segment name) or 'file' (name = spill file path)
+BufferHandle = namedtuple('BufferHandle', ['kind', 'name', 'size'])
+
+
+def size_class(n):
+    size = MIN_BUFFER_SIZE
+    while size < n:
+        size *= 2
+    return size
+
+
+def _attach(name):
+    """Map an existing segment without registering it with this process's resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track flag
+        return shared_memory.SharedMemory(name=name)
+
+
+@contextmanager
+def open_buffer(handle):
+    """
+    Read-only memoryview of a buffer's bytes, in any process
+
+    The view is only valid inside the with-block; copy anything that must
+    outlive it (bytes(view[a:b])).
+    """
+    if handle.size == 0:
+        yield memoryview(b'')
+        return
+    if handle.kind == 'shm':
+        segment = _attach(handle.name)
+        view = segment.buf[:handle.size]
+        readonly = view.toreadonly()
+        try:
+            yield readonly
+        finally:
+            readonly.release()
+            view.release()
+            try:
+                segment.close()
+            except BufferError:
+                pass  # a caller kept a slice; the mapping goes with it
+    else:
+        with open(handle.name, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), handle.size, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+
+def call_with_buffer(handle, func, *args):
+    """Run func(view, *args) on a buffer's bytes (submit this to a process pool)"""
+    with open_buffer(handle) as view:
+        return func(view, *args)
+
+
+class PageBuffer:
+    """One body being written by a fetcher"""
+
+    def __init__(self, pool, size_hint=0):
+        self.pool = pool
+        self.size = 0
+        self.segment = None
+        self.file = None
+        self.path = None
+        self.released = False
+        self._reserve(size_hint)
+
+    def _reserve(self, n):
+        if self.file is not None:
+            return
+        if self.segment is not None and n <= self.segment.size:
+            return
+        new = self.pool._take_segment(max(n, self.size * 2))
+        if new is None:
+            self._spill()
+            return
+        if self.segment is not None:
+            new.buf[:self.size] = self.segment.buf[:self.size]
+            self.pool._give_segment(self.segment)
+        self.segment = new
+
+    def _spill(self):
+        fd, self.path = tempfile.mkstemp(prefix='page-', suffix='.buf', dir=self.pool.spill_dir)
+        self.file = os.fdopen(fd, 'wb')
+        if self.segment is not None:
+            self.file.write(self.segment.buf[:self.size])
+            self.pool._give_segment(self.segment)
+            self.segment = None
+        self.pool._count('spilled')
+
+    def write(self, chunk):
+        n = len(chunk)
+        if self.file is not None:
+            self.file.write(chunk)
+        else:
+            self._reserve(self.size + n)
+            if self.file is not None:
+                self.file.write(chunk)
+            else:
+                self.segment.buf[self.size:self.size + n] = chunk
+        self.size += n
+        return n
+
+    def handle(self):
+        """Finish writing; returns the handle to pass to a worker"""
+        if self.file is not None:
+            if not self.file.closed:
+                self.file.close()
+            return self.pool._register(BufferHandle('file', self.path, self.size), self)
+        if self.segment is None:
+            return BufferHandle('shm', '', 0)
+        return self.pool._register(BufferHandle('shm', self.segment.name, self.size), self)
+
+    def discard(self):
+        """Give the buffer back without handing it out (failed download)"""
+        self.pool._free(self)
+
+
+class PageBufferPool:
+    def __init__(self, max_shared_bytes=DEFAULT_SHARED_BYTES, max_idle_bytes=DEFAULT_IDLE_BYTES,
+                 spill_dir=None):
+        """
+        Args:
+            max_shared_bytes: Shared memory live and idle buffers may hold;
+                bodies that don't fit are spilled to files
+            max_idle_bytes: Released segments kept for reuse
+            spill_dir: Directory for spill files (None = the system temp dir)
+        """
+        self.max_shared_bytes = max_shared_bytes
+        self.max_idle_bytes = max_idle_bytes
+        self.spill_dir = spill_dir
+        self.shared_bytes = 0
+        # size class -> [idle segments]
+        self.idle = {}
+        self.idle_bytes = 0
+        # handle -> PageBuffer
+        self.live = {}
+        self._lock = threading.Lock()
+        self.stats = {'buffers': 0, 'allocated': 0, 'reused': 0, 'spilled': 0,
+                      'released': 0, 'shared_peak_bytes': 0, 'shm_errors': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def writer(self, size_hint=0):
+        """New buffer for one body (size_hint: expected bytes, e.g. Content-Length)"""
+        self._count('buffers')
+        return PageBuffer(self, size_hint)
+
+    def put(self, data):
+        """Copy bytes into a new buffer; returns its handle"""
+        buffer = self.writer(len(data))
+        buffer.write(data)
+        return buffer.handle()
+
+    def _take_segment(self, n):
+        size = size_class(n)
+        with self._lock:
+            free = self.idle.get(size)
+            if free:
+                self.idle_bytes -= size
+                self.stats['reused'] += 1
+                return free.pop()
+            # Make room by dropping idle segments of other sizes
+            while self.shared_bytes + size > self.max_shared_bytes and self.idle_bytes:
+                self._drop_idle_one()
+            if self.shared_bytes + size > self.max_shared_bytes:
+                return None
+            self.shared_bytes += size
+            self.stats['shared_peak_bytes'] = max(self.stats['shared_peak_bytes'], self.shared_bytes)
+        try:
+            segment = shared_memory.SharedMemory(create=True, size=size)
+        except OSError:
+            with self._lock:
+                self.shared_bytes -= size
+                self.stats['shm_errors'] += 1
+            return None
+        self._count('allocated')
+        return segment
+
+    def _drop_idle_one(self):
+        # Caller holds the lock
+        for size, free in self.idle.items():
+            if free:
+                segment = free.pop()
+                self.idle_bytes -= size
+                self.shared_bytes -= size
+                self._destroy(segment)
+                return
+
+    def _give_segment(self, segment):
+        size = segment.size
+        with self._lock:
+            if self.idle_bytes + size <= self.max_idle_bytes:
+                self.idle.setdefault(size, []).append(segment)
+                self.idle_bytes += size
+                return
+            self.shared_bytes -= size
+        self._destroy(segment)
+
+    @staticmethod
+    def _destroy(segment):
+        try:
+            segment.close()
+            segment.unlink()
+        except (OSError, BufferError):
+            pass
+
+    def _register(self, handle, buffer):
+        with self._lock:
+            self.live[handle] = buffer
+        return handle
+
+    @contextmanager
+    def view(self, handle):
+        """Read a buffer in the owning process (no re-mapping for segments)"""
+        with self._lock:
+            buffer = self.live.get(handle)
+        if buffer is not None and buffer.segment is not None:
+            view = buffer.segment.buf[:handle.size]
+            readonly = view.toreadonly()
+            try:
+                yield readonly
+            finally:
+                readonly.release()
+                view.release()
+        else:
+            with open_buffer(handle) as view:
+                yield view
+
+    def release(self, handle):
+        """Reclaim a buffer once every reader is done with it"""
+        with self._lock:
+            buffer = self.live.pop(handle, None)
+        if buffer is not None:
+            self._free(buffer)
+
+    def _free(self, buffer):
+        if buffer.released:
+            return
+        buffer.released = True
+        if buffer.segment is not None:
+            self._give_segment(buffer.segment)
+            buffer.segment = None
+        if buffer.file is not None:
+            if not buffer.file.closed:
+                buffer.file.close()
+            try:
+                os.remove(buffer.path)
+            except OSError:
+                pass
+        self._count('released')
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, live=len(self.live), shared_bytes=self.shared_bytes,
+                        idle_bytes=self.idle_bytes)
+
+    def close(self):
+        """Unlink every segment and spill file (live buffers included)"""
+        with self._lock:
+            live = list(self.live.values())
+            self.live.clear()
+        for buffer in live:
+            self._free(buffer)
+        with self._lock:
+            idle = [s for free in self.idle.values() for s in free]
+            self.idle.clear()
+            self.shared_bytes -= self.idle_bytes
+            self.idle_bytes = 0
+        for segment in idle:
+            self._destroy(segment)
+
+
+def _demo_digest(view):
+    # Module level so spawn-based process pools (macOS, Windows) can import it
+    return hashlib.sha256(view).hexdigest()[:16]
+
+
+# Example usage
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = PageBufferPool(max_shared_bytes=4 * MB)
+    bodies = [os.urandom(n) for n in (10_000, 300_000, 3 * MB, 5 * MB)]
+    with ProcessPoolExecutor(max_workers=2) as workers:
+        handles = [pool.put(body) for body in bodies]
+        for body, handle in zip(bodies, handles):
+            result = workers.submit(call_with_buffer, handle, _demo_digest).result()
+            print(f"{handle.kind:<4} {handle.size:>9,} bytes  worker {result}  "
+                  f"match {result == hashlib.sha256(body).hexdigest()[:16]}")
+            pool.release(handle)
+    print(pool.summary())
+    pool.close()
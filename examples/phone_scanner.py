@@ -0,0 +1,153 @@
+"""
+Phone Scanner
+Finds US/NANP phone numbers in one regex pass and turns each one into an
+integer E.164 key (e.g. 17074640861) plus a display format, so dedup and
+cleaning become integer comparisons.
+"""
+
+import re
+
+# Toll-free NPAs ('822' is reserved but already treated as toll-free by the crawler)
+TOLL_FREE_NPAS = frozenset({'800', '833', '844', '855', '866', '877', '888', '822'})
+
+# NPAs that are valid in format but never dialed as a real service number
+# (premium-rate, government/interexchange special use and test codes)
+SPECIAL_NPAS = frozenset({'500', '521', '522', '523', '524', '525', '526', '527', '528', '529',
+                          '533', '544', '566', '577', '588', '600', '622', '700', '710', '900', '950', '976'})
+
+# Letters on a phone keypad, for vanity numbers like 1-800-FLU-SHOT
+VANITY_TABLE = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', '22233344455566677778889999')
+
+# One alternation-free scan: optional +1, area code with or without
+# parentheses (also tolerates the common '707) 465-0426' typo), then either a
+# numeric or an uppercase vanity subscriber part, then an optional extension.
+PHONE_RE = re.compile(
+    r'(?<![\d+])'
+    r'(?:\+?1[-.\s]?)?'
+    r'(?:\(\s*(?P<npa_p>\d{3})\s*\)|(?P<npa>\d{3})\)?)'
+    r'[-.\s]?\s?'
+    r'(?:(?P<nxx>\d{3})[-.\s]?(?P<line>\d{4})(?!\d)'
+    r'|(?P<vanity>[A-Z0-9]{3}[-.\s]?[A-Z]{4}|[A-Z]{3}[-.\s]?[A-Z0-9]{4})(?![A-Za-z0-9]))'
+    r'(?:\s*,?\s*(?i:ext\.?|extension|x)\s*(?P<ext>\d{1,6})(?!\d))?'
+)
+
+
+def valid_npa(npa):
+    """NANP area code rules: [2-9][0-8]X, not N11, not the reserved 37X/96X blocks"""
+    if len(npa) != 3 or not npa.isdigit():
+        return False
+    if npa[0] in '01' or npa[1] == '9' or npa[1:] == '11':
+        return False
+    if npa[:2] in ('37', '96'):
+        return False
+    return npa not in SPECIAL_NPAS
+
+
+def valid_nxx(nxx):
+    """Exchange code rules: [2-9]XX and not N11"""
+    return len(nxx) == 3 and nxx[0] not in '01' and nxx[1:] != '11'
+
+
+class PhoneMatch:
+    __slots__ = ('key', 'npa', 'ext', 'is_toll_free', 'vanity', 'raw', 'start', 'end')
+
+    def __init__(self, key, npa, ext, is_toll_free, vanity, raw, start, end):
+        self.key = key
+        self.npa = npa
+        self.ext = ext
+        self.is_toll_free = is_toll_free
+        self.vanity = vanity
+        self.raw = raw
+        self.start = start
+        self.end = end
+
+    @property
+    def e164(self):
+        return f"+{self.key}"
+
+    @property
+    def dedup_key(self):
+        """Integer key that also keeps different extensions of one number apart"""
+        return self.key * 1000000 + (self.ext or 0)
+
+    @property
+    def display(self):
+        digits = str(self.key)[1:]
+        out = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+        if self.ext is not None:
+            out += f" ext. {self.ext}"
+        return out
+
+    def __repr__(self):
+        return f"PhoneMatch({self.display!r}, key={self.key})"
+
+
+def scan_phones(text):
+    """
+    Yield a PhoneMatch for every valid phone number in `text`
+
+    Numbers that match the shape but fail NPA/exchange validation (e.g.
+    '123-456-7890', 555-01XX fictional lines, 9-digit fragments of longer
+    ids) are skipped.
+    """
+    if not text:
+        return
+    for m in PHONE_RE.finditer(text):
+        npa = m.group('npa_p') or m.group('npa')
+        vanity = m.group('vanity')
+        if vanity:
+            subscriber = re.sub(r'[-.\s]', '', vanity).translate(VANITY_TABLE)
+            # Vanity spellings are only used on toll-free lines in practice
+            if npa not in TOLL_FREE_NPAS:
+                continue
+            nxx, line = subscriber[:3], subscriber[3:]
+        else:
+            nxx, line = m.group('nxx'), m.group('line')
+        if not valid_npa(npa) or not valid_nxx(nxx):
+            continue
+        if nxx == '555' and line.startswith('01'):
+            continue
+        ext = m.group('ext')
+        yield PhoneMatch(
+            key=int(f"1{npa}{nxx}{line}"),
+            npa=npa,
+            ext=int(ext) if ext else None,
+            is_toll_free=npa in TOLL_FREE_NPAS,
+            vanity=bool(vanity),
+            raw=m.group(0).strip(),
+            start=m.start(),
+            end=m.end(),
+        )
+
+
+def parse_phone(value):
+    """Return the first PhoneMatch in a single value (or None)"""
+    if not value or not isinstance(value, str):
+        return None
+    s = value.strip()
+    for match in scan_phones(s):
+        return match
+    return None
+
+
+def normalize_phone(value):
+    """Display format '(707) 465-0426 ext. 12' for a phone value, or the trimmed input"""
+    match = parse_phone(value)
+    if match is None:
+        return value.strip() if isinstance(value, str) else value
+    return match.display
+
+
+def phone_key(value):
+    """Integer E.164 key for a phone value, or None"""
+    match = parse_phone(value)
+    return match.key if match else None
+
+
+# Example usage
+if __name__ == "__main__":
+    sample = ("Call (707) 464-0861 or 1-800-FLU-SHOT. Crisis line: 800.273.8255 x 12. "
+              "Fax 707) 465-0426. Not a phone: 123-456-7890, ID 1234567890123.")
+    for phone in scan_phones(sample):
+        kind = 'toll-free' if phone.is_toll_free else 'local'
+        print(f"{phone.raw!r:28} -> {phone.display:24} key={phone.key} ({kind})")
@@ -0,0 +1,185 @@
+"""
+Platform Profiles
+Recognizes the CMS a county site runs on (CivicPlus, WordPress, Drupal,
+Granicus/OpenCities, Revize) from its URL shape, response headers and markup,
+and supplies a short selector set tuned to that platform's contact widgets,
+directories and footers. Unknown platforms keep the generic selectors.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+
+class PlatformProfile:
+    def __init__(self, name, url_patterns=(), header_patterns=(), markup_patterns=(),
+                 phone_selectors=(), address_selectors=(), facility_selectors=()):
+        """
+        Args:
+            name: Platform name (also used as the boilerplate/throttle scope)
+            url_patterns: Regexes on the URL path (weak signal, 1 point)
+            header_patterns: (header, regex) pairs on the response headers (2 points)
+            markup_patterns: Regexes on the raw HTML (2 points)
+            phone_selectors / address_selectors / facility_selectors:
+                (css selector, context) pairs used instead of the generic ones
+        """
+        self.name = name
+        self.url_patterns = [re.compile(p, re.IGNORECASE) for p in url_patterns]
+        self.header_patterns = [(h.lower(), re.compile(p, re.IGNORECASE)) for h, p in header_patterns]
+        self.markup_patterns = [re.compile(p, re.IGNORECASE) for p in markup_patterns]
+        self.phone_selectors = list(phone_selectors)
+        self.address_selectors = list(address_selectors)
+        self.facility_selectors = list(facility_selectors)
+
+    def score(self, url, html, headers=None):
+        path = urlsplit(url or '').path
+        points = sum(1 for p in self.url_patterns if p.search(path))
+        for header, pattern in self.header_patterns:
+            value = headers.get(header) if headers else None
+            if value and pattern.search(value):
+                points += 2
+        points += sum(2 for p in self.markup_patterns if p.search(html))
+        return points
+
+    def __repr__(self):
+        return f"PlatformProfile({self.name!r})"
+
+
+PROFILES = (
+    PlatformProfile(
+        'civicplus',
+        url_patterns=(r'^/\d+/[A-Za-z0-9\-]+/?$', r'/(?:Directory|Facilities|DocumentCenter|Archive)\.aspx'),
+        markup_patterns=(r'Government Websites by\s*(?:<[^>]+>\s*)*CivicPlus', r'/Assets/Scripts/|/antiforgery',
+                         r'class="[^"]*\bwidgetContact', r'cpClickable|cp-Widget'),
+        phone_selectors=(
+            ('.widgetContact', 'contact information'),
+            ('.contactInfo, .contactsWidget', 'contact information'),
+            ('#divFooter, .siteFooter', 'footer'),
+            ('.fr-view a[href^="tel:"]', 'telephone'),
+        ),
+        address_selectors=(
+            ('.widgetContact', 'contact_info'),
+            ('.facilityAddress, .directoryAddress', 'facility_address'),
+            ('#divFooter, .siteFooter, .footerAddress', 'footer'),
+        ),
+        facility_selectors=(
+            ('h1', 'heading'),
+            ('.facilityName, .directoryName', 'explicit_facility'),
+            ('.widgetContact h3, .widgetContact h4', 'clinic_listing'),
+        ),
+    ),
+    PlatformProfile(
+        'wordpress',
+        url_patterns=(r'/wp-(?:content|includes)/',),
+        header_patterns=(('link', r'wp-json'), ('x-powered-by', r'WP Engine')),
+        markup_patterns=(r'<meta[^>]+generator[^>]+WordPress', r'/wp-content/|/wp-includes/'),
+        phone_selectors=(
+            ('.entry-content', 'general content'),
+            ('.widget_text, .widget_contact_info', 'contact information'),
+            ('.site-footer, #colophon', 'footer'),
+        ),
+        address_selectors=(
+            ('.entry-content address, .widget_text address', 'html_address_tag'),
+            ('.widget_text, .widget_contact_info', 'contact_info'),
+            ('.site-footer, #colophon', 'footer'),
+        ),
+        facility_selectors=(
+            ('.entry-title, .entry-content h2', 'heading'),
+            ('.location-name, .wp-block-heading.clinic', 'location_listing'),
+        ),
+    ),
+    PlatformProfile(
+        'drupal',
+        header_patterns=(('x-generator', r'Drupal'), ('x-drupal-cache', r'.')),
+        markup_patterns=(r'<meta[^>]+generator[^>]+Drupal', r'data-drupal-selector|/sites/default/files/'),
+        phone_selectors=(
+            ('.field--name-field-phone, .field--name-field-telephone', 'contact phone'),
+            ('.block--contact, .contact-info', 'contact information'),
+            ('.region-footer, footer', 'footer'),
+        ),
+        address_selectors=(
+            ('.field--name-field-address, .address', 'facility_address'),
+            ('.block--contact, .contact-info', 'contact_info'),
+            ('.region-footer, footer', 'footer'),
+        ),
+        facility_selectors=(
+            ('h1.page-title, h1', 'heading'),
+            ('.views-row .field--name-title, .node--type-location h2', 'location_listing'),
+        ),
+    ),
+    PlatformProfile(
+        'granicus',
+        markup_patterns=(r'granicus\.com|govdelivery\.com', r'OpenCities|opencities'),
+        phone_selectors=(
+            ('.contact-info, .contact-details', 'contact information'),
+            ('.sidebar-contact, .related-info', 'contact information'),
+            ('footer', 'footer'),
+        ),
+        address_selectors=(
+            ('.contact-info, .contact-details, .location-info', 'contact_info'),
+            ('footer', 'footer'),
+        ),
+        facility_selectors=(
+            ('h1', 'heading'),
+            ('.location-name, .listing-title', 'location_listing'),
+        ),
+    ),
+    PlatformProfile(
+        'revize',
+        markup_patterns=(r'revize\.com|/revize/|RZ\.', ),
+        phone_selectors=(
+            ('#freeform_main, .freeform', 'general content'),
+            ('#footer, .footer', 'footer'),
+        ),
+        address_selectors=(
+            ('#freeform_main, .freeform', 'contact_info'),
+            ('#footer, .footer', 'footer'),
+        ),
+        facility_selectors=(
+            ('h1', 'heading'),
+            ('#freeform_main h2', 'h2'),
+        ),
+    ),
+)
+
+# Points needed to accept a platform: one markup/header signal, or two URL hints
+MIN_SCORE = 2
+
+
+class ProfileRegistry:
+    def __init__(self, profiles=PROFILES):
+        self.profiles = list(profiles)
+        # host -> detected profile (or None), so each host is fingerprinted once
+        self.by_host = {}
+
+    def detect(self, url, html, headers=None):
+        """
+        Best-scoring profile for a page, or None for unknown platforms
+
+        Args:
+            url: Page URL (its host caches the answer)
+            html: Raw page as str or bytes (only decoded on a host's first page)
+            headers: Response headers (any case-insensitive mapping, optional)
+        """
+        host = (urlsplit(url or '').hostname or '').lower()
+        if host in self.by_host:
+            return self.by_host[host]
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', 'replace')
+        html = html or ''
+        # Signatures sit in <head> and the footer; skip the middle of huge pages
+        sample = html if len(html) <= 400_000 else html[:200_000] + html[-200_000:]
+        best, best_score = None, 0
+        for profile in self.profiles:
+            score = profile.score(url, sample, headers)
+            if score > best_score:
+                best, best_score = profile, score
+        profile = best if best_score >= MIN_SCORE else None
+        if host:
+            self.by_host[host] = profile
+        return profile
+
+    def get(self, name):
+        for profile in self.profiles:
+            if profile.name == name:
+                return profile
+        return None
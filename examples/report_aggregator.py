@@ -0,0 +1,261 @@
+"""
+Report Aggregator
+Keeps the summary-report numbers (category/tag/county counts, crawl success,
+top counties) up to date as each site result arrives, so writing a report is
+O(K) in the number of counties shown instead of rescanning every result.
+"""
+
+import heapq
+from collections import Counter
+
+from resource_model import ResourceTable
+from tag_registry import TAGS, VERIFICATION_TAGS
+
+DEFAULT_TOP_K = 5
+
+
+def county_key(result):
+    """
+    Key a result is counted under: its community_id, else state and name
+
+    Names repeat across states (Washington County exists in 30 of them), so
+    the name alone would merge unrelated counties in a nationwide run.
+    """
+    community_id = result.get('community_id')
+    if community_id:
+        return str(community_id)
+    name = result.get('name') or 'Unknown'
+    state = str(result.get('state_id') or '').upper()
+    return f"{state}:{name}" if state else name
+
+
+def county_name(result):
+    """Name a result is displayed under (same fallback the summary report used)"""
+    return result.get('name') or result.get('state_id') or 'Unknown'
+
+
+class _Ranked:
+    """Heap entry ordered worst-first: fewer resources, then later key"""
+    __slots__ = ('count', 'name')
+
+    def __init__(self, count, name):
+        self.count = count
+        self.name = name
+
+    def __lt__(self, other):
+        if self.count != other.count:
+            return self.count < other.count
+        return self.name > other.name
+
+
+class TopK:
+    """
+    Bounded min-heap of the K keys with the highest counts
+
+    Counts only ever grow (resources are added, never removed), so a key
+    that drops out of the heap can only come back through `update`, which
+    always sees its new total.
+    """
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.heap = []
+        self.entries = {}  # key -> _Ranked currently in the heap
+
+    def update(self, name, count):
+        entry = self.entries.get(name)
+        if entry is not None:
+            entry.count = count
+            heapq.heapify(self.heap)
+            return
+        candidate = _Ranked(count, name)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, candidate)
+            self.entries[name] = candidate
+        elif self.heap[0] < candidate:
+            evicted = heapq.heapreplace(self.heap, candidate)
+            del self.entries[evicted.name]
+            self.entries[name] = candidate
+
+    def items(self):
+        """[(key, count)] best first"""
+        ranked = sorted(self.heap, reverse=True)
+        return [(e.name, e.count) for e in ranked]
+
+
+class ResultsAggregator:
+    def __init__(self, top_k=DEFAULT_TOP_K, per_state=True):
+        """
+        Args:
+            top_k: How many counties the running top list keeps; larger
+                requests fall back to a heap pass over all county counts
+            per_state: Also keep a separate aggregator per state_id
+        """
+        self.top_k = top_k
+        self.total_resources = 0
+        self.by_category = {}
+        # tag mask -> number of resources carrying exactly that tag set
+        self.tag_masks = Counter()
+        # Tags past the registry's 64 bits, counted by name
+        self.overflow_tags = Counter()
+        self.site_overflow_tags = Counter()
+        self.county_counts = {}
+        self.top = TopK(top_k)
+        # county key -> first result stored under that key, its breakdown and display name
+        self.sites = {}
+        self.details = {}
+        self.names = {}
+        # Coverage: how many sites list each category / tag at least once
+        self.sites_with_category = Counter()
+        self.site_tag_masks = Counter()
+        # (population, resource count) per site with a numeric population
+        self.population_counts = []
+        self.site_count = 0
+        self.sites_crawled = 0
+        self.successful_crawls = 0
+        self.states = {} if per_state else None
+
+    @classmethod
+    def from_results(cls, results, crawl_log=(), top_k=DEFAULT_TOP_K):
+        aggregator = cls(top_k=top_k)
+        # crawl_log entries carry community_id but not the state
+        states = {r.get('community_id'): r.get('state_id') for r in results
+                  if isinstance(r, dict) and r.get('community_id')}
+        for entry in crawl_log:
+            aggregator.add_crawl(entry, states.get(entry.get('community_id')))
+        for result in results:
+            aggregator.add_site(result)
+        return aggregator
+
+    def _state(self, state_id):
+        state = str(state_id or 'Unknown').upper()
+        child = self.states.get(state)
+        if child is None:
+            child = self.states[state] = ResultsAggregator(self.top_k, per_state=False)
+        return child
+
+    def add_crawl(self, entry, state_id=None):
+        """Count one crawl_log entry (success = reported success and no error)"""
+        self.sites_crawled += 1
+        if entry.get('success') and not entry.get('error'):
+            self.successful_crawls += 1
+        if self.states is not None and state_id:
+            self._state(state_id).add_crawl(entry)
+
+    def add_site(self, result):
+        """Fold one stored site result into the running totals"""
+        if not isinstance(result, dict):
+            return
+        resources = ResourceTable.from_dicts(result.get('resources', []))
+        self.site_count += 1
+        self.total_resources += len(resources)
+        categories = resources.category_counts()
+        for category, count in categories.items():
+            self.by_category[category] = self.by_category.get(category, 0) + count
+        self.sites_with_category.update(categories.keys())
+        self.tag_masks.update(resources.tag_masks)
+        site_mask = 0
+        for mask in resources.tag_masks:
+            site_mask |= mask
+        self.site_tag_masks[site_mask] += 1
+        site_overflow = set()
+        for tags in resources.overflow_tags():
+            self.overflow_tags.update(tags)
+            site_overflow.update(tags)
+        self.site_overflow_tags.update(site_overflow)
+        population = parse_population(result.get('population'))
+        if population is not None:
+            self.population_counts.append((population, len(resources)))
+
+        key = county_key(result)
+        if key not in self.sites:
+            self.sites[key] = result
+            self.details[key] = site_details(result)
+            self.names[key] = county_name(result)
+        total = self.county_counts.get(key, 0) + len(resources)
+        self.county_counts[key] = total
+        self.top.update(key, total)
+
+        if self.states is not None:
+            self._state(result.get('state_id')).add_site(result)
+
+    def by_tag(self, exclude=()):
+        """{tag: count} in registry order, decomposing each distinct tag set once"""
+        return _with_overflow(TAGS.count_collapsed(self.tag_masks, exclude=exclude),
+                              self.overflow_tags, exclude)
+
+    def top_counties(self, k=None):
+        """[(key, resource_count)] best first, ties broken by key (see name())"""
+        k = self.top_k if k is None else k
+        if k <= self.top_k:
+            return self.top.items()[:k]
+        return heapq.nsmallest(k, self.county_counts.items(), key=lambda x: (-x[1], x[0]))
+
+    def site(self, key):
+        """Stored result for a county key (O(1))"""
+        return self.sites.get(key)
+
+    def name(self, key, with_state=False):
+        """Display name for a county key ("Washington County, OR" with_state)"""
+        name = self.names.get(key, key)
+        state = str((self.sites.get(key) or {}).get('state_id') or '').upper()
+        return f"{name}, {state}" if with_state and state and name != state else name
+
+    def site_details(self, key):
+        """Breakdown computed when the county's result was added (see site_details)"""
+        return self.details.get(key) or site_details(None)
+
+    def sites_with_tag(self, exclude=()):
+        """{tag: number of sites listing it at least once}"""
+        return _with_overflow(TAGS.count_collapsed(self.site_tag_masks, exclude=exclude),
+                              self.site_overflow_tags, exclude)
+
+    def state(self, state_id):
+        """Aggregator for one state (None when per-state tracking is off)"""
+        if self.states is None:
+            return None
+        return self.states.get(str(state_id or 'Unknown').upper())
+
+    def summary(self):
+        return {
+            'total_resources': self.total_resources,
+            'by_category': dict(self.by_category),
+            'by_tag': self.by_tag(),
+        }
+
+
+def _with_overflow(counts, overflow, exclude=()):
+    """Registry counts followed by the overflow tags' counts"""
+    for tag, n in overflow.items():
+        if tag not in exclude:
+            counts[tag] = counts.get(tag, 0) + n
+    return counts
+
+
+def parse_population(value):
+    """Integer population from '1,234', 1234 or None/'Unknown' (-> None)"""
+    if value is None:
+        return None
+    try:
+        return int(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+def site_details(result, highlights=5):
+    """
+    Per-county numbers for the DETAILED FINDINGS section
+
+    Returns a dict with total, phones, addresses, facilities and the top
+    highlight tags (verification-only tags left out).
+    """
+    resources = ResourceTable.from_dicts((result or {}).get('resources', []))
+    categories = resources.category_counts()
+    return {
+        'total': len(resources),
+        'phones': categories.get('CONTACT_INFO', 0),
+        'addresses': categories.get('LOCATION', 0),
+        'facilities': categories.get('FACILITY', 0),
+        'highlights': TAGS.top(resources.tag_masks, n=highlights, exclude=VERIFICATION_TAGS,
+                               overflow=resources.overflow_counts()),
+    }
@@ -0,0 +1,410 @@
+"""
+Report Writer
+Renders crawl summaries as text, CSV or self-contained HTML, per state and
+nationwide. Stored result files are read once into a ResultsAggregator; each
+report is built from that aggregator (no re-reading per state) and the files
+are rendered in parallel worker processes.
+"""
+
+import csv
+import html
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from entity_index import expand_entities
+from report_aggregator import ResultsAggregator, parse_population
+from tag_registry import TAGS
+
+FORMATS = ('txt', 'csv', 'html')
+DEFAULT_TOP_K = 5
+
+# Below this many county rows (summed over all reports) rendering in-process
+# beats the cost of shipping report models to worker processes
+PARALLEL_MIN_ROWS = 50_000
+
+# Tags that count as "crisis services" for the observations
+CRISIS_TAGS = ('crisis_services', 'crisis_hotline')
+
+CSV_COLUMNS = ('state_id', 'county', 'population', 'resources', 'phones',
+               'addresses', 'facilities', 'highlights')
+
+
+def load_results(paths):
+    """
+    Read saved batch result files once
+
+    Returns (results, crawl_log) with compact entity references expanded.
+    """
+    results = []
+    crawl_log = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        results.extend(expand_entities(doc))
+        crawl_info = (doc.get('summary') or {}).get('crawl_info') or {}
+        entries = crawl_info.get('url') or []
+        crawl_log.extend(e for e in entries if isinstance(e, dict))
+    return results, crawl_log
+
+
+def _plural(n, one, many):
+    return one if n == 1 else many
+
+
+def _population_display(population):
+    if population is None:
+        return 'Unknown'
+    value = parse_population(population)
+    return f"{value:,}" if value is not None else str(population)
+
+
+def observations(aggregator):
+    """Findings computed from the aggregated numbers (replaces the fixed list)"""
+    sites = aggregator.site_count
+    if not sites:
+        return ["- No sites were crawled"]
+    lines = []
+
+    # County size vs. resources: compare the larger and smaller half by population
+    pairs = sorted(aggregator.population_counts)
+    if len(pairs) >= 4:
+        half = len(pairs) // 2
+        smaller = sum(c for _, c in pairs[:half]) / half
+        larger = sum(c for _, c in pairs[-half:]) / half
+        if larger > smaller * 1.2:
+            lines.append(f"- Larger counties tend to have more comprehensive online resources "
+                         f"({larger:.1f} vs {smaller:.1f} resources on average)")
+        elif smaller > larger * 1.2:
+            lines.append(f"- Smaller counties listed more resources than larger ones "
+                         f"({smaller:.1f} vs {larger:.1f} on average)")
+        else:
+            lines.append(f"- Resource counts are similar across county sizes "
+                         f"({larger:.1f} vs {smaller:.1f} on average)")
+
+    with_phone = aggregator.sites_with_category.get('CONTACT_INFO', 0)
+    if with_phone == sites:
+        lines.append("- All counties provide main contact numbers")
+    else:
+        lines.append(f"- {with_phone} of {sites} counties list a contact number")
+
+    crisis = TAGS.mask_of_known(CRISIS_TAGS)
+    with_crisis = sum(n for mask, n in aggregator.site_tag_masks.items() if mask & crisis)
+    lines.append(f"- Crisis services information found for {with_crisis} of {sites} counties")
+
+    with_facility = aggregator.sites_with_category.get('FACILITY', 0)
+    lines.append(f"- Facility names (clinics, hospitals) found for {with_facility} of {sites} counties")
+
+    coverage = aggregator.sites_with_tag(exclude=('uncertain', 'general'))
+    if coverage:
+        ranked = sorted(coverage.items(), key=lambda x: (-x[1], x[0]))
+        top_tag, top_n = ranked[0]
+        lines.append(f"- Most widely covered topic: {top_tag.replace('_', ' ')} ({top_n} of {sites} counties)")
+        if len(ranked) > 1:
+            least = ranked[-1][1]
+            names = [t.replace('_', ' ') for t, n in ranked if n == least][:3]
+            lines.append(f"- Least covered topics: {', '.join(names)} ({least} of {sites} counties)")
+
+    failed = aggregator.sites_crawled - aggregator.successful_crawls
+    if failed > 0:
+        lines.append(f"- {failed} of {aggregator.sites_crawled} fetches failed; those counties show no resources")
+    return lines
+
+
+def build_report(aggregator, label, crawl_info=None, top_k=DEFAULT_TOP_K, include_counties=True,
+                 with_state=None):
+    """
+    Plain-dict report model for one aggregator (nationwide or one state)
+
+    Only the top-K counties are looked up in detail; include_counties adds
+    one row per county for the CSV/HTML tables. with_state labels counties
+    "Name, ST" (default: when the aggregator spans several states, where
+    names repeat).
+    """
+    if with_state is None:
+        with_state = len(aggregator.states or {}) > 1
+    crawl_info = crawl_info or {}
+    crawled_ts = crawl_info.get('timestamp')
+    try:
+        crawled = datetime.fromisoformat(crawled_ts) if crawled_ts else datetime.now()
+        crawled_str = crawled.strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        crawled_str = crawled_ts or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    total_sites = aggregator.sites_crawled or aggregator.site_count
+    successful = aggregator.successful_crawls if aggregator.sites_crawled else aggregator.site_count
+
+    top = []
+    for key, count in aggregator.top_counties(top_k):
+        found = aggregator.site(key)
+        details = aggregator.site_details(key)
+        top.append({
+            'name': aggregator.name(key, with_state) or 'Unknown',
+            'count': count,
+            'population': _population_display(found.get('population') if found else 'Unknown'),
+            'total': details['total'],
+            'phones': details['phones'],
+            'addresses': details['addresses'],
+            'facilities': details['facilities'],
+            'highlights': [t.replace('_', ' ').title() for t, _ in details['highlights']],
+        })
+
+    counties = []
+    if include_counties:
+        for key, result in aggregator.sites.items():
+            details = aggregator.site_details(key)
+            counties.append({
+                'state_id': str(result.get('state_id') or '').upper(),
+                'county': aggregator.name(key),
+                'population': parse_population(result.get('population')),
+                'resources': details['total'],
+                'phones': details['phones'],
+                'addresses': details['addresses'],
+                'facilities': details['facilities'],
+                'highlights': [t for t, _ in details['highlights']],
+            })
+
+    return {
+        'label': label,
+        'crawled': crawled_str,
+        'total_sites': total_sites,
+        'successful': successful,
+        'failed': total_sites - successful,
+        'total_resources': aggregator.total_resources,
+        'by_category': dict(aggregator.by_category),
+        'by_tag': {t: c for t, c in aggregator.by_tag().items() if t.lower() != 'uncertain'},
+        'top_k': top_k,
+        'top': top,
+        'observations': observations(aggregator),
+        'counties': counties,
+        'student_name': crawl_info.get('student_name', 'Unknown'),
+    }
+
+
+def render_text(report):
+    lines = []
+    lines.append(f"BATCH CRAWLING REPORT - {report['label']}")
+    lines.append("=" * 50)
+    lines.append("")
+    lines.append(f"Crawled: {report['crawled']}")
+    lines.append(f"Total Sites: {report['total_sites']}")
+    lines.append(f"Successful: {report['successful']}")
+    lines.append(f"Failed: {report['failed']}")
+    lines.append("")
+    lines.append("SUMMARY STATISTICS")
+    lines.append("--------------------")
+    lines.append(f"Total Resources Found: {report['total_resources']}")
+    lines.append("")
+    lines.append("Resources by category:")
+    for cat, cnt in report['by_category'].items():
+        lines.append(f"{cat}: {cnt}")
+    lines.append("")
+    lines.append("Resources by tag:")
+    for tag, cnt in report['by_tag'].items():
+        lines.append(f"{tag}: {cnt}")
+    lines.append("")
+    lines.append(f"TOP {report['top_k']} COUNTIES BY RESOURCES FOUND")
+    lines.append("-----------------------------------")
+    if not report['top']:
+        lines.append("TO BE DECIDED NOT YET")
+    for county in report['top']:
+        lines.append(f"{county['name']}: {county['count']} resource{'s' if county['count'] != 1 else ''}")
+
+    lines.append("")
+    lines.append("DETAILED FINDINGS")
+    lines.append("-----------------")
+    for county in report['top']:
+        lines.append("")
+        lines.append(f"{county['name']}:")
+        lines.append(f"- Population: {county['population']}")
+        lines.append(
+            f"- Resources: {county['total']} total ("
+            f"{county['phones']} {_plural(county['phones'], 'phone', 'phones')}, "
+            f"{county['addresses']} {_plural(county['addresses'], 'address', 'addresses')}, "
+            f"{county['facilities']} {_plural(county['facilities'], 'facility', 'facilities')})"
+        )
+        if county['highlights']:
+            lines.append(f"- Highlights: {', '.join(county['highlights'])}")
+        else:
+            lines.append(f"- Highlights: None identified")
+    lines.append("")
+    lines.append("OBSERVATIONS")
+    lines.append("------------")
+    lines.extend(report['observations'])
+    lines.append("")
+    lines.append("Detailed results available in JSON format.")
+    lines.append(f"Generated by student: {report['student_name']}")
+    return "\n".join(lines)
+
+
+def render_csv(report):
+    """One row per county"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_COLUMNS)
+    for row in report['counties']:
+        writer.writerow([
+            row['state_id'], row['county'],
+            '' if row['population'] is None else row['population'],
+            row['resources'], row['phones'], row['addresses'], row['facilities'],
+            ';'.join(row['highlights']),
+        ])
+    return buffer.getvalue()
+
+
+HTML_STYLE = """
+body { font-family: -apple-system, Segoe UI, Helvetica, Arial, sans-serif; margin: 2em; color: #222; }
+h1 { border-bottom: 2px solid #2a6f97; padding-bottom: .3em; }
+table { border-collapse: collapse; margin: .5em 0 1.5em; }
+th, td { border: 1px solid #ccc; padding: .3em .7em; text-align: left; }
+th { background: #eef4f8; }
+td.num { text-align: right; }
+.stats span { display: inline-block; margin-right: 2em; }
+"""
+
+
+def _html_table(headers, rows, numeric=()):
+    out = ["<table>", "<tr>" + "".join(f"<th>{html.escape(str(h))}</th>" for h in headers) + "</tr>"]
+    for row in rows:
+        cells = []
+        for i, value in enumerate(row):
+            cls = ' class="num"' if i in numeric else ''
+            cells.append(f"<td{cls}>{html.escape('' if value is None else str(value))}</td>")
+        out.append("<tr>" + "".join(cells) + "</tr>")
+    out.append("</table>")
+    return "\n".join(out)
+
+
+def render_html(report):
+    """Self-contained page (inline CSS, no external assets)"""
+    esc = html.escape
+    parts = [
+        "<!DOCTYPE html>",
+        "<html lang=\"en\"><head><meta charset=\"utf-8\">",
+        f"<title>Batch Crawling Report - {esc(report['label'])}</title>",
+        f"<style>{HTML_STYLE}</style></head><body>",
+        f"<h1>Batch Crawling Report - {esc(report['label'])}</h1>",
+        "<p class=\"stats\">"
+        f"<span>Crawled: {esc(report['crawled'])}</span>"
+        f"<span>Total Sites: {report['total_sites']}</span>"
+        f"<span>Successful: {report['successful']}</span>"
+        f"<span>Failed: {report['failed']}</span>"
+        f"<span>Total Resources: {report['total_resources']}</span></p>",
+        "<h2>Resources by category</h2>",
+        _html_table(('Category', 'Resources'), report['by_category'].items(), numeric=(1,)),
+        "<h2>Resources by tag</h2>",
+        _html_table(('Tag', 'Resources'), report['by_tag'].items(), numeric=(1,)),
+        "<h2>Top counties by resources found</h2>",
+        _html_table(
+            ('County', 'Population', 'Resources', 'Phones', 'Addresses', 'Facilities', 'Highlights'),
+            ((c['name'], c['population'], c['total'], c['phones'], c['addresses'], c['facilities'],
+              ', '.join(c['highlights']) or 'None identified') for c in report['top']),
+            numeric=(1, 2, 3, 4, 5),
+        ),
+        "<h2>Observations</h2>",
+        "<ul>" + "".join(f"<li>{esc(o.lstrip('- '))}</li>" for o in report['observations']) + "</ul>",
+    ]
+    if report['counties']:
+        parts.append("<h2>All counties</h2>")
+        parts.append(_html_table(
+            ('State', 'County', 'Population', 'Resources', 'Phones', 'Addresses', 'Facilities', 'Highlights'),
+            ((r['state_id'], r['county'], f"{r['population']:,}" if r['population'] is not None else 'Unknown',
+              r['resources'], r['phones'], r['addresses'], r['facilities'], ', '.join(r['highlights']))
+             for r in report['counties']),
+            numeric=(2, 3, 4, 5, 6),
+        ))
+    parts.append(f"<p><small>Generated by student: {esc(report['student_name'])}</small></p>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+RENDERERS = {'txt': render_text, 'csv': render_csv, 'html': render_html}
+
+
+def write_report(report, path, fmt='txt'):
+    """Render one report model to `path`; returns the path"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(RENDERERS[fmt](report))
+    return str(path)
+
+
+def _write_job(job):
+    report, path, fmt = job
+    return write_report(report, path, fmt)
+
+
+def write_reports(aggregator, out_dir='summary_reports', formats=FORMATS, states=None,
+                  nationwide=True, crawl_info=None, top_k=DEFAULT_TOP_K, workers=None, stamp=None):
+    """
+    Write nationwide and per-state reports in every requested format
+
+    Args:
+        aggregator: ResultsAggregator with per-state tracking on
+        out_dir: Destination folder
+        formats: Any of 'txt', 'csv', 'html'
+        states: State codes to report on (default: every state in the aggregator)
+        nationwide: Also write the all-states report
+        crawl_info: crawl_info dict (timestamp, student_name) for the headers
+        workers: Worker processes for rendering (1 = render in this process;
+            None = a process pool once the reports hold PARALLEL_MIN_ROWS rows)
+        stamp: Filename timestamp (default: now)
+
+    Returns the list of written paths.
+    """
+    unknown = [f for f in formats if f not in RENDERERS]
+    if unknown:
+        raise ValueError(f"Unknown report format(s): {', '.join(unknown)}")
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = stamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # Report models are small (top-K details plus one row per county), so they
+    # are built here from the shared aggregator and only rendering is farmed out
+    models = []
+    if nationwide:
+        models.append(('ALL', build_report(aggregator, 'ALL', crawl_info, top_k)))
+    for state in sorted(states or (aggregator.states or {}).keys()):
+        child = aggregator.state(state)
+        if child is not None:
+            models.append((state.upper(), build_report(child, state.upper(), crawl_info, top_k)))
+
+    jobs = [(report, Path(out_dir) / f"summary_report_{stamp}_{label}.{fmt}", fmt)
+            for label, report in models for fmt in formats]
+    rows = sum(len(report['counties']) for _, report in models) * len(formats)
+    if workers is None and rows < PARALLEL_MIN_ROWS:
+        workers = 1
+    if workers == 1 or len(jobs) < 2:
+        return [_write_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_job, jobs, chunksize=max(1, len(jobs) // 32)))
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Render crawl reports from saved results")
+    parser.add_argument('files', nargs='*', help="Result JSON files (default: all files in output/)")
+    parser.add_argument('--format', dest='formats', action='append', choices=FORMATS,
+                        help="Report format (repeatable; default: all)")
+    parser.add_argument('--state', action='append', help="Only these states (repeatable)")
+    parser.add_argument('--no-nationwide', action='store_true')
+    parser.add_argument('--out', default='summary_reports')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    files = args.files or sorted((Path(__file__).parent / 'output').glob('batch_crawl_results_*.json'))
+    started = time.perf_counter()
+    results, crawl_log = load_results(files)
+    aggregator = ResultsAggregator.from_results(results, crawl_log)
+    paths = write_reports(aggregator, args.out, formats=args.formats or FORMATS, states=args.state,
+                          nationwide=not args.no_nationwide,
+                          crawl_info={'student_name': 'Muhammad Sualeh Alam'}, workers=args.workers)
+    print(f"Wrote {len(paths)} reports to {args.out} in {time.perf_counter() - started:.2f}s")
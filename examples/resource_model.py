@@ -0,0 +1,268 @@
+"""
+Compact Resource Model
+Stores a site's resources column-wise (struct-of-arrays) with interned codes
+for category/type/context and float32 confidences instead of one dict per
+resource. Dicts are only built when a resource is read or written to JSON.
+"""
+
+import sys
+from array import array
+from collections import Counter
+
+from tag_registry import TAGS
+
+
+class Vocabulary:
+    """Interns strings to small integer codes (and back)"""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value) if isinstance(value, str) else value
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def value(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# Shared vocabularies, seeded with the values the extractors emit
+CATEGORIES = Vocabulary(['CONTACT_INFO', 'LOCATION', 'FACILITY', 'SERVICE'])
+TYPES = Vocabulary(['phone_number', 'toll_number', 'address', 'facility_name', 'service_name'])
+CONTEXTS = Vocabulary([
+    'contact information', 'general content', 'footer', 'heading', 'page',
+    'facility_address', 'service_location', 'contact_info', 'html_address_tag', 'contact',
+    'explicit_facility', 'clinic_listing', 'location_listing', 'h2', 'h3',
+])
+
+# Fields stored in dedicated columns; anything else goes in the sparse extras
+CORE_FIELDS = ('category', 'type', 'value', 'tags', 'context', 'confidence', 'phone_key')
+
+# float32 holds ~7 significant digits, so round back to what the extractors wrote
+CONFIDENCE_DIGITS = 6
+
+
+class ResourceTable:
+    """
+    Column store for one site's resources
+
+    Reads like a list of resource dicts (len(), iteration, indexing), so
+    existing summary code keeps working, but holds each field in a compact
+    column: codes in array('B')/array('H'), confidence in array('f'),
+    phone keys in array('q') and tags as 64-bit masks from the tag registry.
+    Rows with tags the registry has no bit left for keep their full tag
+    list in the extras.
+    """
+    __slots__ = ('categories', 'types', 'contexts', 'confidences', 'phone_keys',
+                 'values', 'tag_masks', 'extras')
+
+    def __init__(self):
+        self.categories = array('B')
+        self.types = array('B')
+        self.contexts = array('H')
+        self.confidences = array('f')
+        self.phone_keys = array('q')
+        self.tag_masks = array('Q')
+        self.values = []
+        # row -> dict of optional fields (e.g. 'address', 'verified')
+        self.extras = {}
+
+    @classmethod
+    def from_dicts(cls, resources):
+        if isinstance(resources, ResourceTable):
+            return resources
+        table = cls()
+        table.extend(resources or [])
+        return table
+
+    def append(self, resource):
+        try:
+            confidence = float(resource.get('confidence', 1.0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        self.categories.append(CATEGORIES.code(resource.get('category') or 'Unknown'))
+        self.types.append(TYPES.code(resource.get('type') or ''))
+        self.contexts.append(CONTEXTS.code(resource.get('context') or ''))
+        self.confidences.append(confidence)
+        self.phone_keys.append(resource.get('phone_key') or 0)
+        self.values.append(resource.get('value'))
+        tags = [str(t) for t in (resource.get('tags') or ())]
+        mask, overflow = TAGS.split(tags)
+        self.tag_masks.append(mask)
+        extra = {k: v for k, v in resource.items() if k not in CORE_FIELDS}
+        if overflow:
+            extra['tags'] = tags
+        if extra:
+            self.extras[len(self.values) - 1] = extra
+
+    def extend(self, resources):
+        for resource in resources:
+            self.append(resource)
+
+    def extend_table(self, other):
+        """Append another table's rows column by column (no dicts built)"""
+        offset = len(self)
+        self.categories.extend(other.categories)
+        self.types.extend(other.types)
+        self.contexts.extend(other.contexts)
+        self.confidences.extend(other.confidences)
+        self.phone_keys.extend(other.phone_keys)
+        self.tag_masks.extend(other.tag_masks)
+        self.values.extend(other.values)
+        for i, extra in other.extras.items():
+            self.extras[offset + i] = extra
+
+    def __len__(self):
+        return len(self.values)
+
+    def category(self, i):
+        return CATEGORIES.value(self.categories[i])
+
+    def confidence(self, i):
+        return round(self.confidences[i], CONFIDENCE_DIGITS)
+
+    def tags(self, i):
+        """Tag names of one row"""
+        extra = self.extras.get(i)
+        if extra and 'tags' in extra:
+            return list(extra['tags'])
+        return TAGS.tag_names(self.tag_masks[i])
+
+    def overflow_tags(self):
+        """Lists of the tags that have no registry bit, one per row that has any"""
+        for extra in self.extras.values():
+            if 'tags' in extra:
+                yield [t for t in extra['tags'] if t not in TAGS.bits]
+
+    def overflow_counts(self):
+        """{tag: count} for tags kept outside the mask column"""
+        counts = Counter()
+        for tags in self.overflow_tags():
+            counts.update(tags)
+        return counts
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        resource = {
+            'category': CATEGORIES.value(self.categories[i]),
+            'type': TYPES.value(self.types[i]),
+            'value': self.values[i],
+        }
+        if self.phone_keys[i]:
+            resource['phone_key'] = self.phone_keys[i]
+        resource['tags'] = TAGS.tag_names(self.tag_masks[i])
+        resource['context'] = CONTEXTS.value(self.contexts[i])
+        resource['confidence'] = self.confidence(i)
+        extra = self.extras.get(i)
+        if extra:
+            resource.update(extra)
+            if 'tags' in extra:
+                resource['tags'] = list(extra['tags'])
+        return resource
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def category_counts(self):
+        """{category: count} straight from the code column"""
+        return {CATEGORIES.value(code): n for code, n in Counter(self.categories).items()}
+
+    def tag_counts(self, exclude=()):
+        """{tag: count} over the mask column (plus any overflow tags)"""
+        counts = TAGS.count(self.tag_masks, exclude=exclude)
+        for tag, n in self.overflow_counts().items():
+            if tag not in exclude:
+                counts[tag] = n
+        return counts
+
+    def with_any_tags(self, tags):
+        """Row indexes whose tags include any of `tags`"""
+        return TAGS.any_of(self.tag_masks, tags)
+
+    def to_list(self):
+        """Materialize plain dicts (only needed at the JSON output boundary)"""
+        return list(self)
+
+    def __repr__(self):
+        return f"ResourceTable({len(self)} resources)"
+
+
+def resource_key(resource):
+    """(category, phone key or lowercased value): two resources with the same key are duplicates"""
+    return (resource.get('category'),
+            resource.get('phone_key') or str(resource.get('value') or '').strip().lower())
+
+
+def site_to_json(result):
+    """Copy of a site result with its ResourceTable turned back into dicts"""
+    if not isinstance(result, dict):
+        return result
+    out = dict(result)
+    resources = out.get('resources')
+    if isinstance(resources, ResourceTable):
+        out['resources'] = resources.to_list()
+    return out
+
+
+def results_to_json(results):
+    return [site_to_json(r) for r in results]
+
+
+def measure(paths):
+    """
+    Compare traced memory for the resources of saved runs held as dicts vs tables
+
+    Returns (dict_bytes, table_bytes, resource_count).
+    """
+    import json
+    import tracemalloc
+
+    docs = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            docs.append(json.load(f))
+    raw = [r.get('resources', []) for doc in docs for r in doc.get('results', [])]
+    count = sum(len(r) for r in raw)
+    # Serialize first so both runs build from text and share nothing with `docs`
+    blob = json.dumps(raw)
+
+    tracemalloc.start()
+    as_dicts = json.loads(blob)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_dicts
+
+    tracemalloc.start()
+    as_tables = [ResourceTable.from_dicts(r) for r in json.loads(blob)]
+    table_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_tables
+    return dict_bytes, table_bytes, count
+
+
+# Example usage
+if __name__ == "__main__":
+    from pathlib import Path
+
+    base = Path(__file__).parent
+    files = sorted((base / 'output').glob('batch_crawl_results_*.json'))
+    files += sorted((base / 'cleaned_output').glob('*.cleaned.json'))
+    dict_bytes, table_bytes, count = measure(files)
+    print(f"{count} resources from {len(files)} example files")
+    print(f"  dicts:  {dict_bytes:>9,} bytes")
+    print(f"  tables: {table_bytes:>9,} bytes ({100 * (1 - table_bytes / dict_bytes):.0f}% smaller)")
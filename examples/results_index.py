@@ -0,0 +1,235 @@
+"""
+Results Index
+Inverted indexes over saved crawl results (tag, category, state, community,
+population) with composable filters, e.g. "all crisis hotlines in KY" or
+"vaccination services for counties over 100k people".
+"""
+
+import bisect
+import json
+from array import array
+from pathlib import Path
+
+from resource_model import ResourceTable, CATEGORIES
+from entity_index import expand_entities
+
+
+def _population(value):
+    try:
+        return int(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultsIndex:
+    def __init__(self, paths=None, results=None):
+        """
+        Args:
+            paths: Saved batch_crawl_results_*.json / *.cleaned.json files; read
+                lazily on the first query
+            results: Already-loaded site results (e.g. BatchHealthCrawler.results)
+        """
+        self.paths = [Path(p) for p in (paths or [])]
+        self._pending = list(results or [])
+        self._loaded = False
+        # One row per site
+        self.sites = []
+        self.site_start = array('I')
+        # All resources in one column table; resource id = row number
+        self.resources = ResourceTable()
+        self.resource_site = array('I')
+        # Inverted indexes: key -> set of resource ids
+        self.by_tag = {}
+        self.by_category = {}
+        self.by_state = {}
+        self.by_community = {}
+        # (population, site index) sorted for range lookups
+        self._population_keys = []
+        self._population_sites = []
+
+    @classmethod
+    def from_crawler(cls, batch_crawler):
+        return cls(results=batch_crawler.results)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        for path in self.paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                doc = json.load(f)
+            self.add_results(expand_entities(doc))
+        if self._pending:
+            self.add_results(self._pending)
+            self._pending = []
+
+    def add_results(self, results):
+        """Add site results to the index (can be called again as new runs finish)"""
+        new_population = False
+        for site in results:
+            if not isinstance(site, dict):
+                continue
+            site_idx = len(self.sites)
+            state = str(site.get('state_id') or '').upper()
+            community = site.get('community_id') or site.get('name') or 'Unknown'
+            population = _population(site.get('population'))
+            self.sites.append({
+                'name': site.get('name'),
+                'community_id': community,
+                'state_id': state,
+                'population': population,
+                'url': site.get('url'),
+            })
+            self.site_start.append(len(self.resources))
+            if population is not None:
+                self._population_keys.append(population)
+                self._population_sites.append(site_idx)
+                new_population = True
+
+            table = ResourceTable.from_dicts(site.get('resources', []))
+            first = len(self.resources)
+            self.resources.extend_table(table)
+            self.resource_site.extend([site_idx] * len(table))
+            ids = range(first, len(self.resources))
+            if not ids:
+                continue
+            self.by_state.setdefault(state, set()).update(ids)
+            self.by_community.setdefault(community, set()).update(ids)
+            for rid in ids:
+                self.by_category.setdefault(CATEGORIES.value(self.resources.categories[rid]), set()).add(rid)
+                for tag in self.resources.tags(rid):
+                    self.by_tag.setdefault(tag, set()).add(rid)
+
+        if new_population:
+            order = sorted(range(len(self._population_keys)), key=self._population_keys.__getitem__)
+            self._population_keys = [self._population_keys[i] for i in order]
+            self._population_sites = [self._population_sites[i] for i in order]
+
+    def site_resource_ids(self, site_idx):
+        start = self.site_start[site_idx]
+        end = self.site_start[site_idx + 1] if site_idx + 1 < len(self.site_start) else len(self.resources)
+        return range(start, end)
+
+    def population_ids(self, min_population=None, max_population=None):
+        """Resource ids for sites whose population falls in [min, max]"""
+        lo = 0 if min_population is None else bisect.bisect_left(self._population_keys, min_population)
+        hi = len(self._population_keys) if max_population is None else bisect.bisect_right(self._population_keys, max_population)
+        ids = set()
+        for site_idx in self._population_sites[lo:hi]:
+            ids.update(self.site_resource_ids(site_idx))
+        return ids
+
+    def query(self):
+        self._ensure_loaded()
+        return Query(self)
+
+    def resource(self, rid):
+        """Resource dict plus the site fields it belongs to"""
+        out = self.resources[rid]
+        site = self.sites[self.resource_site[rid]]
+        out['site'] = site['name']
+        out['community_id'] = site['community_id']
+        out['state_id'] = site['state_id']
+        out['population'] = site['population']
+        return out
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.resources)
+
+
+class Query:
+    """Composable filter; every call narrows the result (AND), values within one call are OR"""
+
+    def __init__(self, index):
+        self.index = index
+        self.filters = []
+        self.predicates = []
+
+    def _any(self, mapping, keys):
+        ids = set()
+        for key in keys:
+            ids |= mapping.get(key, set())
+        self.filters.append(ids)
+        return self
+
+    def tag(self, *tags):
+        return self._any(self.index.by_tag, tags)
+
+    def category(self, *categories):
+        return self._any(self.index.by_category, [c.upper() for c in categories])
+
+    def state(self, *states):
+        return self._any(self.index.by_state, [s.upper() for s in states])
+
+    def community(self, *community_ids):
+        return self._any(self.index.by_community, community_ids)
+
+    def population(self, min=None, max=None):
+        self.filters.append(self.index.population_ids(min, max))
+        return self
+
+    def min_confidence(self, cutoff):
+        confidences = self.index.resources.confidences
+        self.predicates.append(lambda rid: confidences[rid] >= cutoff - 1e-6)
+        return self
+
+    def where(self, predicate):
+        """Arbitrary predicate on the resource dict (applied after the index filters)"""
+        self.predicates.append(lambda rid: predicate(self.index.resource(rid)))
+        return self
+
+    def _matching(self):
+        if self.filters:
+            # Intersect smallest-first so the work is bounded by the most selective filter
+            ordered = sorted(self.filters, key=len)
+            ids = set(ordered[0])
+            for other in ordered[1:]:
+                ids &= other
+                if not ids:
+                    break
+        else:
+            ids = set(range(len(self.index.resources)))
+        for predicate in self.predicates:
+            ids = {rid for rid in ids if predicate(rid)}
+        return ids
+
+    def ids(self):
+        return sorted(self._matching())
+
+    def count(self):
+        return len(self._matching())
+
+    def all(self):
+        return [self.index.resource(rid) for rid in self.ids()]
+
+    def __iter__(self):
+        for rid in self.ids():
+            yield self.index.resource(rid)
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query saved crawl results")
+    parser.add_argument('files', nargs='*', help="Result JSON files (default: all files in output/)")
+    parser.add_argument('--tag', action='append', default=[])
+    parser.add_argument('--category', action='append', default=[])
+    parser.add_argument('--state', action='append', default=[])
+    parser.add_argument('--min-population', type=int)
+    parser.add_argument('--max-population', type=int)
+    args = parser.parse_args()
+
+    files = args.files or sorted((Path(__file__).parent / 'output').glob('batch_crawl_results_*.json'))
+    q = ResultsIndex(paths=files).query()
+    if args.tag:
+        q.tag(*args.tag)
+    if args.category:
+        q.category(*args.category)
+    if args.state:
+        q.state(*args.state)
+    if args.min_population is not None or args.max_population is not None:
+        q.population(args.min_population, args.max_population)
+    for r in q:
+        print(f"[{r['state_id']}] {r['site']}: {r['category']} {r['value']} ({', '.join(r['tags'])})")
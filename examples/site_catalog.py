@@ -0,0 +1,259 @@
+"""
+Site Catalog
+Compiles the state CSV files in data/websites into one indexed SQLite file so
+lookups by state, parent, category, pha flag or population are instant.
+"""
+
+import csv
+import os
+import sqlite3
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+DEFAULT_CSV_DIR = DATA_DIR / 'websites'
+DEFAULT_DB_PATH = DATA_DIR / 'site_catalog.sqlite'
+
+# Values seen in the `pha` column that mean "has a public health authority"
+PHA_TRUE_VALUES = {'true', 'yes', '1', 'prawda'}
+
+
+def canonical_url(url):
+    """
+    Normalize a pha_url so rows pointing at the same page compare equal
+
+    Lowercases the scheme and host, drops default ports, fragments and a
+    trailing slash. The path and query are kept as-is. A URL that can't be
+    parsed (bad port, broken IPv6 host) is returned stripped but unchanged.
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+def group_sites_by_url(sites):
+    """
+    Group catalog rows by canonical pha_url, keeping first-seen order
+
+    Returns a list of (canonical_url, [sites]) tuples.
+    """
+    groups = {}
+    for site in sites:
+        key = canonical_url(site.get('pha_url'))
+        groups.setdefault(key, []).append(site)
+    return list(groups.items())
+
+
+class SiteCatalog:
+    def __init__(self, csv_dir=None, db_path=None):
+        """
+        Open (and build if needed) the compiled catalog
+
+        Args:
+            csv_dir: Folder holding the us-XX.csv files (defaults to data/websites)
+            db_path: Where to keep the compiled index (defaults to data/site_catalog.sqlite)
+        """
+        self.csv_dir = Path(csv_dir) if csv_dir else DEFAULT_CSV_DIR
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._create_schema()
+        self.refresh()
+
+    def _create_schema(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                filename TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sites (
+                community_id TEXT PRIMARY KEY,
+                name TEXT,
+                parent_id TEXT,
+                category TEXT,
+                pha INTEGER,
+                population INTEGER,
+                population_raw TEXT,
+                state_id TEXT,
+                state_code TEXT NOT NULL,
+                pha_url TEXT,
+                source TEXT NOT NULL,
+                row_num INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sites_state ON sites(state_code, row_num);
+            CREATE INDEX IF NOT EXISTS idx_sites_parent ON sites(parent_id);
+            CREATE INDEX IF NOT EXISTS idx_sites_category ON sites(category);
+            CREATE INDEX IF NOT EXISTS idx_sites_pha ON sites(pha);
+            CREATE INDEX IF NOT EXISTS idx_sites_population ON sites(population);
+            CREATE INDEX IF NOT EXISTS idx_sites_url ON sites(pha_url);
+        """)
+
+    def refresh(self):
+        """
+        Recompile only the CSV files that changed since the last build
+
+        Returns the list of filenames that were (re)loaded.
+        """
+        known = {row['filename']: (row['mtime_ns'], row['size'])
+                 for row in self.conn.execute("SELECT filename, mtime_ns, size FROM sources")}
+        on_disk = {}
+        try:
+            for entry in os.scandir(self.csv_dir):
+                if entry.name.startswith('us-') and entry.name.endswith('.csv'):
+                    st = entry.stat()
+                    on_disk[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            print(f"Catalog folder not found: {self.csv_dir}")
+
+        changed = [name for name, sig in on_disk.items() if known.get(name) != sig]
+        removed = [name for name in known if name not in on_disk]
+        if not changed and not removed:
+            return []
+
+        with self.conn:
+            for name in removed:
+                self.conn.execute("DELETE FROM sites WHERE source = ?", (name,))
+                self.conn.execute("DELETE FROM sources WHERE filename = ?", (name,))
+            for name in sorted(changed):
+                self.conn.execute("DELETE FROM sites WHERE source = ?", (name,))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sites VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._read_csv(name)
+                )
+                mtime_ns, size = on_disk[name]
+                self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (name, mtime_ns, size))
+        return sorted(changed)
+
+    def _read_csv(self, filename):
+        """Yield catalog rows for one us-XX.csv file"""
+        state_code = filename[len('us-'):-len('.csv')].lower()
+        with open(self.csv_dir / filename, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file, delimiter=';')
+            for row_num, row in enumerate(reader):
+                population_raw = (row.get('population_proper') or '').strip()
+                try:
+                    population = int(population_raw.replace(',', ''))
+                except ValueError:
+                    population = None
+                pha_raw = (row.get('pha') or '').strip().lower()
+                pha = (1 if pha_raw in PHA_TRUE_VALUES else 0) if pha_raw else None
+                community_id = (row.get('community_id') or '').strip() or f"{state_code}-row-{row_num}"
+                yield (
+                    community_id,
+                    row.get('name') or 'Unknown',
+                    (row.get('parent_id') or '').strip(),
+                    row.get('category') or '',
+                    pha,
+                    population,
+                    population_raw,
+                    row.get('state_id') or '',
+                    state_code,
+                    (row.get('pha_url') or '').strip(),
+                    filename,
+                    row_num,
+                )
+
+    def sites(self, state=None, parent_id=None, category=None, pha=None,
+              min_population=None, max_population=None, with_url=True, limit=None):
+        """
+        Look up catalog rows using the compiled indexes
+
+        Args:
+            state: Two-letter state code (e.g., 'ca')
+            parent_id: Parent community (e.g., 'us-tx-phr-8')
+            category: Community type (e.g., 'County')
+            pha: True/False to filter on the public health authority flag
+            min_population / max_population: Inclusive population bounds
+            with_url: Drop rows that have no pha_url (they can't be crawled)
+            limit: Maximum number of rows to return
+        """
+        clauses, params = [], []
+        if state:
+            clauses.append("state_code = ?")
+            params.append(state.lower())
+        if parent_id:
+            clauses.append("parent_id = ?")
+            params.append(parent_id)
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        if pha is not None:
+            clauses.append("pha = ?")
+            params.append(1 if pha else 0)
+        if min_population is not None:
+            clauses.append("population >= ?")
+            params.append(int(min_population))
+        if max_population is not None:
+            clauses.append("population <= ?")
+            params.append(int(max_population))
+        if with_url:
+            clauses.append("pha_url != ''")
+
+        sql = "SELECT * FROM sites"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY state_code, row_num"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [self._to_site(row) for row in self.conn.execute(sql, params)]
+
+    def get(self, community_id):
+        """Return a single site by community_id (or None)"""
+        row = self.conn.execute("SELECT * FROM sites WHERE community_id = ?", (community_id,)).fetchone()
+        return self._to_site(row) if row else None
+
+    def states(self):
+        """Return the state codes present in the catalog"""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT state_code FROM sites ORDER BY state_code")]
+
+    def count(self, state=None, with_url=False):
+        """Count catalog rows, optionally for one state and/or only rows with a URL"""
+        sql = "SELECT COUNT(*) FROM sites WHERE 1=1"
+        params = []
+        if state:
+            sql += " AND state_code = ?"
+            params.append(state.lower())
+        if with_url:
+            sql += " AND pha_url != ''"
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def _to_site(self, row):
+        # Same keys load_state_websites always produced, plus the catalog ids
+        return {
+            'name': row['name'],
+            'pha_url': row['pha_url'],
+            'state_id': row['state_id'],
+            'category': row['category'],
+            'population': row['population_raw'] or 'Unknown',
+            'population_proper': row['population'],
+            'community_id': row['community_id'],
+            'parent_id': row['parent_id'],
+            'pha': None if row['pha'] is None else bool(row['pha']),
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    catalog = SiteCatalog()
+    for state in catalog.states():
+        total = catalog.count(state)
+        crawlable = catalog.count(state, with_url=True)
+        print(f"{state.upper()}: {crawlable}/{total} rows with a URL")
+    big = catalog.sites(min_population=1000000)
+    print(f"\n{len(big)} crawlable sites serve over 1,000,000 people")
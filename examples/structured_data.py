@@ -0,0 +1,253 @@
+"""
+Structured Data
+First-pass extractor for markup that states what it is: JSON-LD
+(<script type="application/ld+json">), schema.org microdata and tel:/mailto:
+links. Values come straight from the markup at high confidence, and the
+categories it covers tell the heuristic extractors what they can skip.
+"""
+
+import json
+import re
+from urllib.parse import unquote
+
+from address_parser import STATE_CODES, zip_matches_state, ParsedAddress
+from phone_scanner import scan_phones
+
+STRUCTURED_CONFIDENCE = 0.9
+
+# schema.org types whose `name` is a facility
+FACILITY_TYPES = {
+    'hospital', 'medicalclinic', 'medicalorganization', 'physician', 'pharmacy',
+    'dentist', 'emergencyservice', 'governmentoffice', 'governmentorganization',
+    'medicalbusiness', 'diagnosticlab', 'healthandbeautybusiness', 'localbusiness',
+}
+
+EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}$")
+
+
+def _types(node):
+    value = node.get('@type') or node.get('type') or ''
+    values = value if isinstance(value, list) else [value]
+    return {str(v).rsplit('/', 1)[-1].lower() for v in values if v}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@value') or ''
+    return re.sub(r'\s+', ' ', str(value or '')).strip()
+
+
+def _first(props, key):
+    values = props.get(key)
+    return values[0] if values else None
+
+
+def _address(street=None, city=None, state=None, zip_code=None):
+    """ParsedAddress from schema.org PostalAddress parts (None if nothing usable)"""
+    street, city, state, zip_code = (_text(v) or None for v in (street, city, state, zip_code))
+    if state and state.upper() in STATE_CODES:
+        state = state.upper()
+    if zip_code and state and not zip_matches_state(zip_code, state):
+        return None
+    addr = ParsedAddress(street, city, state, zip_code)
+    return addr if (addr.street or addr.zip) else None
+
+
+class StructuredData:
+    """Resources found in structured markup plus the categories they cover"""
+
+    def __init__(self):
+        self.resources = []
+        self.covered = set()
+        self.phone_keys = set()
+        self.values = set()
+
+    def covers(self, category):
+        return category in self.covered
+
+
+class StructuredExtractor:
+    def __init__(self, tagger):
+        """
+        Args:
+            tagger: Function (text, context_text) -> tags, normally
+                CategorizedHealthCrawler.auto_tag_content
+        """
+        self.tagger = tagger
+
+    def extract(self, soup):
+        found = StructuredData()
+        self._json_ld(soup, found)
+        self._microdata(soup, found)
+        self._links(soup, found)
+        return found
+
+    # -- resource builders --
+
+    def _tags(self, value, context):
+        return self.tagger(value, context or '') or ['general']
+
+    def _add_phone(self, found, raw, context, source):
+        for phone in scan_phones(raw):
+            if phone.dedup_key in found.phone_keys:
+                continue
+            found.phone_keys.add(phone.dedup_key)
+            tags = self._tags(phone.raw, context)
+            if any(t in ('crisis_services', 'emergency_room') for t in tags):
+                if 'crisis' in context.lower() or 'suicide' in context.lower():
+                    tags.append('crisis_hotline')
+            found.resources.append({
+                'category': 'CONTACT_INFO',
+                'type': 'toll_number' if phone.is_toll_free else 'phone_number',
+                'value': phone.raw,
+                'phone_key': phone.key,
+                'tags': tags,
+                'context': source,
+                'confidence': STRUCTURED_CONFIDENCE,
+            })
+            found.covered.add('CONTACT_INFO')
+
+    def _add_email(self, found, raw, context, source):
+        email = _text(raw).split('?', 1)[0]
+        if email.lower().startswith('mailto:'):
+            email = email[len('mailto:'):]
+        email = unquote(email).strip()
+        if not EMAIL_RE.match(email) or email.lower() in found.values:
+            return
+        found.values.add(email.lower())
+        found.resources.append({
+            'category': 'CONTACT_INFO',
+            'type': 'email',
+            'value': email,
+            'tags': self._tags(email, context),
+            'context': source,
+            'confidence': STRUCTURED_CONFIDENCE,
+        })
+
+    def _add_address(self, found, addr, context, source):
+        if addr is None:
+            return
+        value = addr.value
+        if not (10 < len(value) < 200) or value.lower() in found.values:
+            return
+        found.values.add(value.lower())
+        found.resources.append({
+            'category': 'LOCATION',
+            'type': 'address',
+            'value': value,
+            'address': addr.to_dict(),
+            'tags': self._tags(value, context),
+            'context': source,
+            'confidence': STRUCTURED_CONFIDENCE if addr.is_complete else 0.6,
+        })
+        if addr.is_complete:
+            found.covered.add('LOCATION')
+
+    def _add_facility(self, found, name, types, context, source):
+        name = _text(name)
+        if not name or len(name) > 100 or name.lower() in found.values:
+            return
+        found.values.add(name.lower())
+        tags = self.tagger(name, context or '')
+        lower = name.lower()
+        if 'hospital' in types or 'hospital' in lower:
+            tags.append('hospital')
+        elif 'medicalclinic' in types or 'clinic' in lower:
+            tags.append('clinic')
+        elif 'pharmacy' in types or 'pharmacy' in lower:
+            tags.append('pharmacy')
+        if not tags:
+            tags = ['general']
+        found.resources.append({
+            'category': 'FACILITY',
+            'type': 'facility_name',
+            'value': name,
+            'tags': tags,
+            'context': source,
+            'confidence': STRUCTURED_CONFIDENCE,
+        })
+        found.covered.add('FACILITY')
+
+    # -- JSON-LD --
+
+    def _json_ld(self, soup, found):
+        for script in soup.find_all('script', type=re.compile(r'application/ld\+json', re.I)):
+            try:
+                data = json.loads(script.string or script.get_text() or '')
+            except ValueError:
+                continue
+            stack = [data]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, list):
+                    stack.extend(reversed(node))
+                    continue
+                if not isinstance(node, dict):
+                    continue
+                self._json_ld_node(node, found)
+                for key, value in node.items():
+                    if isinstance(value, (dict, list)) and key != 'address':
+                        stack.append(value)
+
+    def _json_ld_node(self, node, found):
+        types = _types(node)
+        context = ' '.join(filter(None, (_text(node.get('name')), _text(node.get('contactType')),
+                                         _text(node.get('description'))[:200])))
+        for phone in _as_list(node.get('telephone')):
+            self._add_phone(found, _text(phone), context, 'json_ld')
+        for email in _as_list(node.get('email')):
+            self._add_email(found, email, context, 'json_ld')
+        for address in _as_list(node.get('address')):
+            if isinstance(address, dict):
+                addr = _address(address.get('streetAddress'), address.get('addressLocality'),
+                                address.get('addressRegion'), address.get('postalCode'))
+            else:
+                addr = None
+            self._add_address(found, addr, context, 'json_ld')
+        if types & FACILITY_TYPES and node.get('name'):
+            self._add_facility(found, node.get('name'), types, context, 'json_ld')
+
+    # -- microdata --
+
+    def _microdata(self, soup, found):
+        for scope in soup.select('[itemscope][itemtype]'):
+            types = {t.rsplit('/', 1)[-1].lower() for t in scope.get('itemtype', '').split()}
+            props = {}
+            for el in scope.select('[itemprop]'):
+                # Properties of nested scopes belong to those scopes
+                if el.find_parent(attrs={'itemscope': True}) is not scope:
+                    continue
+                value = el.get('content') or el.get('href') or el.get_text(' ', strip=True)
+                for prop in el.get('itemprop', '').split():
+                    props.setdefault(prop, []).append(value)
+            context = ' '.join(props.get('name', []) + props.get('contactType', []))[:200]
+            for phone in props.get('telephone', []):
+                self._add_phone(found, phone.replace('tel:', ''), context, 'microdata')
+            for email in props.get('email', []):
+                self._add_email(found, email, context, 'microdata')
+            if 'postaladdress' in types:
+                addr = _address(_first(props, 'streetAddress'), _first(props, 'addressLocality'),
+                                _first(props, 'addressRegion'), _first(props, 'postalCode'))
+                self._add_address(found, addr, context, 'microdata')
+            if types & FACILITY_TYPES and props.get('name'):
+                self._add_facility(found, props['name'][0], types, context, 'microdata')
+
+    # -- tel:/mailto: links --
+
+    def _links(self, soup, found):
+        for a in soup.select('a[href^="tel:"], a[href^="TEL:"]'):
+            href = unquote(a['href'][4:])
+            text = a.get_text(' ', strip=True)
+            parent = a.parent.get_text(' ', strip=True) if a.parent else text
+            # Prefer the visible spelling when it is the same number
+            raw = text if any(scan_phones(text)) else href
+            self._add_phone(found, raw, parent[:200], 'tel_link')
+        for a in soup.select('a[href^="mailto:"], a[href^="MAILTO:"]'):
+            parent = a.parent.get_text(' ', strip=True) if a.parent else ''
+            self._add_email(found, a['href'], parent[:200], 'mailto_link')
@@ -0,0 +1,143 @@
+"""
+Tag Registry
+Maps each tag name to one bit of a 64-bit mask so a resource's tags are a
+single integer. Counting tags, "has any of these tags" filters and per-county
+highlights then work on whole columns of masks instead of lists of strings.
+"""
+
+from collections import Counter
+
+MAX_TAGS = 64
+
+# Bit order follows CategorizedHealthCrawler.health_keywords, then the tags the
+# extractors append afterwards, so masks turn back into the original tag order.
+DEFAULT_TAGS = (
+    'flu', 'covid19', 'vaccination', 'mental_health', 'pediatric', 'dental',
+    'emergency_room', 'urgent_care', 'crisis_services', 'substance_abuse',
+    'opioid_treatment', 'rsv', 'measles', 'tuberculosis', 'mpox', 'hepatitis',
+    'std', 'vision', 'diabetes', 'hypertension', 'asthma', 'cancer', 'hiv',
+    'maternal_health', 'family_planning', 'substance_use', 'tobacco', 'nutrition',
+    'physical_activity', 'lead', 'vector_borne', 'telehealth', 'palliative_care',
+    'occupational_health', 'school_health', 'hearing', 'dermatology',
+    'kidney_disease', 'injury_trauma', 'chronic_pain', 'reproductive_health',
+    'transplant_immunocompromised', 'womens_health', 'senior_care',
+    'crisis_hotline', 'hospital', 'clinic', 'pharmacy', 'general', 'uncertain',
+)
+
+# Tags used only for verification; left out of human-readable highlights
+VERIFICATION_TAGS = ('uncertain',)
+
+
+class TagRegistry:
+    def __init__(self, names=DEFAULT_TAGS):
+        self.names = []
+        self.bits = {}
+        for name in names:
+            self.bit(name)
+
+    def bit(self, name):
+        """Return the bit value for a tag, registering it if new"""
+        bit = self.bits.get(name)
+        if bit is None:
+            if len(self.names) >= MAX_TAGS:
+                raise ValueError(f"Tag registry is full ({MAX_TAGS} tags); cannot add '{name}'")
+            bit = 1 << len(self.names)
+            self.names.append(name)
+            self.bits[name] = bit
+        return bit
+
+    def register_all(self, names):
+        for name in names:
+            self.bit(name)
+
+    def split(self, tags):
+        """
+        (mask, overflow) for a list of tag names
+
+        New tags are registered while there are free bits; once all
+        MAX_TAGS are taken, further unseen tags come back in the overflow
+        list (first-seen order) instead of raising, so saved files with
+        custom tags still load.
+        """
+        m = 0
+        overflow = []
+        for tag in tags or ():
+            bit = self.bits.get(tag)
+            if bit is None and len(self.names) < MAX_TAGS:
+                bit = self.bit(tag)
+            if bit is not None:
+                m |= bit
+            elif tag not in overflow:
+                overflow.append(tag)
+        return m, overflow
+
+    def mask(self, tags):
+        """Bitmask for a list of tag names (tags past a full registry are left out; see split)"""
+        return self.split(tags)[0]
+
+    def mask_of_known(self, tags):
+        """Bitmask for a query; unknown tags match nothing instead of registering"""
+        m = 0
+        for tag in tags or ():
+            m |= self.bits.get(tag, 0)
+        return m
+
+    def tag_names(self, mask):
+        """Tag names for a mask, in registry (bit) order"""
+        out = []
+        i = 0
+        while mask:
+            if mask & 1:
+                out.append(self.names[i])
+            mask >>= 1
+            i += 1
+        return out
+
+    def count(self, masks, exclude=()):
+        """
+        Count how many masks carry each tag
+
+        Masks repeat heavily (most resources share a handful of tag sets), so
+        the column is collapsed with a Counter first and each distinct mask is
+        decomposed once.
+
+        Returns a {tag: count} dict in registry order.
+        """
+        return self.count_collapsed(Counter(masks), exclude=exclude)
+
+    def count_collapsed(self, mask_counts, exclude=()):
+        """Like count(), for an already-collapsed {mask: number of resources} mapping"""
+        totals = [0] * len(self.names)
+        for mask, n in mask_counts.items():
+            i = 0
+            while mask:
+                if mask & 1:
+                    totals[i] += n
+                mask >>= 1
+                i += 1
+        skip = set(exclude)
+        return {self.names[i]: c for i, c in enumerate(totals) if c and self.names[i] not in skip}
+
+    def any_of(self, masks, tags):
+        """Indexes of masks that share at least one tag with `tags`"""
+        query = self.mask_of_known(tags)
+        return [i for i, m in enumerate(masks) if m & query]
+
+    def all_of(self, masks, tags):
+        """Indexes of masks that carry every tag in `tags`"""
+        query = self.mask_of_known(tags)
+        if len(self.tag_names(query)) != len(set(tags)):
+            return []
+        return [i for i, m in enumerate(masks) if m & query == query]
+
+    def top(self, masks, n=5, exclude=VERIFICATION_TAGS, overflow=None):
+        """Top-n (tag, count) pairs by count, ties broken by name (overflow: extra {tag: count})"""
+        counts = self.count(masks, exclude=exclude)
+        for tag, c in (overflow or {}).items():
+            if tag not in exclude:
+                counts[tag] = counts.get(tag, 0) + c
+        return sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+
+# Shared registry used by the crawler, resource tables and reports
+TAGS = TagRegistry()
@@ -0,0 +1,389 @@
+"""
+Text Index
+Full-text search over crawled page text and extracted resource values, e.g.
+"which county pages mention mpox testing" or "find this clinic name".
+Uses SQLite FTS5 when the local SQLite has it, otherwise a small in-process
+BM25 index. Both are updated per community_id, so re-crawling one county only
+replaces that county's rows. Page text is indexed once per URL: counties
+sharing a health-district page share its page document, and a hit on it is
+reported for each of them.
+"""
+
+import hashlib
+import json
+import math
+import re
+import sqlite3
+from pathlib import Path
+
+OUTPUT_DIR = Path(__file__).resolve().parent / 'output'
+DEFAULT_INDEX_PATH = OUTPUT_DIR / 'text_index.sqlite'
+
+# Page text is capped so one huge page can't dominate the index
+MAX_PAGE_CHARS = 200_000
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters (same defaults FTS5 uses)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def site_documents(result, page_text=None):
+    """
+    Documents to index for one site result
+
+    Yields (kind, body) pairs: one 'page' document with the page text (when
+    given) and one per resource, with kind set to the resource category.
+    """
+    if page_text:
+        yield 'page', page_text[:MAX_PAGE_CHARS]
+    for resource in result.get('resources', []) or []:
+        value = resource.get('value')
+        if value:
+            yield resource.get('category') or 'Unknown', str(value)
+
+
+def fts5_available():
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(body)")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+class TextIndex:
+    def __init__(self, path=None, backend=None):
+        """
+        Args:
+            path: SQLite file for the FTS5 backend (defaults to output/text_index.sqlite;
+                ':memory:' keeps it in memory). Ignored by the BM25 backend.
+            backend: 'fts5', 'bm25' or None to pick FTS5 when available
+        """
+        if backend is None:
+            backend = 'fts5' if fts5_available() else 'bm25'
+        self.backend = backend
+        if backend == 'fts5':
+            self._store = _Fts5Store(path or DEFAULT_INDEX_PATH)
+        elif backend == 'bm25':
+            self._store = _Bm25Store()
+        else:
+            raise ValueError(f"Unknown text index backend: {backend}")
+
+    def update_site(self, result, page_text=None):
+        """
+        Replace everything indexed for this site's community_id
+
+        Args:
+            result: Site result dict (as stored in BatchHealthCrawler.results)
+            page_text: Visible page text, if the crawl kept it
+        """
+        community = result.get('community_id') or result.get('name') or 'Unknown'
+        meta = {
+            'community_id': community,
+            'name': result.get('name'),
+            'state_id': str(result.get('state_id') or '').upper(),
+            'url': result.get('url'),
+        }
+        # The page document belongs to the URL and is only re-indexed when its text changed
+        page = (page_text[:MAX_PAGE_CHARS], _digest(page_text[:MAX_PAGE_CHARS])) if page_text else None
+        self._store.replace(community, meta, site_documents(result), page)
+
+    def add_results(self, results):
+        """Index saved results (resource values only; saved runs don't keep page text)"""
+        for result in results:
+            if isinstance(result, dict):
+                self.update_site(result)
+
+    def remove_site(self, community_id):
+        self._store.replace(community_id, None, ())
+
+    def search(self, query, limit=10, state=None, kind=None):
+        """
+        Ranked hits for a free-text query (all terms must appear)
+
+        Args:
+            query: Words to search for, e.g. 'mpox testing'
+            limit: Maximum number of hits
+            state: Only hits from this state
+            kind: 'page' or a resource category such as 'FACILITY'
+
+        Returns a list of dicts with community_id, name, state_id, url, kind,
+        snippet and score (higher is better).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return self._store.search(terms, limit, state.upper() if state else None, kind)
+
+    def __len__(self):
+        return self._store.count()
+
+    def close(self):
+        self._store.close()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8', 'replace')).hexdigest()
+
+
+class _Fts5Store:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # Index files written before the rowid maps existed get them rebuilt below
+        migrate = self._exists('docs') and not self._exists('site_docs')
+        # Filtering an FTS5 table on an UNINDEXED column scans every row, so
+        # deletes go by rowid through regular (indexed) tables
+        self.conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+                community_id UNINDEXED, name UNINDEXED, state_id UNINDEXED,
+                url UNINDEXED, kind UNINDEXED, body,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            CREATE TABLE IF NOT EXISTS site_docs (community_id TEXT NOT NULL, doc INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS site_docs_community ON site_docs (community_id);
+            CREATE TABLE IF NOT EXISTS sites (community_id TEXT PRIMARY KEY, name TEXT, state_id TEXT, url TEXT);
+            CREATE INDEX IF NOT EXISTS sites_url ON sites (url);
+            CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, doc INTEGER NOT NULL, digest TEXT);
+        """)
+        if migrate:
+            with self.conn:
+                self.conn.execute("INSERT INTO site_docs (community_id, doc) SELECT community_id, rowid FROM docs")
+                self.conn.execute("INSERT OR REPLACE INTO sites SELECT community_id, name, state_id, url "
+                                  "FROM docs GROUP BY community_id")
+
+    def _exists(self, table):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone() is not None
+
+    def replace(self, community, meta, documents, page=None):
+        with self.conn:
+            docs = self.conn.execute("SELECT doc FROM site_docs WHERE community_id = ?", (community,)).fetchall()
+            self.conn.executemany("DELETE FROM docs WHERE rowid = ?", ((row[0],) for row in docs))
+            self.conn.execute("DELETE FROM site_docs WHERE community_id = ?", (community,))
+            old = self.conn.execute("SELECT url FROM sites WHERE community_id = ?", (community,)).fetchone()
+            self.conn.execute("DELETE FROM sites WHERE community_id = ?", (community,))
+            if meta is not None:
+                self.conn.execute("INSERT INTO sites (community_id, name, state_id, url) VALUES (?, ?, ?, ?)",
+                                  (community, meta['name'], meta['state_id'], meta['url']))
+                rows = []
+                for kind, body in documents:
+                    cursor = self.conn.execute(
+                        "INSERT INTO docs (community_id, name, state_id, url, kind, body) VALUES (?, ?, ?, ?, ?, ?)",
+                        (community, meta['name'], meta['state_id'], meta['url'], kind, body))
+                    rows.append((community, cursor.lastrowid))
+                self.conn.executemany("INSERT INTO site_docs (community_id, doc) VALUES (?, ?)", rows)
+                if page and meta['url']:
+                    self._set_page(meta, *page)
+            if old and old[0] and (meta is None or old[0] != meta['url']):
+                self._drop_orphan_page(old[0])
+
+    def _set_page(self, meta, text, digest):
+        row = self.conn.execute("SELECT doc, digest FROM pages WHERE url = ?", (meta['url'],)).fetchone()
+        if row is not None:
+            if row['digest'] == digest:
+                return  # already indexed for another county on this URL
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (row['doc'],))
+        cursor = self.conn.execute(
+            "INSERT INTO docs (community_id, name, state_id, url, kind, body) VALUES ('', ?, ?, ?, 'page', ?)",
+            (meta['name'], meta['state_id'], meta['url'], text))
+        self.conn.execute("INSERT OR REPLACE INTO pages (url, doc, digest) VALUES (?, ?, ?)",
+                          (meta['url'], cursor.lastrowid, digest))
+
+    def _drop_orphan_page(self, url):
+        if self.conn.execute("SELECT 1 FROM sites WHERE url = ? LIMIT 1", (url,)).fetchone():
+            return
+        row = self.conn.execute("SELECT doc FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (row['doc'],))
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def _page_sites(self, url, state):
+        sql = "SELECT community_id, name, state_id, url FROM sites WHERE url = ?"
+        params = [url]
+        if state:
+            sql += " AND state_id = ?"
+            params.append(state)
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY community_id", params)]
+
+    def search(self, terms, limit, state, kind):
+        # Quote every term so user input can't be read as FTS5 query syntax
+        match = ' '.join(f'"{t}"' for t in terms)
+        sql = ("SELECT community_id, name, state_id, url, kind, "
+               "snippet(docs, 5, '[', ']', '...', 12) AS snippet, bm25(docs) AS rank "
+               "FROM docs WHERE docs MATCH ?")
+        params = [match]
+        if state:
+            sql += " AND state_id = ?"
+            params.append(state)
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        hits = []
+        for row in self.conn.execute(sql, params):
+            hit = dict(row)
+            # bm25() is negative with lower = better; flip it for callers
+            hit['score'] = round(-hit.pop('rank'), 4)
+            if hit['community_id']:
+                hits.append(hit)
+                continue
+            # A shared page document: one hit per county on that URL
+            for site in self._page_sites(hit['url'], state):
+                hits.append(dict(hit, **site))
+        return hits[:limit]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class _Bm25Store:
+    """In-process inverted index: term -> {doc_id: term frequency}"""
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}          # doc_id -> (meta, kind, body, length)
+        self.by_community = {}  # community -> [doc_id, ...]
+        self.sites = {}         # community -> meta
+        self.by_url = {}        # url -> {community, ...}
+        self.pages = {}         # url -> (doc_id, digest) of the shared page document
+        self.total_length = 0
+        self._next_id = 0
+
+    def _add_doc(self, meta, kind, body):
+        tokens = tokenize(body)
+        if not tokens:
+            return None
+        doc_id = self._next_id
+        self._next_id += 1
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.docs[doc_id] = (meta, kind, body, len(tokens))
+        self.total_length += len(tokens)
+        return doc_id
+
+    def _remove_doc(self, doc_id):
+        _, _, body, length = self.docs.pop(doc_id)
+        self.total_length -= length
+        for term in set(tokenize(body)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def replace(self, community, meta, documents, page=None):
+        for doc_id in self.by_community.pop(community, []):
+            self._remove_doc(doc_id)
+        old = self.sites.pop(community, None)
+        old_url = old['url'] if old else None
+        if old_url:
+            self.by_url.get(old_url, set()).discard(community)
+        if meta is not None:
+            self.sites[community] = meta
+            if meta['url']:
+                self.by_url.setdefault(meta['url'], set()).add(community)
+            ids = [self._add_doc(meta, kind, body) for kind, body in documents]
+            self.by_community[community] = [doc_id for doc_id in ids if doc_id is not None]
+            if page and meta['url']:
+                text, digest = page
+                current = self.pages.get(meta['url'])
+                if current is None or current[1] != digest:
+                    if current is not None and current[0] is not None:
+                        self._remove_doc(current[0])
+                    page_meta = dict(meta, community_id='')
+                    self.pages[meta['url']] = (self._add_doc(page_meta, 'page', text), digest)
+        if old_url and not self.by_url.get(old_url):
+            self.by_url.pop(old_url, None)
+            current = self.pages.pop(old_url, None)
+            if current is not None and current[0] is not None:
+                self._remove_doc(current[0])
+
+    def search(self, terms, limit, state, kind):
+        postings = [self.postings.get(t) for t in dict.fromkeys(terms)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates &= other.keys()
+        n = len(self.docs)
+        avg_length = self.total_length / n if n else 0
+        scored = []
+        for doc_id in candidates:
+            meta, doc_kind, body, length = self.docs[doc_id]
+            if (state and meta['state_id'] != state) or (kind and doc_kind != kind):
+                continue
+            score = 0.0
+            for p in postings:
+                tf = p[doc_id]
+                idf = math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+            scored.append((score, doc_id))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        hits = []
+        for score, doc_id in scored[:limit]:
+            meta, doc_kind, body, _ = self.docs[doc_id]
+            if meta['community_id']:
+                sites = [meta]
+            else:
+                # A shared page document: one hit per county on that URL
+                sites = [self.sites[c] for c in sorted(self.by_url.get(meta['url'], ()))
+                         if not state or self.sites[c]['state_id'] == state]
+            for site in sites:
+                hit = dict(site)
+                hit['kind'] = doc_kind
+                hit['snippet'] = _snippet(body, terms)
+                hit['score'] = round(score, 4)
+                hits.append(hit)
+        return hits[:limit]
+
+    def count(self):
+        return len(self.docs)
+
+    def close(self):
+        pass
+
+
+def _snippet(body, terms, width=80):
+    lower = body.lower()
+    pos = min((p for p in (lower.find(t) for t in terms) if p >= 0), default=0)
+    start = max(0, pos - width // 2)
+    text = body[start:start + width].strip()
+    return ('...' if start else '') + text + ('...' if start + width < len(body) else '')
+
+
+# Example usage
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Full-text search over crawl results")
+    parser.add_argument('query')
+    parser.add_argument('--state')
+    parser.add_argument('--kind', help="'page' or a resource category, e.g. FACILITY")
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Re-index the saved results in output/ before searching")
+    args = parser.parse_args()
+
+    index = TextIndex()
+    if args.rebuild or not len(index):
+        for path in sorted(OUTPUT_DIR.glob('batch_crawl_results_*.json')):
+            with open(path, 'r', encoding='utf-8') as f:
+                index.add_results(json.load(f).get('results', []))
+    for hit in index.search(args.query, limit=args.limit, state=args.state, kind=args.kind):
+        print(f"{hit['score']:>8.3f}  [{hit['state_id']}] {hit['name']} ({hit['kind']}): {hit['snippet']}")
+    index.close()
@@ -0,0 +1,155 @@
+"""
+Worker Lifecycle
+Keeps crawl memory flat over long runs. WorkerLifecycle counts pages and
+samples the process RSS (from /proc/self/statm) so a worker can retire after
+N pages or once it passes an RSS ceiling; the distributed crawl starts a
+fresh process in its place. MemoryBudget bounds the bytes of response
+bodies in flight (linked PDFs) and makes producers wait when it is full.
+Both report their limits and peaks for the run's crawl_info.
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+
+MB = 1024 * 1024
+
+# In-flight document bodies allowed at once
+DEFAULT_BODY_BUDGET = 64 * MB
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def rss_bytes():
+    """Current resident set size of this process (None where /proc isn't available)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS, but still a usable ceiling check
+        # (reported in bytes on macOS, KiB elsewhere)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class MemoryBudget:
+    def __init__(self, max_bytes=DEFAULT_BODY_BUDGET):
+        """
+        Args:
+            max_bytes: Bytes of bodies that may be held at once. A single body
+                larger than the budget is still let through when nothing
+                else is held, so one big document can't stall the run.
+        """
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, n):
+        """Reserve n bytes, waiting while the budget is full"""
+        with self._cond:
+            if self.in_use and self.in_use + n > self.max_bytes:
+                self.waits += 1
+                started = time.monotonic()
+                while self.in_use and self.in_use + n > self.max_bytes:
+                    self._cond.wait()
+                self.wait_seconds += time.monotonic() - started
+            self.in_use += n
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, n):
+        with self._cond:
+            self.in_use = max(0, self.in_use - n)
+            self._cond.notify_all()
+
+    def wait_below(self, fraction=1.0):
+        """Block until usage is under `fraction` of the budget (for producers holding nothing)"""
+        with self._cond:
+            if self.in_use <= self.max_bytes * fraction:
+                return
+            self.waits += 1
+            started = time.monotonic()
+            while self.in_use > self.max_bytes * fraction:
+                self._cond.wait()
+            self.wait_seconds += time.monotonic() - started
+
+    def stats(self):
+        with self._cond:
+            return {
+                'body_budget_bytes': self.max_bytes,
+                'body_peak_bytes': self.peak,
+                'backpressure_waits': self.waits,
+                'backpressure_seconds': round(self.wait_seconds, 3),
+            }
+
+
+class WorkerLifecycle:
+    def __init__(self, max_pages=None, max_rss_bytes=None, collect_every=50):
+        """
+        Args:
+            max_pages: Pages after which the worker should be recycled (None = no limit)
+            max_rss_bytes: RSS ceiling that triggers recycling (None = no limit)
+            collect_every: Run a full gc pass every this many pages (frees
+                cycles left by parse trees); 0 disables it
+        """
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_bytes
+        self.collect_every = collect_every
+        self.pages = 0
+        self.start_rss = rss_bytes()
+        self.last_rss = self.start_rss
+        self.peak_rss = self.start_rss or 0
+        # First limit that was hit (the worker should retire from then on)
+        self.recycle = None
+
+    def page_done(self):
+        """
+        Count one finished page and sample RSS
+
+        Returns the recycle reason the first time a limit is hit, else None.
+        """
+        self.pages += 1
+        if self.collect_every and self.pages % self.collect_every == 0:
+            gc.collect()
+        rss = rss_bytes()
+        if rss is not None:
+            self.last_rss = rss
+            self.peak_rss = max(self.peak_rss, rss)
+        if self.recycle is not None:
+            return None
+        self.recycle = self.recycle_reason()
+        return self.recycle
+
+    def recycle_reason(self):
+        if self.max_pages is not None and self.pages >= self.max_pages:
+            return f"max_pages ({self.pages})"
+        if self.max_rss_bytes is not None and self.last_rss is not None and self.last_rss > self.max_rss_bytes:
+            # One collection first; only recycle if that didn't bring it down
+            gc.collect()
+            self.last_rss = rss_bytes() or self.last_rss
+            if self.last_rss > self.max_rss_bytes:
+                return f"max_rss ({self.last_rss // MB} MB)"
+        return None
+
+    def stats(self):
+        return {
+            'pages': self.pages,
+            'max_pages': self.max_pages,
+            'max_rss_mb': None if self.max_rss_bytes is None else round(self.max_rss_bytes / MB, 1),
+            'start_rss_mb': None if self.start_rss is None else round(self.start_rss / MB, 1),
+            'peak_rss_mb': round(self.peak_rss / MB, 1) if self.peak_rss else None,
+            'last_rss_mb': None if self.last_rss is None else round(self.last_rss / MB, 1),
+            'recycle_reason': self.recycle,
+        }